@@ -0,0 +1,117 @@
+import gbl
+import ipaddress
+import math
+
+
+class AddressingScheme:
+    """
+    A class to represent how the IP subnets of the spine switches, leaf switches and substrate
+    hosts are derived from their (integer) indices in the spine-leaf topology. The spine index,
+    the index of the leaf switch under its spine switch, and the index of the host under its leaf
+    switch are packed into the bits of the IPv4 address, after the first octet:
+
+        address = first_octet.0.0.0 + (spine << spine_shift) + (leaf << leaf_shift) + (host << host_shift)
+
+    so that the subnet of every switch and host is computed (and an IP address located back to
+    its indices) with integer arithmetic only, instead of splitting dotted decimal strings.
+
+    Attributes
+    ----------
+    name : str
+        Name of the addressing scheme, as in the configurations file. E.g. 'octet'.
+    spine_prefixlen : int
+        Prefix length of the subnet under a spine switch. E.g. 8 for '10.0.0.0/8'.
+    leaf_prefixlen : int
+        Prefix length of the subnet under a leaf switch. E.g. 16 for '10.0.0.0/16'.
+    host_prefixlen : int
+        Prefix length of the subnet of a substrate host (shared with the virtual hosts mapped
+        onto it). E.g. 24 for '10.0.0.0/24'.
+    """
+
+    def __init__(self, name: str, spine_shift: int, leaf_shift: int, host_shift: int, first_octet: int = 10):
+        self.name = name
+        self.base_address = first_octet << 24
+        self.spine_shift = spine_shift
+        self.leaf_shift = leaf_shift
+        self.host_shift = host_shift
+        self.spine_prefixlen = 32 - spine_shift
+        self.leaf_prefixlen = 32 - leaf_shift
+        self.host_prefixlen = 32 - host_shift
+
+    def _get_subnet(self, address, prefixlen):
+        return "{}/{}".format(ipaddress.IPv4Address(address), prefixlen)
+
+    def get_spine_subnet(self, spine_index):
+        """ Returns the IP subnet under the spine switch. Example: '11.0.0.0/8' for spine index 1. """
+        return self._get_subnet(self.base_address + (spine_index << self.spine_shift), self.spine_prefixlen)
+
+    def get_leaf_subnet(self, spine_index, leaf_index):
+        """ Returns the IP subnet under the leaf switch; leaf_index being the index of the leaf switch
+        under its spine switch. Example: '11.1.0.0/16' for spine index 1 and leaf index 1. """
+        return self._get_subnet(self.base_address + (spine_index << self.spine_shift) +
+                                (leaf_index << self.leaf_shift), self.leaf_prefixlen)
+
+    def get_host_subnet(self, spine_index, leaf_index, host_index):
+        """ Returns the IP subnet of the substrate host; host_index being the index of the host under
+        its leaf switch. Example: '11.1.2.0/24' for spine index 1, leaf index 1 and host index 2. """
+        return self._get_subnet(self.base_address + (spine_index << self.spine_shift) + (leaf_index << self.leaf_shift) +
+                                (host_index << self.host_shift), self.host_prefixlen)
+
+    def locate(self, ip_addr):
+        """ Returns Tuple(spine index, leaf index, host index) of the substrate host whose subnet the
+        IP address (in dotted decimal format, with or without prefix length) belongs to.
+        Example: (1, 1, 2) for '11.1.2.5'. """
+        offset = int(ipaddress.IPv4Address(
+            ip_addr.split("/")[0])) - self.base_address
+        return (offset >> self.spine_shift,
+                (offset >> self.leaf_shift) & ((1 << (self.spine_shift - self.leaf_shift)) - 1),
+                (offset >> self.host_shift) & ((1 << (self.leaf_shift - self.host_shift)) - 1))
+
+    def check_capacity(self, sl_factor, ll_factor, hl_factor):
+        """ Raises an exception if the given number of spine switches, leaf switches under each spine
+        switch, and hosts under each leaf switch cannot be addressed by this scheme. """
+        last_address = self.base_address + ((sl_factor - 1) << self.spine_shift) + \
+            ((1 << self.spine_shift) - 1)
+        if last_address > 0xffffffff or ll_factor > (1 << (self.spine_shift - self.leaf_shift)) or \
+                hl_factor > (1 << (self.leaf_shift - self.host_shift)):
+            raise Exception("The topology (sl={}, ll={}, hl={}) cannot be addressed with the '{}' addressing; try the 'packed' addressing.".format(
+                sl_factor, ll_factor, hl_factor, self.name))
+
+
+def octet_addressing():
+    """ One octet per index; i.e. spine switch i has the subnet '(10+i).0.0.0/8', its leaf switch j
+    has '(10+i).j.0.0/16', and host k under it has '(10+i).j.k.0/24'. This is the default, and is
+    the most readable, but limits the topology to 246 spine switches, and 256 leaf switches under
+    each spine switch and hosts under each leaf switch. """
+    return AddressingScheme("octet", spine_shift=24, leaf_shift=16, host_shift=8)
+
+
+def packed_addressing(sl_factor, ll_factor, hl_factor):
+    """ Just enough bits for each index (e.g. 5 bits for 20 hosts under every leaf switch), packed in
+    the 24 bits after the first octet ('10'); the remaining bits (at most 8, as with the 'octet'
+    addressing) are for the addresses of the virtual hosts within the subnet of each substrate host.
+    For example, for sl=2, ll=300, hl=40: spine subnets are /9, leaf subnets /18 and host subnets /24;
+    and for sl=4, ll=1000, hl=100: spine subnets are /10, leaf subnets /20 and host subnets /27.
+    """
+    spine_bits = math.ceil(math.log2(sl_factor))
+    leaf_bits = math.ceil(math.log2(ll_factor))
+    host_bits = math.ceil(math.log2(hl_factor))
+    vhost_bits = min(8, 24 - spine_bits - leaf_bits - host_bits)
+    # Besides the substrate host, the default router and the broadcast address, at least a few
+    # addresses are needed for the virtual hosts.
+    if vhost_bits < 3:
+        raise Exception("The topology (sl={}, ll={}, hl={}) is too large to be addressed within 10.0.0.0/8.".format(
+            sl_factor, ll_factor, hl_factor))
+    return AddressingScheme("packed", spine_shift=vhost_bits + host_bits + leaf_bits,
+                            leaf_shift=vhost_bits + host_bits, host_shift=vhost_bits)
+
+
+def get_addressing_scheme(sl_factor, ll_factor, hl_factor):
+    """ Returns the addressing scheme for the topology, as specified by the 'addressing' value in
+    the configurations file; either 'octet' (the default) or 'packed'. """
+    if gbl.CFG.get("addressing", "octet") == "packed":
+        addressing = packed_addressing(sl_factor, ll_factor, hl_factor)
+    else:
+        addressing = octet_addressing()
+    addressing.check_capacity(sl_factor, ll_factor, hl_factor)
+    return addressing
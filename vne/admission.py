@@ -0,0 +1,314 @@
+import gbl
+import capacity_tree
+import heapq
+import networkx as nx
+from networkx.algorithms import isomorphism
+
+
+class _LazyMaxHeap:
+    """
+    Max-heap of values by key, where the values change over time, with lazy deletion: a change of
+    the value of a key pushes a new entry, and the outdated entries are only dropped once they come
+    up to the top. So a change costs O(log n), and so does getting the largest values (amortised),
+    instead of O(n) for computing them again.
+
+    Attributes
+    ----------
+    key_x_value : Dict
+        The current value of every key.
+    """
+
+    def __init__(self, key_x_value):
+        self.key_x_value = dict(key_x_value)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.heap = [(-value, key) for (key, value) in self.key_x_value.items()]
+        heapq.heapify(self.heap)
+
+    def set(self, key, value):
+        """ Sets the value of the key. """
+        if self.key_x_value[key] == value:
+            return
+        self.key_x_value[key] = value
+        heapq.heappush(self.heap, (-value, key))
+        # Dropping all the outdated entries once they are as many as the keys, so the heap stays
+        # within twice the number of keys (in amortised constant time per change).
+        if len(self.heap) > 2*len(self.key_x_value):
+            self._rebuild()
+
+    def get_largest(self, n):
+        """ Returns the n largest values (of different keys), in descending order. """
+        largest = []
+        while self.heap and len(largest) < n:
+            (negative_value, key) = heapq.heappop(self.heap)
+            # An entry is outdated if the value of its key has changed since; and the same key
+            # can have several up to date entries if its value has changed back.
+            if -negative_value == self.key_x_value[key] and all(key != k for (_, k) in largest):
+                largest.append((negative_value, key))
+        for entry in largest:
+            heapq.heappush(self.heap, entry)
+        return [-negative_value for (negative_value, _) in largest]
+
+    def get_max(self):
+        """ Returns the largest value. """
+        return self.get_largest(1)[0]
+
+
+class AdmissionFilter:
+    """
+    Fast-reject admission control, run before the VNE algorithm for every VNR. It keeps a few
+    aggregates of the residual resources of the substrate network up to date as VNRs are mapped
+    and removed, so that VNRs which obviously cannot be mapped are rejected in constant time
+    (with respect to the size of the substrate network), without running the VNE algorithm (the
+    ranking of the hosts, the bandwidth checks of the greedy embedding).
+
+    The maxima over the substrate hosts and leaf switches are kept in heaps (`_LazyMaxHeap`), so an
+    update after a VNR is mapped or removed only looks at its substrate hosts and their leaf switches.
+
+    The filter is conservative; it only rejects a VNR if no VNE algorithm could map it, as every
+    virtual host has to be mapped onto a different substrate host with more remaining cpu than
+    its requirement, and every virtual link has to go through the link between each of its
+    substrate hosts and its leaf switch (the 'access' link), and through the links between the
+    leaf switches and the layer above (the 'uplinks') if its substrate hosts are under different
+    leaf switches. So it never changes which VNRs are mapped, only how fast the others are rejected.
+
+    Attributes
+    ----------
+    host_x_cpu : Dict[str, int]
+        Remaining cpu limit of every substrate host, by host name.
+    host_x_access_bw : Dict[str, int]
+        Residual bandwidth of the access link of every substrate host, by host name.
+    leaf_x_cpu : Dict[str, int]
+        Total remaining cpu limit of the substrate hosts under every leaf switch, by switch name.
+    leaf_x_uplink_bw : Dict[str, int]
+        Total residual bandwidth of the uplinks of every leaf switch, by switch name.
+    total_cpu, max_host_cpu, max_host_access_bw, max_leaf_cpu, max_leaf_hosts : int
+        The aggregates the VNRs are checked against.
+    top_leaf_uplink_bws : List[int]
+        The two largest residual uplink bandwidths (of any leaf switch).
+    """
+
+    def __init__(self):
+        self.num_hosts = len(gbl.HOSTS)
+        leaf_names = set(leaf.name for leaf in gbl.LEAF_SWITCHES)
+        (self.host_x_leaf, self.host_x_access_link,
+         self.leaf_x_uplinks) = capacity_tree.get_access_links_and_uplinks()
+        self.leaf_x_hosts = {name: [] for name in leaf_names}
+        for host in gbl.HOSTS:
+            self.leaf_x_hosts[self.host_x_leaf[host.name]].append(host.name)
+        self.max_leaf_hosts = max(len(hosts)
+                                  for hosts in self.leaf_x_hosts.values())
+
+        self._host_cpus = _LazyMaxHeap(
+            {host.name: host.cpu_limit for host in gbl.HOSTS})
+        self._host_access_bws = _LazyMaxHeap({host.name: self._get_access_bw(
+            host.name) for host in gbl.HOSTS})
+        self._leaf_cpus = _LazyMaxHeap({leaf: sum(self._host_cpus.key_x_value[host] for host in hosts)
+                                        for (leaf, hosts) in self.leaf_x_hosts.items()})
+        self._leaf_uplink_bws = _LazyMaxHeap({leaf: self._get_uplink_bw(
+            leaf) for leaf in leaf_names})
+        self.host_x_cpu = self._host_cpus.key_x_value
+        self.host_x_access_bw = self._host_access_bws.key_x_value
+        self.leaf_x_cpu = self._leaf_cpus.key_x_value
+        self.leaf_x_uplink_bw = self._leaf_uplink_bws.key_x_value
+        self.total_cpu = sum(self.host_x_cpu.values())
+        self._update_maxima()
+
+    def _update_maxima(self):
+        self.max_host_cpu = self._host_cpus.get_max()
+        self.max_host_access_bw = self._host_access_bws.get_max()
+        self.max_leaf_cpu = self._leaf_cpus.get_max()
+        self.top_leaf_uplink_bws = self._leaf_uplink_bws.get_largest(2)
+
+    def _get_access_bw(self, host_name):
+        return gbl.SWITCH_PAIR_x_BW[self.host_x_access_link[host_name]]
+
+    def _get_uplink_bw(self, leaf_name):
+        # With 'multipath' routing, a virtual link can be split over all the uplinks together.
+        return sum(max(gbl.SWITCH_PAIR_x_BW[link], 0) for link in self.leaf_x_uplinks[leaf_name])
+
+    def update(self, substrate_hosts):
+        """ Updates the aggregates after a VNR has been mapped onto (or removed from) the substrate
+        hosts; only the substrate hosts, and the leaf switches they are under, are looked at again,
+        as the paths between them don't use the access links or uplinks of any other.
+        substrate_hosts: List of the substrate hosts of the VNR.
+        """
+        leaf_names = set()
+        for host in substrate_hosts:
+            cpu_change = host.cpu_limit - self.host_x_cpu[host.name]
+            self._host_cpus.set(host.name, host.cpu_limit)
+            self._host_access_bws.set(
+                host.name, self._get_access_bw(host.name))
+            self.total_cpu += cpu_change
+            leaf_name = self.host_x_leaf[host.name]
+            self._leaf_cpus.set(
+                leaf_name, self.leaf_x_cpu[leaf_name] + cpu_change)
+            leaf_names.add(leaf_name)
+        for leaf_name in leaf_names:
+            self._leaf_uplink_bws.set(
+                leaf_name, self._get_uplink_bw(leaf_name))
+        self._update_maxima()
+
+    def get_rejection_reason(self, num_hosts, cpu_reqs, link_bw_reqs):
+        """ Returns the reason (str) why the VNR cannot be mapped, or None if it may be mapped
+        (and the VNE algorithm has to be run to find out).
+        num_hosts, cpu_reqs, link_bw_reqs: The VNR's requirements, as for `vne_algorithms.vne_algorithm`.
+        """
+        if num_hosts > self.num_hosts:
+            return "it has more virtual hosts than there are substrate hosts"
+        if max(cpu_reqs) >= self.max_host_cpu:
+            return "its largest cpu requirement {} is not less than the remaining cpu limit of every substrate host (at most {})".format(
+                max(cpu_reqs), self.max_host_cpu)
+        total_cpu_req = sum(cpu_reqs)
+        if total_cpu_req >= self.total_cpu:
+            return "its total cpu requirement {} is not less than the remaining cpu limit of the substrate network ({})".format(
+                total_cpu_req, self.total_cpu)
+        if not link_bw_reqs:
+            return None
+
+        vhost_bws = [0] * (num_hosts + 1)
+        for (h1, h2, bw) in link_bw_reqs:
+            vhost_bws[h1] += bw
+            vhost_bws[h2] += bw
+        if max(vhost_bws) > self.max_host_access_bw:
+            return "the links of one of its virtual hosts need bandwidth {}, more than the residual bandwidth between any substrate host and its leaf switch (at most {})".format(
+                max(vhost_bws), self.max_host_access_bw)
+
+        # If the VNR does not fit under a single leaf switch, some virtual link between two of its
+        # virtual hosts (if connected) has to go over the uplinks of two different leaf switches.
+        if num_hosts > self.max_leaf_hosts or total_cpu_req >= self.max_leaf_cpu:
+            min_bw = min(bw for (_, _, bw) in link_bw_reqs)
+            top_uplink_bws = self.top_leaf_uplink_bws + [0]
+            if top_uplink_bws[1] < min_bw and _is_connected(num_hosts, link_bw_reqs):
+                return "it does not fit under a single leaf switch, and the residual bandwidth of the uplinks of at most one leaf switch is at least {}".format(
+                    min_bw)
+        return None
+
+
+def _is_connected(num_hosts, link_bw_reqs):
+    """ Returns whether the virtual hosts of the VNR are connected by its links. """
+    parent = list(range(num_hosts + 1))
+
+    def find(h):
+        while parent[h] != h:
+            parent[h] = parent[parent[h]]
+            h = parent[h]
+        return h
+    for (h1, h2, _) in link_bw_reqs:
+        parent[find(h1)] = find(h2)
+    return len(set(find(h) for h in range(1, num_hosts + 1))) == 1
+
+
+class FailureCache:
+    """
+    Cache of the VNRs which have failed to be mapped. As long as no resources are released to the
+    substrate network, its remaining resources only decrease; so a VNR of the same topology as a
+    failed VNR, which demands at least as much cpu for every virtual host and bandwidth for every
+    virtual link (i.e. which dominates the failed VNR), is taken to fail as well, and is rejected
+    without running the VNE algorithm. The topology is compared up to the numbering of the virtual
+    hosts, i.e. the VNRs only need to be isomorphic, with the demands compared along the
+    isomorphism. The cache is cleared whenever resources are released (see `clear_failure_cache`).
+
+    Note that this holds for whether a VNR can be mapped at all, but the (greedy) VNE algorithms may
+    rank the hosts of a dominating VNR differently, and could then have mapped it; hence the failure
+    cache is not enabled by default.
+
+    Attributes
+    ----------
+    key_x_failed_vnrs : Dict[Tuple, List[Tuple(nx.Graph, List[int], List[int])]]
+        The failed VNRs, by a key of their topology which is the same for isomorphic VNRs (the
+        number of virtual hosts, and the degrees of the virtual hosts in ascending order); each as
+        its graph (with the 'cpu' of the nodes and the 'bw' of the edges), and its cpu and
+        bandwidth requirements in ascending order. Only the failed VNRs which do not dominate
+        another failed VNR of the same key are kept.
+    """
+
+    def __init__(self):
+        self.key_x_failed_vnrs = {}
+
+    def _get_key_and_failed_vnr(self, num_hosts, cpu_reqs, link_bw_reqs):
+        """ Returns the key of the topology of the VNR, and the VNR as kept in the cache; or None if
+        the VNR has more than one link between the same virtual hosts, and so is not cached. """
+        graph = nx.Graph()
+        graph.add_nodes_from((h, {"cpu": cpu}) for (h, cpu) in enumerate(cpu_reqs, 1))
+        graph.add_edges_from((h1, h2, {"bw": bw}) for (h1, h2, bw) in link_bw_reqs)
+        if graph.number_of_edges() != len(link_bw_reqs):
+            return None
+        key = (num_hosts, tuple(sorted(degree for (_, degree) in graph.degree())))
+        return (key, (graph, sorted(cpu_reqs), sorted(bw for (_, _, bw) in link_bw_reqs)))
+
+    def is_dominated(self, num_hosts, cpu_reqs, link_bw_reqs):
+        """ Returns whether the VNR dominates a VNR which has failed. """
+        key_and_vnr = self._get_key_and_failed_vnr(num_hosts, cpu_reqs, link_bw_reqs)
+        if key_and_vnr is None:
+            return False
+        (key, vnr) = key_and_vnr
+        return any(_dominates(vnr, failed_vnr) for failed_vnr in self.key_x_failed_vnrs.get(key, []))
+
+    def add(self, num_hosts, cpu_reqs, link_bw_reqs):
+        """ Adds the VNR which has failed to be mapped to the cache. """
+        key_and_vnr = self._get_key_and_failed_vnr(num_hosts, cpu_reqs, link_bw_reqs)
+        if key_and_vnr is None:
+            return
+        (key, vnr) = key_and_vnr
+        failed_vnrs = self.key_x_failed_vnrs.get(key, [])
+        # The failed VNRs dominating this one are not needed anymore.
+        self.key_x_failed_vnrs[key] = [
+            failed_vnr for failed_vnr in failed_vnrs if not _dominates(failed_vnr, vnr)] + [vnr]
+
+    def clear(self):
+        self.key_x_failed_vnrs.clear()
+
+
+def _dominates(vnr, other_vnr):
+    """ Returns whether the VNR (as kept in the failure cache) dominates the other VNR, i.e. there is
+    an isomorphism between them under which every virtual host and link of the VNR demands at least
+    as much as that of the other VNR. The requirements in ascending order have to dominate the other
+    ones element-wise for that, which rules out most VNRs before looking for an isomorphism. """
+    (graph, cpu_reqs, bw_reqs) = vnr
+    (other_graph, other_cpu_reqs, other_bw_reqs) = other_vnr
+    if any(req < other_req for (req, other_req) in zip(cpu_reqs, other_cpu_reqs)) or \
+            any(req < other_req for (req, other_req) in zip(bw_reqs, other_bw_reqs)):
+        return False
+    return isomorphism.GraphMatcher(
+        graph, other_graph,
+        node_match=lambda node, other_node: node["cpu"] >= other_node["cpu"],
+        edge_match=lambda edge, other_edge: edge["bw"] >= other_edge["bw"]).is_isomorphic()
+
+
+def is_admission_control_enabled():
+    """ Whether the VNRs are checked by the fast-reject admission control before running the VNE
+    algorithm; the 'admission_control' value in the configurations file. """
+    return gbl.CFG.get("admission_control", True)
+
+
+def create_admission_filter():
+    """ Creates the admission filter (gbl.ADMISSION_FILTER) for the generated substrate network, if
+    the admission control is enabled. """
+    gbl.ADMISSION_FILTER = None
+    if is_admission_control_enabled():
+        gbl.ADMISSION_FILTER = AdmissionFilter()
+
+
+def update_admission_filter(substrate_hosts):
+    """ Updates the admission filter (if any) after a VNR has been mapped onto, or removed from,
+    the substrate hosts. """
+    if gbl.ADMISSION_FILTER is not None:
+        gbl.ADMISSION_FILTER.update(substrate_hosts)
+
+
+def create_failure_cache():
+    """ Creates the failure cache (gbl.FAILURE_CACHE), if enabled by the 'failure_cache' value in
+    the configurations file. """
+    gbl.FAILURE_CACHE = None
+    if gbl.CFG.get("failure_cache", False):
+        gbl.FAILURE_CACHE = FailureCache()
+
+
+def clear_failure_cache():
+    """ Clears the failure cache (if any), once resources are released to the substrate network;
+    called wherever cpu or bandwidth is given back (`hp.change_cpu_limit_of_substrate_host`, and
+    `vnr_mapping.remove_link_mapping_between_hosts`). """
+    if gbl.FAILURE_CACHE is not None:
+        gbl.FAILURE_CACHE.clear()
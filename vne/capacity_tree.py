@@ -0,0 +1,177 @@
+import gbl
+import helpers as hp
+import numpy as np
+
+
+def get_access_links_and_uplinks():
+    """ Returns the links of the substrate network (with a bandwidth) around the leaf switches, i.e.
+    Tuple(host_x_leaf, host_x_access_link, leaf_x_uplinks); the name of the leaf switch of every
+    substrate host (by host name), the link between every substrate host (or its host switch) and
+    its leaf switch (the 'access' link, as in gbl.SWITCH_PAIR_x_BW), and the links between every
+    leaf switch and the switches above it (the 'uplinks'), whatever the topology is. """
+    leaf_names = set(leaf.name for leaf in gbl.LEAF_SWITCHES)
+    # The node at the host's end of its access link; the host switch if there is one.
+    node_x_host = {host.name: host for host in gbl.HOSTS}
+    if hp.uses_host_switches():
+        for host in gbl.HOSTS:
+            node_x_host[host.host_switch_attached.name] = host
+
+    host_x_leaf = {}
+    host_x_access_link = {}
+    leaf_x_uplinks = {name: [] for name in leaf_names}
+    for (node1, node2, bw_config_key) in gbl.TOPOLOGY.get_links():
+        if bw_config_key is None:
+            continue
+        for (node, other) in ((node1, node2), (node2, node1)):
+            if node.name not in leaf_names:
+                continue
+            if other.name in node_x_host:
+                host = node_x_host[other.name]
+                host_x_leaf[host.name] = node.name
+                host_x_access_link[host.name] = (node.name, other.name)
+            elif other.name not in leaf_names:
+                leaf_x_uplinks[node.name].append((node.name, other.name))
+    return (host_x_leaf, host_x_access_link, leaf_x_uplinks)
+
+
+class LeafCapacityTree:
+    """
+    The residual capacities of the substrate network aggregated up the hierarchy of the fabric:
+    substrate hosts, leaf switches (with all the hosts under them), and the switches above the leaf
+    switches (the spine switches; the aggregation switches in the three-tier topologies). It is
+    updated every time a VNR is mapped onto (or removed from) the substrate network, and lets the
+    VNE algorithms rule out all the substrate hosts under a leaf switch in one check (see
+    `get_feasible_leaves`), instead of checking every host under it.
+
+    All the hosts under a leaf switch share its uplinks; so a virtual link from a substrate host under
+    the leaf switch to a host under another leaf switch is limited by the leaf switch's uplinks, and
+    beyond them by the other links of the spine switches. The bandwidth of a link is shared by both
+    its directions (as in gbl.SWITCH_PAIR_x_BW), so the uplink and downlink residuals are the same.
+
+    Attributes
+    ----------
+    leaf_max_cpu : np.ndarray
+        The largest remaining cpu limit of a substrate host under every leaf switch.
+    leaf_max_access_bw : np.ndarray
+        The largest residual bandwidth of the access link of a substrate host under every leaf switch.
+    spine_x_bw : Dict[str, int]
+        The total residual bandwidth of the links of every spine switch, by switch name.
+    leaf_crossing_bw : np.ndarray
+        The most bandwidth that the virtual links from the hosts under every leaf switch to the hosts
+        under other leaf switches can have together; i.e. the sum over the uplinks of the smaller of
+        the residual bandwidth of the uplink, and that of the other links of its spine switch.
+    leaf_max_crossing_bw : np.ndarray
+        The most bandwidth that a single (unsplit) such virtual link can have; i.e. the largest of the
+        above over the uplinks of every leaf switch.
+    All the arrays are in the order of gbl.LEAF_SWITCHES.
+    """
+
+    def __init__(self):
+        (host_x_leaf, self.host_x_access_link,
+         leaf_x_uplinks) = get_access_links_and_uplinks()
+        self.leaf_name_x_index = {leaf.name: i for (
+            i, leaf) in enumerate(gbl.LEAF_SWITCHES)}
+        self.host_x_index = {host: i for (i, host) in enumerate(gbl.HOSTS)}
+        # Index of the leaf switch of every substrate host, in the order of gbl.HOSTS.
+        self.host_leaf_indices = np.array(
+            [self.leaf_name_x_index[host_x_leaf[host.name]] for host in gbl.HOSTS])
+        self.leaf_x_hosts = [[] for _ in gbl.LEAF_SWITCHES]
+        for host in gbl.HOSTS:
+            self.leaf_x_hosts[self.leaf_name_x_index[host_x_leaf[host.name]]].append(
+                host)
+        self.leaf_x_uplinks = [leaf_x_uplinks[leaf.name]
+                               for leaf in gbl.LEAF_SWITCHES]
+        spine_names = set(
+            spine for uplinks in self.leaf_x_uplinks for (_, spine) in uplinks)
+        self.spine_x_links = {spine: [] for spine in spine_names}
+        for (node1, node2) in gbl.SWITCH_PAIR_x_BW:
+            if node1 in spine_names:
+                self.spine_x_links[node1].append((node1, node2))
+        self.spine_x_leaf_indices = {spine: set() for spine in spine_names}
+        for (i, uplinks) in enumerate(self.leaf_x_uplinks):
+            for (_, spine) in uplinks:
+                self.spine_x_leaf_indices[spine].add(i)
+
+        num_leaves = len(gbl.LEAF_SWITCHES)
+        self.leaf_max_cpu = np.zeros(num_leaves)
+        self.leaf_max_access_bw = np.zeros(num_leaves)
+        self.leaf_crossing_bw = np.zeros(num_leaves)
+        self.leaf_max_crossing_bw = np.zeros(num_leaves)
+        self.spine_x_bw = {}
+        self._update_leaves(range(num_leaves))
+
+    def _update_leaves(self, leaf_indices):
+        """ Updates the aggregates of the leaf switches, the spine switches above them, and then the
+        crossing bandwidths of all the leaf switches under these spine switches. """
+        spine_names = set()
+        for i in leaf_indices:
+            hosts = self.leaf_x_hosts[i]
+            self.leaf_max_cpu[i] = max(host.cpu_limit for host in hosts)
+            self.leaf_max_access_bw[i] = max(
+                gbl.SWITCH_PAIR_x_BW[self.host_x_access_link[host.name]] for host in hosts)
+            spine_names.update(spine for (_, spine) in self.leaf_x_uplinks[i])
+        crossing_leaf_indices = set()
+        for spine in spine_names:
+            self.spine_x_bw[spine] = sum(
+                max(gbl.SWITCH_PAIR_x_BW[link], 0) for link in self.spine_x_links[spine])
+            crossing_leaf_indices.update(self.spine_x_leaf_indices[spine])
+        for i in crossing_leaf_indices:
+            crossing_bws = [0]
+            for (leaf, spine) in self.leaf_x_uplinks[i]:
+                uplink_bw = max(gbl.SWITCH_PAIR_x_BW[(leaf, spine)], 0)
+                crossing_bws.append(
+                    min(uplink_bw, self.spine_x_bw[spine] - uplink_bw))
+            self.leaf_crossing_bw[i] = sum(crossing_bws)
+            self.leaf_max_crossing_bw[i] = max(crossing_bws)
+
+    def update(self, substrate_hosts):
+        """ Updates the tree after a VNR has been mapped onto (or removed from) the substrate hosts;
+        the paths of its virtual links only go through the access links and uplinks of these hosts
+        and their leaf switches, and the links of the spine switches above them.
+        substrate_hosts: List of the substrate hosts of the VNR.
+        """
+        self._update_leaves(set(
+            self.host_leaf_indices[self.host_x_index[host]] for host in substrate_hosts))
+
+    def get_feasible_leaves(self, cpu_req, neighbor_links):
+        """ Returns whether a virtual host may be mapped onto some substrate host under every leaf
+        switch (a NumPy array of bools, in the order of gbl.LEAF_SWITCHES). The leaf switches ruled
+        out have no substrate host with more remaining cpu than the virtual host, or not enough
+        residual bandwidth on the access links or the uplinks for the virtual links of the virtual
+        host; they would fail these checks in `vne_algorithms._greedy_vne_embedding` for all their
+        substrate hosts. Only upper bounds are used, so no feasible substrate host is ruled out.
+        cpu_req: The cpu requirement of the virtual host.
+        neighbor_links: List[Tuple(SubstrateHost, int)] of the substrate hosts of the mapped
+            neighbors of the virtual host, and the bandwidth requirements of the virtual links with them.
+        """
+        is_feasible = self.leaf_max_cpu > cpu_req
+        if not neighbor_links:
+            return is_feasible
+        bw_reqs = np.array([bw_req for (_, bw_req) in neighbor_links])
+        neighbor_leaf_indices = self.host_leaf_indices[[
+            self.host_x_index[substrate_host] for (substrate_host, _) in neighbor_links]]
+        # All the virtual links go through the access link of the substrate host.
+        is_feasible &= self.leaf_max_access_bw >= bw_reqs.sum()
+        # The virtual links to the neighbors under other leaf switches go through the uplinks.
+        crossing_bw_reqs = bw_reqs[:, None] * (neighbor_leaf_indices[:, None] != np.arange(
+            len(self.leaf_max_cpu))[None, :])
+        is_feasible &= crossing_bw_reqs.sum(axis=0) <= self.leaf_crossing_bw
+        if hp.get_routing_mode() != "multipath":
+            is_feasible &= crossing_bw_reqs.max(
+                axis=0) <= self.leaf_max_crossing_bw
+        return is_feasible
+
+
+def get_capacity_tree():
+    """ Returns the leaf capacity tree of the substrate network, creating it on first use; it is kept
+    up to date by `update_capacity_tree`. """
+    if gbl.CAPACITY_TREE is None:
+        gbl.CAPACITY_TREE = LeafCapacityTree()
+    return gbl.CAPACITY_TREE
+
+
+def update_capacity_tree(substrate_hosts):
+    """ Updates the leaf capacity tree (if created) after a VNR has been mapped onto, or removed from,
+    the substrate hosts. """
+    if gbl.CAPACITY_TREE is not None:
+        gbl.CAPACITY_TREE.update(substrate_hosts)
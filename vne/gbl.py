@@ -20,7 +20,8 @@ HOSTNAME_x_HOST = {}
 # All the spine layer switches created in the spine-leaf topology.
 # Example: [<__main__.Switch object at 0x7f9bccbf1e10>, <__main__.Switch object at 0x7f9b8daa7340>]
 SPINE_SWITCHES = []
-# All the leaf layer switches created in the spine-leaf topology.
+# All the leaf layer switches created in the spine-leaf topology; in the other topologies, the
+# switches which the substrate hosts are attached to (the edge/access switches).
 # Example: [<__main__.Switch object at 0x7f9b8daa7310>, <__main__.Switch object at 0x7f9b8daa73d0>]
 LEAF_SWITCHES = []
 # All the host switches created in the spine-leaf topology.
@@ -34,17 +35,27 @@ HOSTS = []
 # Number of hosts connected to every leaf switch. This variable is from user as
 # hl_factor argument, and populated.
 NUM_HOSTS_PER_LEAF_SWITCH = 1
+# Number of leaf switches under the subnet of every spine switch; the ll_factor argument.
+NUM_LEAF_SWITCHES_PER_SPINE_SWITCH = 1
+
+# The topology provider (topologies.TopologyProvider) of the substrate network, which gives its
+# switches, links, forwarding rules and the path between hosts. Example: SpineLeafTopology.
+TOPOLOGY = None
+
+# The addressing scheme (addressing.AddressingScheme) which gives the IP subnets of switches
+# and hosts from their indices in the topology.
+ADDRESSING = None
 
 
 # Mapping of spine layer 'ip subnet' and the 'Switch' object. 'x' denotes 'mapping of'.
-# Example: {'10': Switch('s1_1'), '11': Switch('s1_2'), '12': Switch('s1_3')}
+# Example: {'10.0.0.0/8': Switch('s1_1'), '11.0.0.0/8': Switch('s1_2'), '12.0.0.0/8': Switch('s1_3')}
 SPINE_LAYER_IP_SUBNET_x_SWITCH = {}
 # Mapping of leaf layer 'ip subnet' and the 'Switch' object.
-# Example: {'10.0': Switch('s2_1'), '10.1': Switch('s2_2'), '11.0': Switch('s2_3'),
-# '11.1': Switch('s2_4'), '12.0': Switch('s2_5'), '12.1': Switch('s2_6')}
+# Example: {'10.0.0.0/16': Switch('s2_1'), '10.1.0.0/16': Switch('s2_2'), '11.0.0.0/16': Switch('s2_3'),
+# '11.1.0.0/16': Switch('s2_4'), '12.0.0.0/16': Switch('s2_5'), '12.1.0.0/16': Switch('s2_6')}
 LEAF_LAYER_IP_SUBNET_x_SWITCH = {}
 # Mapping of host switches 'ip subnet' and the 'Switch' object.
-# Example: {'10.0.0': Switch('sh1'), '10.0.1': Switch('sh2'), '10.1.0': Switch('sh3')}
+# Example: {'10.0.0.0/24': Switch('sh1'), '10.0.1.0/24': Switch('sh2'), '10.1.0.0/24': Switch('sh3')}
 HOST_LAYER_IP_SUBNET_x_SWITCH = {}
 
 
@@ -74,8 +85,42 @@ ORIGINAL_SWITCH_PAIR_x_BW = {}
 # have been mapped and served in the topology network.
 MAPPED_VNRS = []
 
+# Number of VNRs mapped so far, including the ones which have been removed from the network
+# since. Used to give every mapped VNR a unique VNR number (and hence unique host names).
+NUM_VNRS_MAPPED_SO_FAR = 0
+
+# Pool (allocators.IdPool) of the isolation ids (e.g. VLAN IDs) given to the mapped VNRs. Ids
+# of VNRs removed from the network are given back to the pool and reused.
+ISOLATION_ID_POOL = None
+
+# Index (allocators.ResidualCpuIndex) of the substrate hosts by their remaining cpu limit, used by
+# the worst-fit and best-fit algorithms; created on first use.
+RESIDUAL_CPU_INDEX = None
+
+# The paths between the substrate hosts as arrays of link ids (path_index.PathLinkIndex), for the
+# vectorized bandwidth checks of the VNE algorithms; created on first use.
+PATH_LINK_INDEX = None
+
+# The residual capacities of the substrate network aggregated per leaf switch and spine switch
+# (capacity_tree.LeafCapacityTree), for ruling out whole leaf switches in the VNE algorithms;
+# created on first use.
+CAPACITY_TREE = None
+
+# The admission filter (admission.AdmissionFilter) which rejects the VNRs that obviously cannot be
+# mapped before the VNE algorithm is run; None if the admission control is not enabled.
+ADMISSION_FILTER = None
+
+# The cache (admission.FailureCache) of the VNRs which have failed to be mapped, so that the VNRs
+# dominating them are rejected right away; None if the failure cache is not enabled.
+FAILURE_CACHE = None
+
 # The user configurable values obtained from `configurations.json` file populate this variable.
 CFG = None
 
 # Seed value used for generating the random numbers for topology.
 SEED = None
+
+# Names of the substrate hosts whose cpu limit has changed (due to virtual hosts being mapped onto
+# them, or removed from them) since their cgroups were last updated. Only these are updated in
+# `helpers.update_cpu_limits_of_substrate_hosts_after_vnr_mapping`.
+CPU_LIMIT_CHANGED_HOST_NAMES = set()
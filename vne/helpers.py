@@ -1,27 +1,40 @@
 import gbl
 from mininet.cli import CLI
 from substrate import SubstrateHost
+import substrate
 import networkx as nx
+import numpy as np
+import heapq
+import itertools
+import vnr_ranking
+from allocators import ResidualCpuIndex
 import random
+import ipaddress
+import os
 
 
-def get_output_port_for_spine_switches(dst_16_bit_subnet):
+def get_spine_index_of_leaf_switch(leaf_switch):
+    """ Returns the index of the spine switch under whose subnet the leaf switch is.
+    Example: 1 for 's2_3' in the topology (sl=3, ll=2, hl=2). """
+    return leaf_switch.index // gbl.NUM_LEAF_SWITCHES_PER_SPINE_SWITCH
+
+
+def get_output_port_for_spine_switches(dst_leaf_index):
     """ Rules for spine (layer 1) switches.
-    dst_16_bit_subnet: Destination IP subnet (16 bits) in dotted decimal format. Example: '12.0'. """
-    leaf_switch = gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH[dst_16_bit_subnet]
-    port_of_leaf_switch = gbl.LEAF_SWITCHES.index(leaf_switch) + 1
-    return port_of_leaf_switch
+    dst_leaf_index: Index of the leaf switch (in gbl.LEAF_SWITCHES) under which the destination
+    is. Example: 4 (for 's2_5'). """
+    # Every spine switch is connected to the leaf switches in order, from port 1 onwards.
+    return dst_leaf_index + 1
 
 
-def get_output_port_for_leaf_switches_towards_spine(ll_switch, dst_ip):
+def get_output_port_for_leaf_switches_towards_spine(ll_switch, dst_spine_index):
     """ Rules for leaf (layer 2) switches, where packets are travelling upwards.
     Gets the output port number of leaf switch, for packets that need to be 
     forwarded upwards from the leaf layer, i.e. towards the spine switches.
     ll_switch: Leaf layer switch for which we are finding output port number.
-    dst_ip: Destination IP address in dotted decimal format. Example: '12.1.1.0/24'. """
-    dst_8_bit_subnet = int(dst_ip.split(".")[0])
-    src_8_bit_subnet = int(ll_switch.ip_subnet.split(".")[0])
-    # We consider the larger of the src and dst subnets to find the spine layer
+    dst_spine_index: Index of the spine switch under whose subnet the destination is. Example: 2 
+    (for destination IP '12.1.1.0/24'). """
+    # We consider the larger of the src and dst spine indices to find the spine layer
     # switch to forward the packet. Reason for doing this (and not just basing
     # the decision off of destination address) is because if we decide the spine
     # layer switch only based on the destination address, then the request & reply
@@ -31,24 +44,22 @@ def get_output_port_for_leaf_switches_towards_spine(ll_switch, dst_ip):
     # h6 sends reply to h1, then the dst_ip is considered of h1, which is under
     # 10 subnet, and would now route via s1_1. Hence, to avoid this problem, we make
     # the decision of selecting spine switch based on the larger of the two addresses.
-    subnet = max(dst_8_bit_subnet, src_8_bit_subnet)
-    spine_switch = gbl.SPINE_LAYER_IP_SUBNET_x_SWITCH[str(subnet)]
-    port = gbl.SPINE_SWITCHES.index(spine_switch) + 1
-    return port
+    spine_index = max(dst_spine_index, get_spine_index_of_leaf_switch(ll_switch))
+    return spine_index + 1
 
 
-def get_output_port_for_leaf_switches_towards_hosts(dst_ip, num_sl_connections):
+def get_output_port_for_leaf_switches_towards_hosts(dst_host_index, num_sl_connections):
     """ Rules for leaf (layer 2) switches, where packets are travelling downwards.
     Gets the output port number of leaf switch, for packets that need to be 
     forwarded downwards from the leaf layer, i.e. towards the hosts. 
-    dst_ip: Destination IP address in dotted decimal format. 
+    dst_host_index: Index of the destination substrate host under its leaf switch. Example: 1.
     num_sl_connections: Number of spine layer connections; i.e. the number of spine layer 
     switches that this leaf layer switch is connected to. In the case of spine leaf 
     topology this will be the number of spine switches since every spine switch is connected 
     to every leaf switch. """
     # Reason for adding `num_sl_connections` is that the first n port numbers (of the
     # leaf layer switch) will be consumed by the connections with spine layer switches.
-    return int(dst_ip.split(".")[2]) + 1 + num_sl_connections
+    return dst_host_index + 1 + num_sl_connections
 
 
 def add_flow_ip(net, switch, priority, nw_dst, output_port):
@@ -62,27 +73,174 @@ def add_flow_ip(net, switch, priority, nw_dst, output_port):
     CLI.do_sh(net, command)
 
 
+def add_meter(net, switch, meter_id, rate_kbps):
+    """ ovs-ofctl command to add an OpenFlow meter (with a single drop band) to the
+    specified OpenFlow Switch. Meters need OpenFlow 1.3, hence the '-O OpenFlow13'.
+    net: Mininet object.
+    switch: OpenFlow Switch in mininet, expected in string format. Example: 'sh1'.
+    meter_id: Meter identifier, unique on this switch.
+    rate_kbps: Rate (in kbps) above which packets metered by this meter are dropped. """
+    command = "ovs-ofctl -O OpenFlow13 add-meter {} meter={},kbps,band=type=drop,rate={}".format(
+        switch, str(meter_id), str(rate_kbps))
+    CLI.do_sh(net, command)
+
+
+def get_bw_enforcement_mode():
+    """ Returns how the bandwidth of virtual links is enforced, as specified in the
+    configurations file. Either 'htb' (tc HTB qdisc on every virtual host interface,
+    which is the default) or 'meter' (OpenFlow meters on the host switches). """
+    return gbl.CFG.get("bw_enforcement", "htb")
+
+
+def is_model_only():
+    """ Returns whether the run is 'model-only', as specified by the 'model_only' value in the
+    configurations file; i.e. the VNRs are mapped on the model of the substrate network only,
+    without creating (or configuring) the mininet network. """
+    return gbl.CFG.get("model_only", False)
+
+
+def is_cpu_limit_enforced(host_kind):
+    """ Returns whether the cpu limits of hosts of the given kind are enforced using cgroups
+    (CPULimitedHost), as specified by the 'cpu_limited_hosts' list in the configurations file.
+    Otherwise the hosts are plain (namespace only) mininet hosts, and their cpu limits are only
+    modeled, i.e. still accounted for in the VNE algorithms, but not enforced.
+    host_kind: Either 'substrate' or 'virtual'. """
+    return host_kind in gbl.CFG.get("cpu_limited_hosts", ["substrate", "virtual"])
+
+
+def get_enforced_and_modeled_guarantees():
+    """ Returns Tuple(enforced, modeled) where 'enforced' is the list of resource guarantees which
+    are enforced in the emulated network, and 'modeled' is the list of those which are only
+    accounted for in the model (and not enforced).
+    Example: (['bandwidth (htb)', 'substrate host cpu'], ['virtual host cpu']) """
+    if is_model_only():
+        return [], ["bandwidth", "substrate host cpu", "virtual host cpu"]
+    enforced = ["bandwidth ({})".format(get_bw_enforcement_mode())]
+    modeled = []
+    for host_kind in ["substrate", "virtual"]:
+        if is_cpu_limit_enforced(host_kind):
+            enforced.append("{} host cpu".format(host_kind))
+        else:
+            modeled.append("{} host cpu".format(host_kind))
+    return enforced, modeled
+
+
+def get_routing_mode():
+    """ Returns the routing mode of the virtual links, as specified by the 'routing' value in the
+    configurations file. Either 'static' (the default), where every virtual link follows the fixed
+    path between its substrate hosts, as per the substrate flow entries; or 'load-aware', where the
+    spine switch of the path is selected per virtual link, based on the residual bandwidth; or
+    'multipath', where the bandwidth of a virtual link is split over the paths through several
+    spine switches. """
+    return gbl.CFG.get("routing", "static")
+
+
+def uses_host_switches():
+    """ Returns whether every substrate host is attached to its leaf switch through a host switch of
+    its own (the 'modified' spine-leaf topology, which is the default), as specified by the
+    'host_switches' value in the configurations file. Otherwise the substrate hosts, and the virtual
+    hosts mapped onto them, are attached directly to the ports of the leaf switch; and the tagging
+    (and untagging) of VNR traffic for isolation is done on the leaf switches. Only the spine-leaf
+    topology has host switches (see topologies.py). """
+    return gbl.CFG.get("host_switches", True) and \
+        (gbl.TOPOLOGY is None or gbl.TOPOLOGY.supports_host_switches)
+
+
+def get_isolation_ingress_match():
+    """ OpenFlow match (in ovs-ofctl format) for packets of a virtual host which are not tagged
+    yet. In the 'mac' scheme, the destination MAC address (of the dummy default router) is also
+    matched, since tagging rewrites it; so that a tagged packet (e.g. resubmitted to the flow
+    table of a leaf switch) is never tagged again. """
+    if get_vnr_isolation_scheme() == "mac":
+        return "dl_vlan=0xffff,dl_dst={}".format(DEFAULT_ROUTER_MAC)
+    return "dl_vlan=0xffff"
+
+
+def get_isolation_ingress_forward_action():
+    """ OpenFlow action (in ovs-ofctl format) which forwards a packet of a virtual host once it has
+    been tagged; out of the uplink (port 1) of the host switch, or when there are no host switches,
+    through the flow table of the leaf switch itself (which routes it like any other packet). """
+    if uses_host_switches():
+        return "output:1"
+    return "resubmit(,0)"
+
+
+def get_vnr_isolation_scheme():
+    """ Returns how the traffic of every VNR is tagged to isolate it from the other VNRs, as
+    specified in the configurations file. Either 'vlan' (VLAN tag; at most 4094 VNRs at a time,
+    which is the default) or 'mac' (destination MAC address rewritten to a locally administered
+    address carrying the VNR's isolation id; up to 2^24 - 1 VNRs at a time). """
+    return gbl.CFG.get("vnr_isolation", "vlan")
+
+
+def get_max_isolation_id():
+    """ Returns the largest isolation id that the configured VNR isolation scheme can carry. """
+    if get_vnr_isolation_scheme() == "mac":
+        return 2 ** 24 - 1
+    return 4094
+
+
+def _get_isolation_mac(isolation_id):
+    """ Locally administered MAC address carrying the isolation id. Example: '02:00:00:00:01:0a'
+    for isolation id 266. """
+    return "02:00:" + ":".join("{:02x}".format((isolation_id >> shift) & 0xff) for shift in (24, 16, 8, 0))
+
+
+def get_isolation_tag_actions(isolation_id):
+    """ OpenFlow actions (in ovs-ofctl format) which tag a packet of a virtual host with the
+    isolation id of its VNR. Example: 'mod_vlan_vid:3'. """
+    if get_vnr_isolation_scheme() == "mac":
+        return "mod_dl_dst:{}".format(_get_isolation_mac(isolation_id))
+    return "mod_vlan_vid:{}".format(str(isolation_id))
+
+
+def get_isolation_tag_match(isolation_id):
+    """ OpenFlow match (in ovs-ofctl format) for packets tagged with the given isolation id.
+    Example: 'dl_vlan=3'. """
+    if get_vnr_isolation_scheme() == "mac":
+        return "dl_dst={}".format(_get_isolation_mac(isolation_id))
+    return "dl_vlan={}".format(str(isolation_id))
+
+
+def get_isolation_untag_actions():
+    """ OpenFlow actions (in ovs-ofctl format, with a trailing comma) which remove the isolation
+    tag from a packet before it is delivered to the virtual host. Nothing needs to be removed
+    for the 'mac' scheme since the destination MAC address is rewritten on delivery anyway. """
+    if get_vnr_isolation_scheme() == "mac":
+        return ""
+    return "strip_vlan,"
+
+
 def get_default_router_for_host(host):
     """ Generate a dummy IP of a default router for every host, such that the 
-    default gateway is in the same subnet as the host. 
-    host_str: Host expected in string format. Example: 'h1'."""
-    ip_split = host.ip_addr.split(".")
-    ip_split[-1] = "254"
-    return ".".join(ip_split)
+    default gateway is in the same subnet as the host. It is the address just before
+    the broadcast address of the subnet, e.g. '10.0.1.254' for '10.0.1.0/24'. Virtual
+    hosts use the subnet of the substrate host they are mapped onto.
+    host: Host object. Example: SubstrateHost('h1')."""
+    ip_subnet = getattr(host, "substrate_host", host).ip_addr
+    network = ipaddress.ip_network(ip_subnet, strict=False)
+    return str(network.broadcast_address - 1)
+
+
+# MAC address of the dummy default router of every host (see `add_arp_entry_for_host`).
+DEFAULT_ROUTER_MAC = "11:22:33:44:55:66"
 
 
 def add_arp_entry_for_host(host, net):
     """ Add entry in ARP table of host so that it doesn't send ARP request for 
     the default router. """
     default_router_ip = get_default_router_for_host(host)
-    net[host.name].cmd('arp -s {} 11:22:33:44:55:66'.format(default_router_ip))
+    net[host.name].cmd('arp -s {} {}'.format(
+        default_router_ip, DEFAULT_ROUTER_MAC))
 
-    for i in range(0, 254):
-        ip_split = host.ip_addr.split(".")
-        ip_split[-1] = str(i)
-        ip_addr = ".".join(ip_split)
-        if host.ip_addr != ip_addr:
-            net[host.name].cmd('arp -s {} 11:22:33:44:55:66'.format(ip_addr))
+    # All the addresses of the subnet, except the default router and broadcast addresses.
+    network = ipaddress.ip_network(
+        getattr(host, "substrate_host", host).ip_addr, strict=False)
+    for i in range(0, network.num_addresses - 2):
+        ip_addr = str(network.network_address + i)
+        if host.ip_addr.split("/")[0] != ip_addr:
+            net[host.name].cmd('arp -s {} {}'.format(
+                ip_addr, DEFAULT_ROUTER_MAC))
 
 
 def add_arp_flood_entry(switch, net):
@@ -93,31 +251,158 @@ def add_arp_flood_entry(switch, net):
 
 
 def show_flow_table_entries(net):
-    """ Shows the flow table entries of all the spine and leaf layer switches. """
-    for switch in gbl.SPINE_SWITCHES + gbl.LEAF_SWITCHES + gbl.HOST_SWITCHES:
+    """ Shows the flow table entries of all the switches in the topology. """
+    for switch in gbl.TOPOLOGY.get_switches():
         print("The flow table entries in switch {}:\n".format(switch.name))
         CLI.do_sh(net, "ovs-ofctl dump-flows {}".format(switch.name))
         print("-----------------------------------------------------------------\n")
 
-    for switch in gbl.SPINE_SWITCHES + gbl.LEAF_SWITCHES + gbl.HOST_SWITCHES:
+    for switch in gbl.TOPOLOGY.get_switches():
         print(switch.name, switch.next_port_number)
 
 
-def update_cpu_limits_of_substrate_hosts_after_vnr_mapping(net):
-    """ Update the cpu limits for substrate hosts after VNR mapping is performed."""
-    for host in gbl.HOSTS:
+def change_cpu_limit_of_substrate_host(substrate_host, cpu_change):
+    """ Changes the (remaining) cpu limit of the substrate host by `cpu_change`, and marks the
+    substrate host as changed, so that its cgroup is updated by the next call of
+    `update_cpu_limits_of_substrate_hosts_after_vnr_mapping`.
+    cpu_change: Negative when a virtual host is mapped onto the substrate host, and positive when
+        a virtual host is removed from it. Example: -20
+    """
+    substrate_host.cpu_limit = substrate_host.cpu_limit + cpu_change
+    gbl.CPU_LIMIT_CHANGED_HOST_NAMES.add(substrate_host.name)
+    if gbl.RESIDUAL_CPU_INDEX is not None:
+        gbl.RESIDUAL_CPU_INDEX.update(substrate_host)
+    # The cpu released may be enough for the VNRs which have failed so far (see
+    # `admission.clear_failure_cache`, which cannot be imported here).
+    if cpu_change > 0 and gbl.FAILURE_CACHE is not None:
+        gbl.FAILURE_CACHE.clear()
+
+
+def get_residual_cpu_index():
+    """ Returns the index of the substrate hosts by their remaining cpu limit, creating it on first
+    use; it is kept up to date by `change_cpu_limit_of_substrate_host`. """
+    if gbl.RESIDUAL_CPU_INDEX is None:
+        gbl.RESIDUAL_CPU_INDEX = ResidualCpuIndex(gbl.HOSTS)
+    return gbl.RESIDUAL_CPU_INDEX
+
+
+def _write_cgroup_cpu_limits(cgroup_limits):
+    """ Writes the CFS period and quota of all the given cgroups directly to the cgroup filesystem,
+    in one go, instead of running `cgset` (and `cgget`) commands for every value as `setCPUFrac` does.
+    cgroup_limits: List of Tuple(cgroup directory, period, quota).
+    """
+    for (cgroup_dir, period, quota) in cgroup_limits:
+        if os.path.isfile(os.path.join(cgroup_dir, "cpu.cfs_quota_us")):
+            with open(os.path.join(cgroup_dir, "cpu.cfs_period_us"), "w") as f:
+                f.write(str(period))
+            with open(os.path.join(cgroup_dir, "cpu.cfs_quota_us"), "w") as f:
+                f.write(str(quota))
+        else:
+            with open(os.path.join(cgroup_dir, "cpu.max"), "w") as f:
+                f.write("{} {}".format("max" if quota < 0 else quota, period))
+
+
+def update_cpu_limits_of_substrate_hosts_after_vnr_mapping(net, substrate_hosts=None):
+    """ Update the cpu limits for substrate hosts after VNR mapping is performed. Only the substrate
+    hosts whose cpu limit has changed since the last update are updated, and the cgroups of all of
+    them are written in one batch.
+    substrate_hosts: If given, only these substrate hosts are updated (if changed); e.g. the substrate
+        hosts used by a single VNR, when updating after every VNR is mapped or removed.
+    """
+    host_names = gbl.CPU_LIMIT_CHANGED_HOST_NAMES
+    if net is None or not is_cpu_limit_enforced("substrate"):
+        # No mininet network (model-only run), or substrate hosts are plain hosts without
+        # cgroups; their cpu limits are only modeled.
+        gbl.CPU_LIMIT_CHANGED_HOST_NAMES.clear()
+        return
+    if substrate_hosts is not None:
+        host_names = host_names & set(host.name for host in substrate_hosts)
+    cgroup_limits = []
+    for host_name in sorted(host_names):
+        host = gbl.HOSTNAME_x_HOST[host_name]
         cpu_f_host = host.cpu_limit / SubstrateHost.cpu_all_hosts
-        net[host.name].setCPUFrac(f=cpu_f_host, sched='cfs')
+        cgroup_dir = get_cgroup_cpu_dir(host_name)
+        if cgroup_dir is None:
+            # Cgroup not found in the filesystem (e.g. mounted elsewhere); let mininet set it.
+            net[host_name].setCPUFrac(f=cpu_f_host, sched='cfs')
+        else:
+            # Using mininet's own computation of the CFS period and quota for the fraction.
+            _, _, period, quota = net[host_name].cfsInfo(cpu_f_host)
+            cgroup_limits.append((cgroup_dir, period, quota))
         print("\nUpdated the cpu limit of {} to {}%, i.e. {} units.".format(
-            host.name, f'{cpu_f_host:.4f}', host.cpu_limit))
-
-
-def create_vnrs(num_vnrs=5, min_nodes=2, max_nodes=6, probability=0.4, min_cpu=10, max_cpu=50, min_bw=1, max_bw=5):
+            host_name, f'{cpu_f_host:.4f}', host.cpu_limit))
+    _write_cgroup_cpu_limits(cgroup_limits)
+    gbl.CPU_LIMIT_CHANGED_HOST_NAMES.difference_update(host_names)
+
+
+# Directories under which the cpu cgroups of hosts can be found; cgroup v1 (as created by mininet
+# using `cgcreate`) with either of the controller mount names, and then cgroup v2 (unified).
+CGROUP_CPU_ROOT_DIRS = ["/sys/fs/cgroup/cpu,cpuacct",
+                        "/sys/fs/cgroup/cpu", "/sys/fs/cgroup"]
+
+
+def get_cgroup_cpu_dir(host_name):
+    """ Returns the directory of the cpu cgroup of the host (in the cgroup filesystem), or None if
+    the host doesn't have a cpu cgroup, e.g. if it is not a CPULimitedHost.
+    host_name: Name of the host, which is also the name of its cgroup. Example: 'h1'. """
+    for root_dir in CGROUP_CPU_ROOT_DIRS:
+        cgroup_dir = os.path.join(root_dir, host_name)
+        if os.path.isfile(os.path.join(cgroup_dir, "cpu.cfs_quota_us")) or \
+                os.path.isfile(os.path.join(cgroup_dir, "cpu.max")):
+            return cgroup_dir
+    return None
+
+
+def read_cgroup_cpu_quota_and_period(host_name):
+    """ Reads the CFS quota and period (in microseconds) configured for the host directly from the
+    cgroup filesystem, and returns them as Tuple(quota, period). A quota of -1 means unlimited.
+    Returns None if the host doesn't have a cpu cgroup. """
+    cgroup_dir = get_cgroup_cpu_dir(host_name)
+    if cgroup_dir is None:
+        return None
+    if os.path.isfile(os.path.join(cgroup_dir, "cpu.cfs_quota_us")):
+        with open(os.path.join(cgroup_dir, "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(cgroup_dir, "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return quota, period
+    # cgroup v2 keeps both in 'cpu.max', as '<quota> <period>', where quota may be 'max'.
+    with open(os.path.join(cgroup_dir, "cpu.max")) as f:
+        quota, period = f.read().split()
+    return (-1 if quota == "max" else int(quota)), int(period)
+
+
+def read_cgroup_cpu_usage_us(host_name):
+    """ Reads the total CPU time (in microseconds) consumed so far by the processes of the host, from
+    the cgroup filesystem. Returns None if the host doesn't have a cpu cgroup. """
+    cgroup_dir = get_cgroup_cpu_dir(host_name)
+    if cgroup_dir is None:
+        return None
+    if os.path.isfile(os.path.join(cgroup_dir, "cpuacct.usage")):
+        with open(os.path.join(cgroup_dir, "cpuacct.usage")) as f:
+            return int(f.read()) / 1000
+    with open(os.path.join(cgroup_dir, "cpu.stat")) as f:
+        for line in f:
+            (key, value) = line.split()
+            if key == "usage_usec":
+                return int(value)
+    return None
+
+
+def create_vnrs(num_vnrs=5, min_nodes=2, max_nodes=6, probability=0.4, min_cpu=10, max_cpu=50, min_bw=1, max_bw=5, generator="networkx"):
+    """ Creates the list of VNRs, each as Tuple(num_nodes, cpu_reqs, link_reqs).
+    generator: 'networkx' (the default), where every VNR of the same size has the same (Erdos-Renyi)
+        graph; or 'numpy', where every VNR has its own graph. With 'numpy', meant for large numbers
+        of VNRs, the VNRs are not created up front (nor printed); the generator which creates them
+        lazily, in batches, is returned instead (see `generate_vnrs`). """
     # Note: If you want a connected graph, do not give a probability of less than 0.1.
     random.seed(gbl.SEED)
 
     vnrs = []
     print("\nCreating VNRs...")
+    if generator == "numpy":
+        return generate_vnrs(num_vnrs, min_nodes, max_nodes, probability,
+                             min_cpu, max_cpu, min_bw, max_bw, seed=gbl.SEED)
     for req in range(num_vnrs):
         num_nodes = random.randint(min_nodes, max_nodes)
         g = nx.erdos_renyi_graph(
@@ -138,36 +423,135 @@ def create_vnrs(num_vnrs=5, min_nodes=2, max_nodes=6, probability=0.4, min_cpu=1
     return vnrs
 
 
-def rank_vnrs_in_order(vnr_list):
-    """ Orders/ranks VNRs in the VNR list to decide which VNR to serve before others.
-    Currently we are ranking them based on the ascending order of revenue generated
-    from them, but the flexibility to add other strategies of ranking can be plugged in here."""
-    return _rank_vnrs_in_ascending_order_of_revenue(vnr_list)
-
-
-def _rank_vnrs_in_ascending_order_of_revenue(vnr_list):
-    """ Orders/ranks VNRs in ascending order of their revenue. Revenue of a VNR is 
-    computed by summing the node weights (i.e. CRB requirements of all virtual host) and 
-    the edge weights (i.e. bandwidth requirement of all the links in the VNR)"""
-    def _get_node_weights(vnr):
-        (_, cpu_reqs, _) = vnr
-        return sum(cpu_reqs)
-
-    def _get_edge_weights(vnr):
-        (_, _, link_reqs) = vnr
-        edge_weights = 0
-        for (_, _, wt) in link_reqs:
-            edge_weights += wt
-        return edge_weights
+def generate_vnrs(num_vnrs=5, min_nodes=2, max_nodes=6, probability=0.4, min_cpu=10, max_cpu=50, min_bw=1, max_bw=5, seed=0, batch_size=1024):
+    """ Generates the VNRs lazily, one at a time, so that large workloads (e.g. a million VNRs)
+    never sit fully in memory. The VNRs are drawn with NumPy in batches of `batch_size`: the number
+    of nodes, the cpu requirements of the nodes, the edges (upper triangle of the adjacency matrix,
+    with every edge present with the given probability, over a random spanning tree so that every
+    VNR is connected) and the bandwidth requirements of the edges of all VNRs in the batch at once.
+    Every batch has its own random generator, seeded by (seed, batch number); so the VNRs are
+    reproducible for the same seed and batch size, and every VNR has its own random graph.
+    Yields Tuple(num_nodes, cpu_reqs, link_reqs) as in `create_vnrs`. """
+    # The possible edges (i, j), i < j, between the nodes of a VNR of max_nodes nodes; in the
+    # same order as the edges of the networkx graphs.
+    (edge_src, edge_dst) = np.triu_indices(max_nodes, k=1)
+    for (batch, start) in enumerate(range(0, num_vnrs, batch_size)):
+        # The full batch is always drawn (even if only its first VNRs are needed), so that the
+        # first VNRs are the same whatever the number of VNRs is.
+        rng = np.random.default_rng([seed, batch])
+        num_nodes = rng.integers(min_nodes, max_nodes + 1, size=batch_size)
+        cpu_reqs = rng.integers(min_cpu, max_cpu + 1,
+                                size=(batch_size, max_nodes))
+        edge_masks = rng.random((batch_size, len(edge_src))) < probability
+        # Every node j > 0 is also linked to a random node before it (a random spanning tree),
+        # so that every VNR is connected, as the VNE algorithms expect.
+        nodes = np.arange(1, max_nodes)
+        parents = (rng.random((batch_size, max_nodes - 1))
+                   * nodes).astype(np.int64)
+        tree_edges = parents*(2*max_nodes - parents - 1)//2 + (nodes - parents - 1)
+        edge_masks[np.arange(batch_size)[:, None], tree_edges] = True
+        # An edge is only present if both its nodes are in the VNR, i.e. if edge_dst < num_nodes.
+        edge_masks &= edge_dst < num_nodes[:, None]
+        bw_reqs = rng.integers(min_bw, max_bw + 1,
+                               size=(batch_size, len(edge_src)))
+        for r in range(min(batch_size, num_vnrs - start)):
+            mask = edge_masks[r]
+            link_reqs = list(zip((edge_src[mask] + 1).tolist(), (edge_dst[mask] + 1).tolist(),
+                                 bw_reqs[r, mask].tolist()))
+            yield (int(num_nodes[r]), cpu_reqs[r, :num_nodes[r]].tolist(), link_reqs)
+
+
+def create_vnr_stream(cfg_vnrs, seed):
+    """ Returns the VNRs as per the 'vnrs' configurations, as an iterable (see `create_vnrs`):
+    generated lazily (by `generate_vnrs`) with the 'numpy' generator, else a list. """
+    params = dict(num_vnrs=cfg_vnrs["num_vnrs"],
+                  min_nodes=cfg_vnrs["min_nodes"],
+                  max_nodes=cfg_vnrs["max_nodes"],
+                  probability=cfg_vnrs["probability"],
+                  min_cpu=cfg_vnrs["min_cpu"],
+                  max_cpu=cfg_vnrs["max_cpu"],
+                  min_bw=cfg_vnrs["min_bw"],
+                  max_bw=cfg_vnrs["max_bw"])
+    # The VNRs are generated with the seed in gbl.SEED.
+    gbl.SEED = seed
+    return create_vnrs(generator=cfg_vnrs.get("generator", "networkx"), **params)
+
+
+def _get_vnrs_with_ranking_keys(vnrs, strategy, attributes=None, batch_size=1024):
+    """ Yields Tuple(key, vnr) for the VNRs of a stream, with the keys of the ranking strategy. The
+    keys are computed with NumPy; on the given attributes of all the VNRs if any (e.g. those of a
+    VNR trace), else on those of every batch of `batch_size` VNRs as they are read from the stream. """
+    if attributes is not None:
+        yield from zip(vnr_ranking.get_window_ranking_keys(attributes, strategy).tolist(), vnrs)
+        return
+    vnrs = iter(vnrs)
+    while True:
+        batch = list(itertools.islice(vnrs, batch_size))
+        if not batch:
+            return
+        keys = vnr_ranking.get_window_ranking_keys(
+            vnr_ranking.get_vnr_attributes(batch), strategy)
+        yield from zip(keys.tolist(), batch)
+
+
+def rank_vnrs_in_window(vnrs, window_size, attributes=None):
+    """ Orders/ranks the VNRs of a stream (any iterable, e.g. `generate_vnrs` or a VNR trace) in
+    ascending order of the key of the ranking strategy in the configurations (see vnr_ranking.py),
+    but only within a look-ahead window: a heap of the
+    next `window_size` VNRs, out of which the VNR with the lowest key is served first. So the VNRs
+    are never all in memory, and the first VNR is served as soon as the window is filled, without
+    sorting the whole workload. With a window at least as large as the workload, the order is the
+    same as that of `rank_vnrs_in_order`. Returns an iterator over the ordered VNRs.
+    attributes: The attributes of all the VNRs (see `vnr_ranking.get_vnr_attributes`), if known up
+        front; e.g. `vnr_trace.VNRTrace.get_attributes`. Else the keys are computed for every batch
+        of VNRs read from the stream.
+    """
+    strategy = vnr_ranking.get_vnr_ranking_strategy()
+    print("\n\nOrdering/ranking VNRs within a window of {} VNRs...".format(
+        window_size))
+    heap = []
+    # The sequence number breaks the ties between VNRs of the same key in the order of the stream
+    # (as the stable sort of `rank_vnrs_in_order` does), and the VNRs themselves are never compared.
+    for (seq, (key, vnr)) in enumerate(_get_vnrs_with_ranking_keys(vnrs, strategy, attributes)):
+        # The window is the VNRs in the heap along with the one just read from the stream.
+        if len(heap) < window_size - 1:
+            heapq.heappush(heap, (key, seq, vnr))
+        else:
+            yield heapq.heappushpop(heap, (key, seq, vnr))[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def rank_vnrs_in_order(vnr_list, print_vnrs=True):
+    """ Orders/ranks VNRs in the VNR list to decide which VNR to serve before others, as per the
+    ranking strategy in the configurations ('vnr_ranking'); by default, in ascending order of the
+    revenue generated from them. The ranking strategies are in vnr_ranking.py, where other
+    strategies of ranking can be plugged in. The keys of all the VNRs are computed at once.
+    vnr_list: The VNRs; any iterable (e.g. `generate_vnrs`), as all of them are needed to rank them.
+    print_vnrs: Whether to print all the ordered VNRs; not advisable for large numbers of VNRs.
+    """
+    vnr_list = list(vnr_list)
+    strategy = vnr_ranking.get_vnr_ranking_strategy()
+    order = vnr_ranking.get_ranking_order(
+        vnr_ranking.get_vnr_attributes(vnr_list), strategy)
+    vnr_list = [vnr_list[i] for i in order.tolist()]
+    print("\n\nAfter ordering/ranking {} VNRs by {}...".format(
+        len(vnr_list), strategy))
+    if print_vnrs:
+        for vnr in vnr_list:
+            print(vnr)
+    return vnr_list
 
-    def _get_revenue(vnr):
-        return _get_node_weights(vnr) + _get_edge_weights(vnr)
 
-    vnr_list.sort(key=lambda vnr: _get_revenue(vnr))
-    print("\n\nAfter ordering/ranking VNRs by ascending order of revenue...")
-    for vnr in vnr_list:
-        print(vnr)
-    return vnr_list
+def rank_vnr_trace_in_order(trace):
+    """ Orders/ranks the VNRs of a trace (vnr_trace.VNRTrace) as `rank_vnrs_in_order` does. Only
+    the keys (computed with NumPy on the columns of the trace) and the order of the VNRs are computed
+    up front; returns an iterator which reads every VNR from the trace when it is to be served. """
+    strategy = vnr_ranking.get_vnr_ranking_strategy()
+    order = vnr_ranking.get_ranking_order(trace.get_attributes(), strategy)
+    print("\n\nOrdered/ranked {} VNRs of the trace {} by {}...".format(
+        len(trace), trace.path, strategy))
+    return (trace[i] for i in order.tolist())
 
 
 def get_bandwidth_limit_between_host_pair(host_pair, COPY_SWITCH_PAIR_x_BW):
@@ -189,17 +573,29 @@ def get_bandwidth_limit_between_host_pair(host_pair, COPY_SWITCH_PAIR_x_BW):
     bw_limits = []
 
     # The bandwidth limit between given host pair is the minimum of the bandwidths between
-    # every link on the path between the two hosts.
-    path = gbl.PATH_BETWEEN_HOSTS[host_pair]
+    # every link on the path between the two hosts; the path along which a virtual link between
+    # them would be mapped, as per the routing mode.
+    path = substrate.select_path_between_hosts(host_pair, COPY_SWITCH_PAIR_x_BW)
+    # With 'multipath' routing, the virtual link can be split over the paths through all the
+    # spine switches; so the links with the spine switch only limit it by their residual
+    # bandwidths together, rather than by the bandwidths on the single path.
+    spine_switch = substrate.get_spine_switch_on_path(path)
+    if get_routing_mode() != "multipath":
+        spine_switch = None
     # Start with assigning max possible value
     bw_limit = 10000000
     for each_link in path:
+        if spine_switch in each_link:
+            continue
         # Find that switch pair in the COPY_SWITCH_PAIR_x_BW dict.
         for (s1_name, s2_name), bw in COPY_SWITCH_PAIR_x_BW.items():
             if each_link[0].name == s1_name and each_link[1].name == s2_name:
                 bw_limit = min(bw_limit, bw)
                 bw_limits.append(bw)
                 break
+    if spine_switch is not None:
+        bw_limit = min(bw_limit, sum(max(bw, 0) for bw in substrate.get_residual_bws_through_spine_switches(
+            gbl.LEAF_SWITCHES[h1.leaf_index], gbl.LEAF_SWITCHES[h2.leaf_index], COPY_SWITCH_PAIR_x_BW)))
     # print("Bandwidth values on path between hosts {} & {}: {}".format(
     #     h1.name, h2.name, bw_limits))
     return bw_limit
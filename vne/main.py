@@ -7,17 +7,23 @@ from mininet.log import setLogLevel
 from mininet.node import Controller, RemoteController, OVSController
 from mininet.cli import CLI
 from mininet.util import custom
-from mininet.node import CPULimitedHost
+from mininet.node import CPULimitedHost, Host, OVSSwitch
 import gbl
 import helpers as hp
 import substrate
+import topologies
+import substrate_cache
+import vnr_trace
+import vnr_ranking
 import vnr_mapping
+import admission
 import tests
 import vne_algorithms
 import json
 import output as op
 import argparse
 import random
+import os
 
 # Note that all examples for the variables/data structures below are for the topology
 # when sl_factor = 3, ll_factor = 2, hl_factor = 2.
@@ -30,6 +36,10 @@ parser.add_argument(
     "-a", "--Algorithm", help="VNE Algorithm to use for mapping VNRs.")
 parser.add_argument(
     "-n", "--NumVNRs", help="Number of VNRs to map and run VNE algorithm for.")
+parser.add_argument(
+    "-r", "--Ranking", help="VNR ranking strategy, to order the VNRs to serve.")
+parser.add_argument(
+    "-t", "--Trace", help="VNR trace to read the VNRs from (created if it does not exist).")
 
 
 def _get_seed_value():
@@ -61,62 +71,112 @@ def _handle_command_line_args():
         except:
             raise Exception(
                 "Number of VNRs in command line argument must be an integer.")
+    # The VNR ranking strategy in the configurations.json can be overridden in command line args.
+    if args.Ranking:
+        gbl.CFG["vnr_ranking"] = args.Ranking
+    # The VNR trace can be specified under ["vnrs"]["trace"], or in command line args.
+    if args.Trace:
+        gbl.CFG["vnrs"]["trace"] = args.Trace
+
+
+def _create_and_rank_vnrs(cfg_vnrs):
+    """ Creates the input VNRs as per the 'vnrs' configurations, and orders/ranks them.
+    Returns Tuple(number of VNRs, ordered list of VNRs). """
+    # With the 'numpy' generator, the VNRs are streamed from the generator straight into the
+    # ranking (they are all needed to rank them), and neither of them prints every VNR.
+    inputs_for_vnr_mapping_algo = hp.create_vnr_stream(cfg_vnrs, gbl.SEED)
+
+    # Order/rank VNRs before trying to serve them.
+    vnr_list_ordered = hp.rank_vnrs_in_order(
+        inputs_for_vnr_mapping_algo, print_vnrs=cfg_vnrs.get("generator", "networkx") != "numpy")
+    return (len(vnr_list_ordered), vnr_list_ordered)
 
 
 def runVNE(sl_factor=2, ll_factor=3, hl_factor=5):
     """ Generates spine-leaf topology network in mininet based on the multiplier factors 
-    given for spine layer (sl), leaf layer (ll), and host layer (hl). Do not exceed 240 for each of 
-    these factors. 
+    given for spine layer (sl), leaf layer (ll), and host layer (hl). With the default 'octet'
+    addressing, do not exceed 240 for each of these factors; use the 'packed' addressing (see
+    configurations file) for larger topologies. 
     Does the virtual network embedding for specified VNRs, and runs necessary tests.
     Example of topology where (sl=3, ll=2, hl=2) can be found here: https://tinyurl.com/mr3c5ap3
     sl_factor: Number of switches in spine layer (sl).
     ll_factor: Number of leaf layer (ll) switches under the subnet of each spine switch.
     hl_factor: Number of host layer (hl) hosts under (connected to) each leaf switch.
     """
-    gbl.NUM_HOSTS_PER_LEAF_SWITCH = hl_factor
     gbl.SEED = _get_seed_value()
     _handle_command_line_args()
 
-    substrate.generate_topology(sl_factor, ll_factor, hl_factor)
-
-    topo = substrate.SpineLeafSubstrateNetwork()
-    substrate.populate_path_between_hosts()
-
-    # Making use of default controller in mininet. If you want to use any other controller
-    # such as RYU controller, just replace `net = Mininet(topo, host=host)` by
-    # `net = Mininet(topo, host=host, controller=RemoteController)` below.
-    host = custom(CPULimitedHost, sched='cfs')
-    net = Mininet(topo, host=host)
-    net.start()
-
-    # Add ARP table entries for the defaultRoute IPs.
-    for host in gbl.HOSTS:
-        hp.add_arp_entry_for_host(host, net)
-
-    # Adding ARP flood entries for all switches in network.
-    for switch in (gbl.SPINE_SWITCHES + gbl.LEAF_SWITCHES + gbl.HOST_SWITCHES):
-        hp.add_arp_flood_entry(switch, net)
-
-    # Populating flow entries for substrate network.
-    substrate.add_flow_entries_for_substrate_network(net)
+    # The topology of the substrate network is spine-leaf by default; the sl, ll and hl factors
+    # are for the spine-leaf topology only (see 'topology' in configurations file).
+    gbl.TOPOLOGY = topologies.get_topology_provider(
+        sl_factor, ll_factor, hl_factor)
+    gbl.TOPOLOGY.generate()
+
+    # The link bandwidths and the paths between hosts are loaded from the snapshot of the same
+    # substrate network instead, if substrate snapshots are enabled and one was saved earlier.
+    substrate_cache.generate_or_load_substrate_network(
+        sl_factor, ll_factor, hl_factor)
+    admission.create_admission_filter()
+    admission.create_failure_cache()
+
+    # In a model-only run, no mininet network is created (net is None); the VNRs are mapped
+    # on the model of the substrate network only, which allows for much larger substrates.
+    net = None
+    if not hp.is_model_only():
+        topo = substrate.SubstrateNetwork()
+
+        # Making use of default controller in mininet. If you want to use any other controller
+        # such as RYU controller, just replace `net = Mininet(topo, host=host)` by
+        # `net = Mininet(topo, host=host, controller=RemoteController)` below.
+        # Substrate hosts are plain hosts (network namespaces only, without cgroups) if their cpu
+        # limits are not to be enforced; they are still accounted for by the VNE algorithms.
+        host = Host
+        if hp.is_cpu_limit_enforced("substrate"):
+            host = custom(CPULimitedHost, sched='cfs')
+        # OpenFlow meters (and select groups) need OpenFlow 1.3, so the switches must speak it
+        # (along with OpenFlow 1.0 which is used for all the other flow table entries) when meters
+        # enforce the bandwidth, or when virtual links are split over multiple paths.
+        switch = OVSSwitch
+        if hp.get_bw_enforcement_mode() == "meter" or hp.get_routing_mode() == "multipath":
+            switch = custom(OVSSwitch, protocols='OpenFlow10,OpenFlow13')
+        net = Mininet(topo, host=host, switch=switch)
+        net.start()
+
+        # Add ARP table entries for the defaultRoute IPs.
+        for host in gbl.HOSTS:
+            hp.add_arp_entry_for_host(host, net)
+
+        # Adding ARP flood entries for all switches in network.
+        for switch in gbl.TOPOLOGY.get_switches():
+            hp.add_arp_flood_entry(switch, net)
+
+        # Populating flow entries for substrate network.
+        substrate.add_flow_entries_for_substrate_network(net)
 
     # Creating input VNRs.
     cfg_vnrs = gbl.CFG["vnrs"]
-    inputs_for_vnr_mapping_algo = hp.create_vnrs(
-        num_vnrs=cfg_vnrs["num_vnrs"],
-        min_nodes=cfg_vnrs["min_nodes"],
-        max_nodes=cfg_vnrs["max_nodes"],
-        probability=cfg_vnrs["probability"],
-        min_cpu=cfg_vnrs["min_cpu"],
-        max_cpu=cfg_vnrs["max_cpu"],
-        min_bw=cfg_vnrs["min_bw"],
-        max_bw=cfg_vnrs["max_bw"])
-
-    # Order/rank VNRs before trying to serve them.
-    vnr_list_ordered = hp.rank_vnrs_in_order(
-        inputs_for_vnr_mapping_algo)
+    if cfg_vnrs.get("trace"):
+        # Reading the input VNRs (the first num_vnrs of the trace) lazily from the VNR trace,
+        # which is created first if it does not exist.
+        if not os.path.exists(cfg_vnrs["trace"]):
+            vnr_trace.create_vnr_trace(
+                cfg_vnrs["trace"], cfg_vnrs["num_vnrs"], gbl.SEED)
+        trace = vnr_trace.VNRTrace(cfg_vnrs["trace"], cfg_vnrs["num_vnrs"])
+        total_num_vnrs = len(trace)
+        if cfg_vnrs.get("ranking_window"):
+            vnr_list_ordered = hp.rank_vnrs_in_window(
+                trace, cfg_vnrs["ranking_window"], attributes=trace.get_attributes())
+        else:
+            vnr_list_ordered = hp.rank_vnr_trace_in_order(trace)
+    elif cfg_vnrs.get("ranking_window"):
+        # Ordering/ranking the VNRs as they are generated, within a bounded window, so that
+        # they are served without being generated (and sorted) all up front.
+        total_num_vnrs = cfg_vnrs["num_vnrs"]
+        vnr_list_ordered = hp.rank_vnrs_in_window(hp.create_vnr_stream(
+            cfg_vnrs, gbl.SEED), cfg_vnrs["ranking_window"])
+    else:
+        (total_num_vnrs, vnr_list_ordered) = _create_and_rank_vnrs(cfg_vnrs)
 
-    total_num_vnrs = len(vnr_list_ordered)
     num_vnrs_mapped = 0
     # Looping through each VNR, trying to serve/satisfy each VNR at a time.
     for i, (num_hosts, cpu_reqs, link_reqs) in enumerate(vnr_list_ordered):
@@ -150,19 +210,30 @@ def runVNE(sl_factor=2, ll_factor=3, hl_factor=5):
         num_vnrs_mapped, total_num_vnrs, gbl.CFG["vne_algorithm"]) + gbl.bcolors.ENDC, "\n")
 
     op.output_dict["algorithm"] = gbl.CFG["vne_algorithm"]
+    op.output_dict["vnr_ranking"] = vnr_ranking.get_vnr_ranking_strategy()
+    op.output_dict["bw_enforcement"] = hp.get_bw_enforcement_mode()
+    guarantees_enforced, guarantees_modeled_only = hp.get_enforced_and_modeled_guarantees()
+    op.output_dict["guarantees_enforced"] = ", ".join(guarantees_enforced)
+    op.output_dict["guarantees_modeled_only"] = ", ".join(
+        guarantees_modeled_only)
     op.compute_remaining_output_parameters()
 
     hp.update_cpu_limits_of_substrate_hosts_after_vnr_mapping(net)
 
     # tests.test_cpu_limits_for_all_hosts(net)
+    # tests.test_cpu_limits_from_cgroups(net)
     # tests.test_ping_within_vnr_vhosts(net)
     # tests.test_iperf_bandwidth_within_vnr_vhosts(net)
+    # tests.test_concurrent_iperf_bandwidth_within_vnr_vhosts(net)
+    # tests.test_data_plane_with_ofproto_trace(net)
+    # tests.test_reachability_matrix_of_vnr_vhosts(net)
 
     # hp.show_flow_table_entries(net)
     # net.pingAll()
 
     # CLI(net)
-    net.stop()
+    if net is not None:
+        net.stop()
 
 
 def main():
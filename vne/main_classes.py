@@ -11,20 +11,37 @@ class Switch:
         Name of the switch. Spine layer switches are named 's1_x' (e.g. 's1_2'), leaf layer 
         switches are named 's2_x' (e.g. 's2_2'), and host switches are named shx (e.g. 'sh2').
     ip_subnet : str
-        The IP subnet under this switch. E.g. IP subnet for spine layer switch can be '10',
-        for leaf layer switch can be '10.0', for host switch can be '10.0.1'.
-    host_ips_under_this_switch : List[str]
-        The list of host IPs under this switch.
+        The IP subnet under this switch. E.g. IP subnet for spine layer switch can be '10.0.0.0/8',
+        for leaf layer switch can be '10.0.0.0/16', for host switch can be '10.0.1.0/24'.
+    index : int
+        Index of the switch in its layer. E.g. 1 for 's2_2' (which is gbl.LEAF_SWITCHES[1]).
+    hosts_under_this_switch : List[SubstrateHost]
+        The list of substrate hosts directly under this (leaf) switch, in the order of their
+        ports on the switch.
     next_port_number : int
         The next available port number on the switch. Everytime a device (host or switch) is 
         linked to this host, a port gets utilized in that link, and this counter increases.
+    free_port_numbers : List[int]
+        The port numbers (below next_port_number) of the links which have been removed from the
+        switch, e.g. of the virtual hosts of removed VNRs; kept as a heap, so that the smallest
+        one is reused first.
+    next_meter_id : int
+        The next available OpenFlow meter identifier on the switch. Only used when bandwidth
+        of virtual links is enforced with OpenFlow meters instead of tc HTB.
+    next_group_id : int
+        The next available OpenFlow group identifier on the switch. Only used (on leaf switches)
+        when virtual links are split over multiple paths ('multipath' routing).
     """
 
-    def __init__(self, switch_name: str, ip_subnet: str):
+    def __init__(self, switch_name: str, ip_subnet: str, index: int = 0):
         self.name = switch_name
         self.ip_subnet = ip_subnet
-        self.host_ips_under_this_switch = []
+        self.index = index
+        self.hosts_under_this_switch = []
         self.next_port_number = 1
+        self.free_port_numbers = []
+        self.next_meter_id = 1
+        self.next_group_id = 1
 
 
 class Host:
@@ -44,7 +61,8 @@ class Host:
     ip_addr : str
         The IP address of this host. E.g. IP for host can be '10.0.1.2/24'.
     host_switch_attached : Switch
-        The host switch attached directly to this host.
+        The host switch attached directly to this host; or the leaf switch, if the topology has
+        no host switches (see `helpers.uses_host_switches`).
     cpu_limit : int
         The assigned CPU limit for this host. E.g. 140.
     """
@@ -53,12 +53,18 @@ class WeightMatrix(object):
             #sum_katz += row[5]
         nor_matrix = [[0, 0, 0, 0, 0, 0] for i in range(len(self.network))]
         for idx, _row in enumerate(matrix):
-            nor_matrix[idx][0] = round(float(_row[0])/float(sum_crb), 3)
-            nor_matrix[idx][1] = round(float(_row[1])/float(sum_bdwth), 3)
+            # A column is all 0 (e.g. the bandwidth, once the links of every substrate node are
+            # used up), then so is its normalised column.
+            nor_matrix[idx][0] = round(float(_row[0])/float(sum_crb), 3) if sum_crb \
+                != 0 else 0
+            nor_matrix[idx][1] = round(float(_row[1])/float(sum_bdwth), 3) if sum_bdwth \
+                != 0 else 0
             nor_matrix[idx][2] = round(float(_row[2])/float(sum_bc), 3) if sum_bc \
                 != 0 else 0
-            nor_matrix[idx][3] = round(float(_row[3])/float(sum_eig), 3)
-            nor_matrix[idx][4] = round(float(_row[4]) / float(sum_dgr), 3)
+            nor_matrix[idx][3] = round(float(_row[3])/float(sum_eig), 3) if sum_eig \
+                != 0 else 0
+            nor_matrix[idx][4] = round(float(_row[4]) / float(sum_dgr), 3) if sum_dgr \
+                != 0 else 0
             #nor_matrix[idx][5] = round(float(_row[5]) / float(sum_katz), 3)
         self._perf_mx = nor_matrix
         return nor_matrix
@@ -2,6 +2,14 @@ import math
 import random
 
 
+def _get_norm(values):
+    """ Euclidean norm of the values, to normalise them by. If all the values are 0 (e.g. once the
+    links of every substrate node are used up), so are the normalised values; so 1 is returned
+    instead of dividing by 0. """
+    total_n_value = math.sqrt(sum(value ** 2 for value in values))
+    return total_n_value if total_n_value else 1
+
+
 class NetworkAttribute(object):
 
     def __init__(self, network, virtual=False, **kwargs):
@@ -70,7 +78,7 @@ class NetworkAttribute(object):
 
     def normalized_crb(self, original_net):
         nt_crb = self.generate_crb(original_net)
-        total_n_value = math.sqrt(sum(value ** 2 for value in nt_crb.values()))
+        total_n_value = _get_norm(nt_crb.values())
         normalised_crb = {}
         for elem in nt_crb:
             normalised_crb[elem] = float(nt_crb[elem])/float(total_n_value)
@@ -81,8 +89,7 @@ class NetworkAttribute(object):
 
     def normalized_node_bandwidth(self, original_net):
         nt_bwdth = self.generate_node_bandwidth(original_net)
-        total_n_value = math.sqrt(
-            sum(value ** 2 for value in nt_bwdth.values()))
+        total_n_value = _get_norm(nt_bwdth.values())
         normalised_bwdth = {}
         for elem in nt_bwdth:
             normalised_bwdth[elem] = float(nt_bwdth[elem])/float(total_n_value)
@@ -93,8 +100,7 @@ class NetworkAttribute(object):
 
     def normalized_node_degree(self):
         nt_degree = self.generate_node_degree()
-        total_n_value = math.sqrt(
-            sum(value ** 2 for value in nt_degree.values()))
+        total_n_value = _get_norm(nt_degree.values())
         normalised_degree = {}
         for elem in nt_degree:
             normalised_degree[elem] = float(
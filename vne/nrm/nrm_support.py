@@ -26,10 +26,7 @@ def _generate_substrate_graph_u_object():
     convert/create appropriate data structures so that NRM algorithms's code can 
     directly be called, hence providing direct integration with NRM. """
 
-    substrate_cfg = gbl.CFG["substrate"]
-
-    substrate_num_hosts = substrate_cfg["sl_factor"] * \
-        substrate_cfg["ll_factor"] * substrate_cfg["hl_factor"]
+    substrate_num_hosts = len(gbl.HOSTS)
 
     # Populating node weights.
     substrate_node_weights = {}
@@ -54,18 +51,14 @@ def _generate_substrate_graph_u_object():
                 _h_to_s(h2.name), _h_to_s(h1.name))] = bw_limit
 
     # Neighbor population for each substrate host: For every host, other hosts under
-    # the same /16 subnet are considered to be its neighbors. Reason for making this
-    # assumption is that the number of links in the path between such pair of nodes
-    # (belonging to same /16 subnet) is lesser compared to any other pair of hosts.
+    # the same leaf switch (/16 subnet) are considered to be its neighbors. Reason for making
+    # this assumption is that the number of links in the path between such pair of nodes
+    # (belonging to same leaf switch) is lesser compared to any other pair of hosts.
     substrate_neighbours = {}
-    for h1 in gbl.HOSTS:
-        substrate_neighbours[int(_h_to_s(h1.name))] = set()
-        for h2 in gbl.HOSTS:
-            ip_subnet_h1 = ".".join(h1.ip_addr.split(".")[0:2])
-            ip_subnet_h2 = ".".join(h2.ip_addr.split(".")[0:2])
-            if ip_subnet_h1 == ip_subnet_h2 and h1 != h2:
-                substrate_neighbours[int(_h_to_s(h1.name))].add(
-                    _h_to_s(h2.name))
+    for leaf_switch in gbl.LEAF_SWITCHES:
+        for h1 in leaf_switch.hosts_under_this_switch:
+            substrate_neighbours[int(_h_to_s(h1.name))] = set(
+                _h_to_s(h2.name) for h2 in leaf_switch.hosts_under_this_switch if h2 is not h1)
 
     print("\nsubstrate_num_hosts: ", substrate_num_hosts)
     print("\nsubstrate_neighbours: ", substrate_neighbours)
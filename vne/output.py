@@ -55,7 +55,26 @@ output_dict = {
     # Average node utilization is defined as the total number of substrate nodes
     # utilized during the embedding of the VNRs divided by the total number of
     # nodes in the substrate network.
-    "avg_node_utilization": None
+    "avg_node_utilization": None,
+
+    # How the bandwidth of virtual links is enforced; 'htb' or 'meter'.
+    "bw_enforcement": None,
+    # Total time (in seconds) spent setting up the bandwidth enforcement (tc HTB
+    # rules or OpenFlow meters) for all the mapped VNRs.
+    "bw_enforcement_setup_time": 0,
+
+    # Resource guarantees (bandwidth, substrate/virtual host cpu) which are enforced in the
+    # emulated network, and those which are only accounted for in the model.
+    "guarantees_enforced": None,
+    "guarantees_modeled_only": None,
+
+    # The strategy by which the VNRs are ordered/ranked before being served.
+    "vnr_ranking": None,
+
+    # Number of requests rejected by the admission control, without running the VNE algorithm.
+    "fast_rejected": 0,
+    # Number of requests rejected by the failure cache, as they dominate a request which failed.
+    "failure_cache_rejected": 0
 }
 
 # Variables used to store all the links and hosts of the substrate network
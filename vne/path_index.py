@@ -0,0 +1,69 @@
+import gbl
+import numpy as np
+
+
+class PathLinkIndex:
+    """
+    The paths between the substrate hosts as NumPy arrays of link ids, so that the bandwidth checks
+    of a virtual link towards a substrate host can be done for all the candidate substrate hosts at
+    once (see `vne_algorithms._get_first_feasible_substrate_host`). Every link with a bandwidth (i.e.
+    in gbl.SWITCH_PAIR_x_BW) has an id; the links without a bandwidth (such as between host switch
+    and host) are left out of the paths, as in `hp.get_bandwidth_limit_between_host_pair`.
+
+    Only for the fixed paths between hosts (gbl.PATH_BETWEEN_HOSTS), i.e. with 'static' routing.
+
+    Attributes
+    ----------
+    links : List[Tuple(str, str)]
+        The links with a bandwidth, by id; the id len(links) is a dummy link (with infinite residual
+        bandwidth) which the shorter paths are padded with.
+    host_x_index : Dict[SubstrateHost, int]
+        Index of every substrate host in gbl.HOSTS.
+    """
+
+    def __init__(self):
+        self.links = []
+        self.link_x_id = {}
+        for (s1, s2) in gbl.SWITCH_PAIR_x_BW:
+            if (s2, s1) not in self.link_x_id:
+                self.link_x_id[(s1, s2)] = len(self.links)
+                self.links.append((s1, s2))
+        for ((s1, s2), link_id) in list(self.link_x_id.items()):
+            self.link_x_id[(s2, s1)] = link_id
+        self.dummy_link_id = len(self.links)
+        self.host_x_index = {host: i for (i, host) in enumerate(gbl.HOSTS)}
+        self._host_x_path_link_ids = {}
+
+    def get_residual_bws(self, SWITCH_PAIR_x_BW):
+        """ Returns the residual bandwidths (as per SWITCH_PAIR_x_BW) of all the links by id, as a
+        NumPy array; with infinite bandwidth for the dummy link. """
+        return np.array([SWITCH_PAIR_x_BW[link] for link in self.links] + [np.inf])
+
+    def get_path_link_ids(self, host):
+        """ Returns the link ids of the paths from every substrate host (in the order of gbl.HOSTS) to
+        the substrate host, as a NumPy array of shape (number of hosts, longest path), padded with
+        the dummy link id. The row of the host itself is all dummy links. Computed on first use. """
+        if host not in self._host_x_path_link_ids:
+            j = self.host_x_index[host]
+            paths = []
+            for (i, other_host) in enumerate(gbl.HOSTS):
+                if i == j:
+                    paths.append([])
+                    continue
+                host_pair = (other_host, host) if i < j else (host, other_host)
+                paths.append([self.link_x_id[(node1.name, node2.name)]
+                              for (node1, node2) in gbl.PATH_BETWEEN_HOSTS[host_pair]
+                              if (node1.name, node2.name) in self.link_x_id])
+            path_link_ids = np.full(
+                (len(paths), max(len(path) for path in paths)), self.dummy_link_id, dtype=np.int64)
+            for (i, path) in enumerate(paths):
+                path_link_ids[i, :len(path)] = path
+            self._host_x_path_link_ids[host] = path_link_ids
+        return self._host_x_path_link_ids[host]
+
+
+def get_path_link_index():
+    """ Returns the path link index of the substrate network, creating it on first use. """
+    if gbl.PATH_LINK_INDEX is None:
+        gbl.PATH_LINK_INDEX = PathLinkIndex()
+    return gbl.PATH_LINK_INDEX
@@ -9,6 +9,10 @@
 # - Number of iterations to run for:   "iterations": 5,
 # - List of VNE algorithms to run on:  "vne_algorithms": ["first-fit-algorithm", "worst-fit-algorithm"],
 # - List of number of VNRs to run for: "num_vnrs_list": [1, 2, 3]
+# Optionally, every VNE algorithm is run for every VNR ranking strategy in "vnr_ranking_list"
+# (e.g. ["revenue-ascending", "topsis"]); by default only for the "vnr_ranking" strategy.
+# Optionally, with "vnr_traces_dir": "vnr_traces", the VNRs of every iteration are generated only
+# once, to a VNR trace in that directory, which all the runs of main.py in the iteration read.
 
 import gbl
 import json
@@ -17,6 +21,7 @@ import os
 import time
 import random
 import pickle
+import vnr_trace
 
 
 OUTPUT_RESULTS = {
@@ -39,7 +44,14 @@ OUTPUT_RESULTS = {
     "avg_bandwidth_utilization": [],
     "avg_crb_utilization": [],
     "avg_link_utilization": [],
-    "avg_node_utilization": []
+    "avg_node_utilization": [],
+    "bw_enforcement": [],
+    "bw_enforcement_setup_time": [],
+    "guarantees_enforced": [],
+    "guarantees_modeled_only": [],
+    "vnr_ranking": [],
+    "fast_rejected": [],
+    "failure_cache_rejected": []
 }
 
 
@@ -65,6 +77,16 @@ def add_row_to_excel(op, seed_value):
     OUTPUT_RESULTS["avg_crb_utilization"].append(op["avg_crb_utilization"])
     OUTPUT_RESULTS["avg_link_utilization"].append(op["avg_link_utilization"])
     OUTPUT_RESULTS["avg_node_utilization"].append(op["avg_node_utilization"])
+    OUTPUT_RESULTS["bw_enforcement"].append(op["bw_enforcement"])
+    OUTPUT_RESULTS["bw_enforcement_setup_time"].append(
+        op["bw_enforcement_setup_time"])
+    OUTPUT_RESULTS["guarantees_enforced"].append(op["guarantees_enforced"])
+    OUTPUT_RESULTS["guarantees_modeled_only"].append(
+        op["guarantees_modeled_only"])
+    OUTPUT_RESULTS["vnr_ranking"].append(op["vnr_ranking"])
+    OUTPUT_RESULTS["fast_rejected"].append(op["fast_rejected"])
+    OUTPUT_RESULTS["failure_cache_rejected"].append(
+        op["failure_cache_rejected"])
 
 
 def main():
@@ -79,22 +101,36 @@ def main():
     num_iterations = gbl.CFG["iterations"]
     vne_algorithms_to_run = gbl.CFG["vne_algorithms"]
     num_vnrs_list = gbl.CFG["num_vnrs_list"]
+    vnr_rankings_to_run = gbl.CFG.get(
+        "vnr_ranking_list", [gbl.CFG.get("vnr_ranking", "revenue-ascending")])
 
     for iter in range(1, num_iterations + 1):
         print("\n\nRUNNING ITERATION {}...".format(iter))
         seed_value = random.randint(1, 10000)
 
+        trace_arg = ""
+        if gbl.CFG.get("vnr_traces_dir"):
+            # Generating the VNRs of this iteration once (for the largest number of VNRs); every
+            # run reads its first num_vnrs VNRs from the same trace.
+            trace_path = vnr_trace.get_vnr_trace_path(
+                gbl.CFG["vnr_traces_dir"], seed_value, max(num_vnrs_list))
+            if not os.path.exists(trace_path):
+                vnr_trace.create_vnr_trace(
+                    trace_path, max(num_vnrs_list), seed_value)
+            trace_arg = " -t {}".format(trace_path)
+
         for num_vnrs in num_vnrs_list:
 
-            for vne_algo in vne_algorithms_to_run:
-                print("\n\nRUNNING VNE ALGORITHM {}  (iteration = {}, num vnrs = {}, seed = {})...\n\n".format(
-                    vne_algo, iter, num_vnrs, seed_value))
+            for (vne_algo, vnr_ranking) in [(vne_algo, vnr_ranking) for vne_algo in vne_algorithms_to_run
+                                            for vnr_ranking in vnr_rankings_to_run]:
+                print("\n\nRUNNING VNE ALGORITHM {}  (iteration = {}, num vnrs = {}, seed = {}, vnr ranking = {})...\n\n".format(
+                    vne_algo, iter, num_vnrs, seed_value, vnr_ranking))
 
                 # Running the `main.py` by specifying the command line arguments for the
-                # seed value and the vne algorithm to use for vnr mapping.
+                # seed value, the vne algorithm and the vnr ranking to use for vnr mapping.
                 start = time.time()
                 os.system(
-                    'sudo python3 main.py -s {} -a {} -n {}'.format(seed_value, vne_algo, num_vnrs))
+                    'sudo python3 main.py -s {} -a {} -n {} -r {}{}'.format(seed_value, vne_algo, num_vnrs, vnr_ranking, trace_arg))
                 end = time.time()
 
                 try:
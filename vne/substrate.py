@@ -1,4 +1,5 @@
 from main_classes import Switch, Host
+from allocators import SubnetIPAllocator
 import random
 import gbl
 from mininet.topo import Topo
@@ -7,6 +8,8 @@ import helpers as hp
 from mininet.cli import CLI
 import output as op
 import copy
+import math
+from addressing import get_addressing_scheme
 
 
 class SubstrateHost(Host):
@@ -27,6 +30,9 @@ class SubstrateHost(Host):
     virtual_hosts_mapped : List[VNRVirtualHost]
         List of virtual hosts that are mapped onto this substrate host; updated upon serving 
         the VNR requests.
+    ip_allocator : SubnetIPAllocator
+        Allocates the IP addresses of the virtual hosts mapped onto this substrate host, from
+        the IP subnet of this substrate host.
     """
 
     cpu_all_hosts = 1000
@@ -35,6 +41,26 @@ class SubstrateHost(Host):
         super().__init__(host_name, ip_addr, cpu_limit)
         self.virtual_hosts_mapped = []
         self.original_cpu_limit = cpu_limit
+        self.ip_allocator = SubnetIPAllocator(ip_addr)
+
+
+def create_substrate_host(host_name, ip_subnet):
+    """ Creates the substrate host with a random cpu limit (in the configured range), and adds it
+    to gbl.HOSTS and gbl.HOSTNAME_x_HOST. Used by all the topologies.
+    host_name: Example: 'h1'.
+    ip_subnet: IP subnet of the substrate host. Example: '10.0.0.0/24'. """
+    # Randomly generating cpu limits for substrate host in given range
+    cpu_limit = random.randrange(
+        gbl.CFG["substrate"]["cpu_limit_min"], gbl.CFG["substrate"]["cpu_limit_max"])
+    host = SubstrateHost(host_name, ip_subnet, cpu_limit)
+    SubstrateHost.cpu_all_hosts += cpu_limit
+
+    op.output_dict["pre_resource"] += cpu_limit
+    op.output_dict["total_nodes"] += 1
+
+    gbl.HOSTS.append(host)
+    gbl.HOSTNAME_x_HOST[host_name] = host
+    return host
 
 
 def generate_topology(sl_factor, ll_factor, hl_factor):
@@ -50,255 +76,313 @@ def generate_topology(sl_factor, ll_factor, hl_factor):
     # with: `random.seed(gbl.SEED)``
     random.seed(gbl.CFG["seed_for_substrate_network"])
 
-    # Starting IP addressing of hosts with "10.0.0.0"
-    first_ip_subnet = 10
+    gbl.NUM_HOSTS_PER_LEAF_SWITCH = hl_factor
+    gbl.NUM_LEAF_SWITCHES_PER_SPINE_SWITCH = ll_factor
+    # The IP subnets of switches and hosts are computed from their indices in the topology by
+    # the addressing scheme. With the default ('octet') addressing, IP addressing of hosts starts
+    # with "10.0.0.0", and every index takes one octet of the address.
+    gbl.ADDRESSING = get_addressing_scheme(sl_factor, ll_factor, hl_factor)
     for i in range(0, sl_factor):
-        # The subnet for layer 1 (spine) switches. For example layer_1_subnet="10"
-        # denotes 10.0.0.0/8 subnet, meaning any nodes with first 8 bits of IP address
-        # as 10 will come under this switch's network. Name given to this switch will
-        # be s1_1 (denoting layer 1, switch 1).
-        layer_1_subnet = str(first_ip_subnet + i)
-        spine_switch = Switch("s1_{}".format(i + 1), layer_1_subnet)
+        # The subnet for layer 1 (spine) switches. For example layer_1_subnet="10.0.0.0/8"
+        # denotes that any nodes with first 8 bits of IP address as 10 will come under this
+        # switch's network. Name given to this switch will be s1_1 (denoting layer 1, switch 1).
+        layer_1_subnet = gbl.ADDRESSING.get_spine_subnet(i)
+        spine_switch = Switch("s1_{}".format(i + 1), layer_1_subnet, i)
         gbl.SPINE_SWITCHES.append(spine_switch)
         gbl.SPINE_LAYER_IP_SUBNET_x_SWITCH[layer_1_subnet] = spine_switch
 
         # For every spine layer switch, add 'll_factor' leaf layer switches.
         for j in range(0, ll_factor):
-            # The subnet for layer 2 (leaf) switches. For example, layer_2_subnet="10.0"
-            # denotes the 10.0.0.0/16 subnet, meaning any nodes with first 16 bits
-            # matching this will come under this switch's network. Name given to this
-            # switch is s2_1 (denoting layer 2, switch 1).
-            layer_2_subnet = layer_1_subnet + ".{}".format(j)
+            # The subnet for layer 2 (leaf) switches. For example, layer_2_subnet="10.0.0.0/16"
+            # denotes that any nodes with first 16 bits matching this will come under this
+            # switch's network. Name given to this switch is s2_1 (denoting layer 2, switch 1).
+            layer_2_subnet = gbl.ADDRESSING.get_leaf_subnet(i, j)
             leaf_switch = Switch("s2_{}".format(
-                ll_factor*i + j + 1), layer_2_subnet)
+                ll_factor*i + j + 1), layer_2_subnet, ll_factor*i + j)
             gbl.LEAF_SWITCHES.append(leaf_switch)
             gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH[layer_2_subnet] = leaf_switch
 
             # For every leaf layer switch, add 'hl_factor' hosts under it.
             for k in range(0, hl_factor):
-                # For denoting host, we use first 24 bit subnets. For example,
-                # "10.0.0.0/24". Host naming here is simply 'h1' denoting first host.
-                host_layer_subnet = layer_2_subnet + ".{}".format(k)
-                host_name = "h{}".format(
-                    hl_factor*ll_factor*i + hl_factor*j + k + 1)
-
-                # Randomly generating cpu limits for substrate host in given range
-                cpu_limit = random.randrange(
-                    gbl.CFG["substrate"]["cpu_limit_min"], gbl.CFG["substrate"]["cpu_limit_max"])
-                host = SubstrateHost(
-                    host_name, host_layer_subnet + ".0/24", cpu_limit)
-                SubstrateHost.cpu_all_hosts += cpu_limit
-
-                op.output_dict["pre_resource"] += cpu_limit
-                op.output_dict["total_nodes"] += 1
-
-                host_switch = Switch("sh{}".format(
-                    hl_factor*ll_factor*i + hl_factor*j + k + 1), host_layer_subnet)
-                gbl.HOSTS.append(host)
-                gbl.HOSTNAME_x_HOST[host_name] = host
-                gbl.HOST_SWITCHES.append(host_switch)
-                gbl.HOST_LAYER_IP_SUBNET_x_SWITCH[host_layer_subnet] = host_switch
-                host.host_switch_attached = host_switch
-                leaf_switch.host_ips_under_this_switch.append(
-                    host_layer_subnet + ".0")
-
-
-class SpineLeafSubstrateNetwork(Topo):
-    def __init__(self):
-        Topo.__init__(self)
+                # For denoting host, we use first 24 bit subnets (with the default addressing).
+                # For example, "10.0.0.0/24". Host naming here is simply 'h1' denoting first host.
+                host_layer_subnet = gbl.ADDRESSING.get_host_subnet(i, j, k)
+                host_index = hl_factor*ll_factor*i + hl_factor*j + k
+                host_name = "h{}".format(host_index + 1)
+
+                host = create_substrate_host(host_name, host_layer_subnet)
+                host.spine_index = i
+                host.leaf_index = leaf_switch.index
+                host.index_in_leaf = k
+                if hp.uses_host_switches():
+                    host_switch = Switch("sh{}".format(
+                        host_index + 1), host_layer_subnet, host_index)
+                    gbl.HOST_SWITCHES.append(host_switch)
+                    gbl.HOST_LAYER_IP_SUBNET_x_SWITCH[host_layer_subnet] = host_switch
+                    host.host_switch_attached = host_switch
+                else:
+                    # Without host switches, the host (and its virtual hosts) is attached
+                    # directly to the leaf switch.
+                    host.host_switch_attached = leaf_switch
+                leaf_switch.hosts_under_this_switch.append(host)
+
+
+def generate_link_bandwidths():
+    """ Generates the (random) bandwidths of all the links of the topology (gbl.TOPOLOGY), e.g.
+    of the spine-leaf links and the leaf-host links, and populates gbl.SWITCH_PAIR_x_BW with them.
+    This is separate from creating the mininet topology (`SubstrateNetwork`), so that the
+    substrate network can also be modeled without mininet. """
 
-        # If your requirement is to generate the same physical substrate network over
-        # multiple iterations, then keep the random.seed value same for each of the iterations.
-        # But if you want to generate new substrate network each time, replace the below line
-        # with: `random.seed(gbl.SEED)``
-        random.seed(gbl.CFG["seed_for_substrate_network"])
+    # If your requirement is to generate the same physical substrate network over
+    # multiple iterations, then keep the random.seed value same for each of the iterations.
+    # But if you want to generate new substrate network each time, replace the below line
+    # with: `random.seed(gbl.SEED)``
+    random.seed(gbl.CFG["seed_for_substrate_network"])
 
-        # Add spine switches (layer 1 switches in spine-leaf topology), named s2_XYZ.
-        for spine_switch in gbl.SPINE_SWITCHES:
-            self.addSwitch(spine_switch.name)
+    for (node1, node2, bw_config_key) in gbl.TOPOLOGY.get_links():
+        # Note that the links between host switches and hosts are NOT counted in the total_links
+        # (nor have a bandwidth) as its a 'modified spine leaf' architecture and the last layer's
+        # links are mainly used for implementation purposes.
+        if bw_config_key is None:
+            continue
+        bw_random = random.randrange(gbl.CFG["substrate"][bw_config_key]["bw_limit_min"],
+                                     gbl.CFG["substrate"][bw_config_key]["bw_limit_max"])
+        gbl.SWITCH_PAIR_x_BW[(node1.name, node2.name)] = bw_random
+        gbl.SWITCH_PAIR_x_BW[(node2.name, node1.name)] = bw_random
+        op.output_dict["pre_resource"] += bw_random
+        op.output_dict["total_links"] += 1
 
-        # Add leaf switches (layer 2 switches in spine-leaf topology), named s2_XYZ.
-        for leaf_switch in gbl.LEAF_SWITCHES:
-            self.addSwitch(leaf_switch.name)
+    # Populate the original switch pair bandwidth values. The variable `ORIGINAL_SWITCH_PAIR_x_BW`
+    # shall not update, whereas `SWITCH_PAIR_x_BW` dynamically changes as VNRs are served.
+    gbl.ORIGINAL_SWITCH_PAIR_x_BW = copy.deepcopy(gbl.SWITCH_PAIR_x_BW)
 
-        # Add host switches
-        for host_switch in gbl.HOST_SWITCHES:
-            self.addSwitch(host_switch.name)
 
-        # Add hosts (final layer in spine-leaf topology), named hXYZ.
+class SubstrateNetwork(Topo):
+    def __init__(self):
+        """ Creates the mininet topology of the substrate network (gbl.TOPOLOGY); the bandwidths of
+        the links must have been generated already by `generate_link_bandwidths`. """
+        Topo.__init__(self)
+
+        # Add the switches, e.g. the spine switches, leaf switches, and host switches (named
+        # s1_XYZ, s2_XYZ and shXYZ respectively) of the spine-leaf topology.
+        for switch in gbl.TOPOLOGY.get_switches():
+            self.addSwitch(switch.name)
+
+        # Add hosts (final layer in the topology), named hXYZ.
         for host in gbl.HOSTS:
             cpu_percentage = host.cpu_limit / host.cpu_all_hosts
             self.addHost(
                 host.name, cpu=cpu_percentage, ip=host.ip_addr, defaultRoute='via {}'.format(hp.get_default_router_for_host(host)))
 
-        # Add links between every spine layer and leaf layer switches.
-        # Everytime link is added, update the next_port_addr for the switch.
-        for spine_switch in gbl.SPINE_SWITCHES:
-            for leaf_switch in gbl.LEAF_SWITCHES:
-                bw_random = random.randrange(gbl.CFG["substrate"]["spine_to_leaf_links"]
-                                             ["bw_limit_min"], gbl.CFG["substrate"]["spine_to_leaf_links"]["bw_limit_max"])
-                self.addLink(spine_switch.name,
-                             leaf_switch.name, cls=TCLink, bw=bw_random)
-                gbl.SWITCH_PAIR_x_BW[(
-                    spine_switch.name, leaf_switch.name)] = bw_random
-                gbl.SWITCH_PAIR_x_BW[(
-                    leaf_switch.name, spine_switch.name)] = bw_random
-                spine_switch.next_port_number += 1
-                leaf_switch.next_port_number += 1
-                op.output_dict["pre_resource"] += bw_random
-                op.output_dict["total_links"] += 1
-
-        # Add links between leaf layer switches and host switches.
-        # Everytime link is added, update the next_port_addr for the switch.
-        host_index = 0
-        for leaf_switch in gbl.LEAF_SWITCHES:
-            for i in range(gbl.NUM_HOSTS_PER_LEAF_SWITCH):
-                host_switch = gbl.HOST_SWITCHES[host_index]
-                bw_random = random.randrange(gbl.CFG["substrate"]["leaf_to_host_links"]
-                                             ["bw_limit_min"], gbl.CFG["substrate"]["leaf_to_host_links"]["bw_limit_max"])
-                self.addLink(host_switch.name, leaf_switch.name,
-                             cls=TCLink, bw=bw_random)
-                gbl.SWITCH_PAIR_x_BW[(
-                    host_switch.name, leaf_switch.name)] = bw_random
-                gbl.SWITCH_PAIR_x_BW[(
-                    leaf_switch.name, host_switch.name)] = bw_random
-                host_index += 1
-                leaf_switch.next_port_number += 1
-                host_switch.next_port_number += 1
-                op.output_dict["pre_resource"] += bw_random
-                op.output_dict["total_links"] += 1
-
-        # Add link between the host switches and the hosts.
-        for (host_switch, host) in zip(gbl.HOST_SWITCHES, gbl.HOSTS):
-            self.addLink(host_switch.name, host.name)
-            host_switch.next_port_number += 1
-            # Note that we DON'T count this as a link in the total_links as its a
-            # 'modified spine leaf' architecture and the last layer's links are mainly
-            # used for implementation purposes. And, since we are counting the total
-            # links in the spine leaf topology, we only count the links between
-            # spine-leaf and leaf-host, which has already been done above.
-            op.output_dict["total_links"] += 0
-
-        # Populate the original switch pair bandwidth values. The variable `ORIGINAL_SWITCH_PAIR_x_BW`
-        # shall not update, whereas `SWITCH_PAIR_x_BW` dynamically changes as VNRs are served.
-        gbl.ORIGINAL_SWITCH_PAIR_x_BW = copy.deepcopy(gbl.SWITCH_PAIR_x_BW)
+        # Add the links, in the order given by the topology, since the port numbers of the
+        # switches are given in that order. Everytime link is added, update the next_port_addr
+        # for the switch(es).
+        for (node1, node2, bw_config_key) in gbl.TOPOLOGY.get_links():
+            if bw_config_key is None:
+                self.addLink(node1.name, node2.name)
+            else:
+                self.addLink(node1.name, node2.name, cls=TCLink,
+                             bw=gbl.SWITCH_PAIR_x_BW[(node1.name, node2.name)])
+            for node in (node1, node2):
+                if isinstance(node, Switch):
+                    node.next_port_number += 1
 
 
 def add_flow_entries_for_substrate_network(net):
-    """ Adding flow table entries for the substrate network."""
-    # Add flow entries for all leaf switches.
-    for ll_switch in gbl.LEAF_SWITCHES:
-        # For every leaf layer switch, add flow table entries for the upward flow,
-        # i.e. packets flowing towards the spine switches.
-        for ss in gbl.SPINE_SWITCHES:
-            sl_ip_subnet = ss.ip_subnet
-            ip_subnet_8_bit = sl_ip_subnet + ".0.0.0/8"
-            port = hp.get_output_port_for_leaf_switches_towards_spine(
-                ll_switch, ip_subnet_8_bit)
-            hp.add_flow_ip(net, ll_switch.name, 3000, ip_subnet_8_bit, port)
-        # For every leaf layer switch, add flow table entries for the downward flow,
-        # i.e. packets flowing towards the hosts.
-        for host_ip in ll_switch.host_ips_under_this_switch:
-            port = hp.get_output_port_for_leaf_switches_towards_hosts(
-                host_ip, len(gbl.SPINE_SWITCHES))
-            # Hosts within that subnet shall be given higher priority in the
-            # flow table. For example in the topology (sl=3, ll=2, h=2), if
-            # h5 wants to communicate with h6. They both lie under switch s2_3,
-            # and when s2_3 gets the packet destined for h6, it shall send it
-            # to h6 directly instead of forwarding to s1_2 (which is what the
-            # above sl rule says). Hence if host is reachable from that switch,
-            # give it higher prioirty (here 3001) in the flow table.
-            hp.add_flow_ip(net, ll_switch.name, 3001, host_ip + '/24', port)
-
-    # Add flow entries for all spine switches.
-    for sl_switch in gbl.SPINE_SWITCHES:
-        # For every spine layer switch, add flow table entries for the downward
-        # flow towards the leaf switches.
-        for ll in gbl.LEAF_SWITCHES:
-            ll_ip_subnet = ll.ip_subnet
-            ip_subnet_16_bit = ll_ip_subnet + ".0.0/16"
-            port = hp.get_output_port_for_spine_switches(ll_ip_subnet)
-            hp.add_flow_ip(net, sl_switch.name, 3000, ip_subnet_16_bit, port)
-
-    for (hl_switch, host) in zip(gbl.HOST_SWITCHES, gbl.HOSTS):
-        ip_add = host.ip_addr.split('/')[0]
-        # Obtaining the host mac address.
-        host_mac = str.rstrip(net[host.name].cmd(
-            "ip -a link | grep ether | awk '{print $2}'"))
-        CLI.do_sh(net, "ovs-ofctl add-flow {} eth_type=0x0800,priority={},nw_dst={},actions=mod_dl_dst:{},output:{}".format(
-            hl_switch.name, 3001, ip_add, host_mac, 2))
-        CLI.do_sh(
-            net, "ovs-ofctl add-flow {} eth_type=0x0800,priority=3000,actions=output:1".format(hl_switch.name))
-
-
-def populate_path_between_hosts():
-    """ Populates the exact path between every pair of hosts in the network in the
-    spine leaf topology. This function basically populates the gbl.PATH_BETWEEN_HOSTS 
-    global variable, which is then used in the vnr mapping algorithms.
+    """ Adding flow table entries for the substrate network, i.e. the forwarding rules of the
+    switches given by the topology (gbl.TOPOLOGY). """
+    for (switch, priority, nw_dst, output_port, host) in gbl.TOPOLOGY.get_forwarding_rules():
+        if host is not None:
+            # Delivering the packet to the host; so also rewriting the destination mac address
+            # (which is that of the dummy default router) to that of the host.
+            host_mac = str.rstrip(net[host.name].cmd(
+                "ip -a link | grep ether | awk '{print $2}'"))
+            CLI.do_sh(net, "ovs-ofctl add-flow {} eth_type=0x0800,priority={},nw_dst={},actions=mod_dl_dst:{},output:{}".format(
+                switch.name, priority, nw_dst, host_mac, output_port))
+        elif nw_dst is None:
+            CLI.do_sh(net, "ovs-ofctl add-flow {} eth_type=0x0800,priority={},actions=output:{}".format(
+                switch.name, priority, output_port))
+        else:
+            hp.add_flow_ip(net, switch.name, priority, nw_dst, output_port)
+
+
+def get_path_between_hosts(src_h, dst_h, spine_index=None):
+    """ Returns the exact (deterministic) path between the pair of substrate hosts in the spine leaf
+    topology, as a list of links (pairs of Host/Switch objects) hop by hop. The path is computed from
+    the indices of the hosts (and switches) in the topology, following the same routing as the flow
+    table entries of the switches.
+    Example: [(h1, sh1), (sh1, s2_1), (s2_1, s1_1), (s1_1, s2_2), (s2_2, sh3), (sh3, h3)]
+    spine_index: Index of the spine switch to go through, if the hosts are under different leaf
+        switches. By default, the one that the substrate flow entries route through. """
+    src_leaf_switch = gbl.LEAF_SWITCHES[src_h.leaf_index]
+    dst_leaf_switch = gbl.LEAF_SWITCHES[dst_h.leaf_index]
+
+    # Going upwards from host layer; through the host switch (if any) to the leaf switch.
+    path = [(src_h, src_h.host_switch_attached)]
+    if hp.uses_host_switches():
+        path.append((src_h.host_switch_attached, src_leaf_switch))
+
+    # If destination host is under the same leaf switch, then packet doesn't go to the spine
+    # layer at all. Otherwise it goes through the spine switch selected in the same way as in
+    # the `get_output_port_for_leaf_switches_towards_spine` function in `helpers` module.
+    if src_leaf_switch is not dst_leaf_switch:
+        if spine_index is None:
+            spine_index = hp.get_output_port_for_leaf_switches_towards_spine(
+                src_leaf_switch, dst_h.spine_index) - 1
+        spine_switch = gbl.SPINE_SWITCHES[spine_index]
+        path.append((src_leaf_switch, spine_switch))
+        path.append((spine_switch, dst_leaf_switch))
+
+    # Downwards journey; through the host switch (if any) to the destination host.
+    if hp.uses_host_switches():
+        path.append((dst_leaf_switch, dst_h.host_switch_attached))
+    path.append((dst_h.host_switch_attached, dst_h))
+    return path
+
+
+def get_spine_switch_on_path(path):
+    """ Returns the spine switch that the path (as returned by `get_path_between_hosts`) goes
+    through, or None if the path stays under a single leaf switch. """
+    for (_, node) in path:
+        if node in gbl.SPINE_SWITCHES:
+            return node
+    return None
+
+
+def get_residual_bws_through_spine_switches(src_leaf_switch, dst_leaf_switch, SWITCH_PAIR_x_BW):
+    """ Returns the list of residual bandwidths of the paths between the two leaf switches through
+    each of the spine switches (in order); i.e. the smaller of the bandwidths of the links of the
+    spine switch with the two leaf switches. """
+    return [min(SWITCH_PAIR_x_BW[(src_leaf_switch.name, spine_switch.name)],
+                SWITCH_PAIR_x_BW[(spine_switch.name, dst_leaf_switch.name)]) for spine_switch in gbl.SPINE_SWITCHES]
+
+
+def _get_spine_index_with_max_residual_bw(src_leaf_switch, dst_leaf_switch, SWITCH_PAIR_x_BW):
+    """ Returns the index of the spine switch through which the path between the two leaf switches
+    has the most residual bandwidth. Ties are broken in favour of the spine switch of the static
+    routing (needing no additional flow entries), then the lowest index. """
+    static_spine_index = hp.get_output_port_for_leaf_switches_towards_spine(
+        src_leaf_switch, hp.get_spine_index_of_leaf_switch(dst_leaf_switch)) - 1
+    residual_bws = get_residual_bws_through_spine_switches(
+        src_leaf_switch, dst_leaf_switch, SWITCH_PAIR_x_BW)
+    return max(range(len(residual_bws)), key=lambda i: (residual_bws[i], i == static_spine_index, -i))
+
+
+def _water_fill(capacities, demand):
+    """ Splits the (integer) demand into shares over the capacities, such that the smallest capacity
+    left is as large as possible; i.e. the largest capacities are leveled down first, like water
+    filling the space above them. Returns the list of (integer) shares, in order of the capacities.
+    Example: [4, 3, 0] for capacities [10, 9, 5] and demand 7, leaving [6, 6, 5]. The demand must
+    not be more than the sum of the capacities (see `split_bw_between_hosts`). """
+    order = sorted(range(len(capacities)), key=lambda i: -capacities[i])
+    # Finding the 'water level', i.e. the capacity left on each of the k largest capacities which
+    # are used; the smaller capacities (below the level) are not used at all.
+    total = 0
+    for k, i in enumerate(order, 1):
+        total += capacities[i]
+        level = (total - demand) / k
+        if k == len(order) or level >= capacities[order[k]]:
+            break
+    shares = [0] * len(capacities)
+    for i in order[:k]:
+        shares[i] = math.floor(capacities[i] - level)
+    # Rounding down leaves a remainder (smaller than k), given to the largest capacities left.
+    remainder = demand - sum(shares)
+    for i in sorted(order[:k], key=lambda i: shares[i] - capacities[i])[:remainder]:
+        shares[i] += 1
+    return shares
+
+
+def select_path_between_hosts(host_pair, SWITCH_PAIR_x_BW):
+    """ Returns the path (as returned by `get_path_between_hosts`) between the pair of substrate
+    hosts, along which a virtual link between them is to be mapped, as per the routing mode. With
+    'static' routing, this is always the fixed path in gbl.PATH_BETWEEN_HOSTS. With 'load-aware'
+    routing, the path between hosts under different leaf switches goes through the spine switch
+    with the most residual bandwidth (as per SWITCH_PAIR_x_BW), so that virtual links are spread
+    over all the spine switches instead of loading the ones of the higher subnets.
+    host_pair: Pair of substrate hosts, in any order. The path starts at the host with the smaller
+        number, as in gbl.PATH_BETWEEN_HOSTS.
+    SWITCH_PAIR_x_BW: The (residual) bandwidths of switch pairs to select the path by.
+    """
+    (h1, h2) = host_pair
+    if int(h1.name[1:]) > int(h2.name[1:]):
+        (h1, h2) = (h2, h1)
+    if hp.get_routing_mode() != "load-aware" or h1.leaf_index == h2.leaf_index:
+        return gbl.PATH_BETWEEN_HOSTS[(h1, h2)]
+    spine_index = _get_spine_index_with_max_residual_bw(
+        gbl.LEAF_SWITCHES[h1.leaf_index], gbl.LEAF_SWITCHES[h2.leaf_index], SWITCH_PAIR_x_BW)
+    return get_path_between_hosts(h1, h2, spine_index)
+
+
+def split_bw_between_hosts(host_pair, bw_req, SWITCH_PAIR_x_BW):
+    """ Returns the list of (path, bandwidth) over which a virtual link between the pair of substrate
+    hosts is to be mapped, as per the routing mode. With 'multipath' routing, a virtual link between
+    hosts under different leaf switches is split over the paths through the spine switches, by
+    water-filling their residual bandwidths (as per SWITCH_PAIR_x_BW); so the virtual link can
+    use the capacity of all the spine switches together. Otherwise it is the single path selected
+    by `select_path_between_hosts`, carrying all the bandwidth.
+    Example: [(path through s1_1, 3), (path through s1_2, 2)] for bw_req 5.
+    Raises an exception if the virtual link does not fit in the residual bandwidths of all the paths
+    through the spine switches together with 'multipath' routing, instead of over-committing them.
+    host_pair: Pair of substrate hosts, in any order.
+    bw_req: The bandwidth requirement of the virtual link.
+    SWITCH_PAIR_x_BW: The (residual) bandwidths of switch pairs to split the bandwidth by.
+    """
+    (h1, h2) = host_pair
+    if int(h1.name[1:]) > int(h2.name[1:]):
+        (h1, h2) = (h2, h1)
+    if hp.get_routing_mode() != "multipath" or h1.leaf_index == h2.leaf_index:
+        return [(select_path_between_hosts((h1, h2), SWITCH_PAIR_x_BW), bw_req)]
+    residual_bws = get_residual_bws_through_spine_switches(
+        gbl.LEAF_SWITCHES[h1.leaf_index], gbl.LEAF_SWITCHES[h2.leaf_index], SWITCH_PAIR_x_BW)
+    residual_bws = [max(bw, 0) for bw in residual_bws]
+    if bw_req > sum(residual_bws):
+        raise Exception("Bandwidth {} between hosts {} and {} is more than the residual bandwidth {} of all the paths through the spine switches.".format(
+            bw_req, h1.name, h2.name, sum(residual_bws)))
+    shares = _water_fill(residual_bws, bw_req)
+    return [(get_path_between_hosts(h1, h2, spine_index), share)
+            for spine_index, share in enumerate(shares) if share > 0]
+
+
+class PathsBetweenHosts(dict):
+    """
+    gbl.PATH_BETWEEN_HOSTS as populated by `populate_path_between_hosts`. The path of a host pair
+    is only got from the path oracle of the topology (gbl.TOPOLOGY) the first time it is looked
+    up; so the paths of the host pairs never used by any VNR are never computed, and creating the
+    substrate network does not depend on the number of host pairs.
     """
-    # Going upwards from host layer. Adding the first host switch link in path.
-    for i in range(len(gbl.HOSTS)):
-        for j in range(i + 1, len(gbl.HOSTS)):
-            host_pair = (gbl.HOSTS[i], gbl.HOSTS[j])
-            gbl.PATH_BETWEEN_HOSTS[host_pair] = []
-            gbl.PATH_BETWEEN_HOSTS[host_pair].append(
-                (gbl.HOSTS[i], gbl.HOSTS[i].host_switch_attached))
-
-    # Going upwards from host switches layer. Adding next link, i.e. host switch
-    # and leaf switch link in the path.
-    for host_pair, path in gbl.PATH_BETWEEN_HOSTS.items():
-        current_host_switch = path[-1][1]
-        host_switch_ip_subnet = current_host_switch.ip_subnet
-        next_leaf_switch_subnet = ".".join(
-            host_switch_ip_subnet.split(".")[0:2])
-        next_leaf_switch = gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH[next_leaf_switch_subnet]
-        gbl.PATH_BETWEEN_HOSTS[host_pair].append(
-            (current_host_switch, next_leaf_switch))
-
-    # Now depending on the dst IP address, we either go up a layer to the spine switches
-    # in the path, or else directly go down back to host switches.
-    for (src_h, dst_h), path in gbl.PATH_BETWEEN_HOSTS.items():
-        current_leaf_switch = path[-1][1]
-        leaf_switch_ip_subnet = current_leaf_switch.ip_subnet
-        dst_h_under_ip_subnet = ".".join(dst_h.ip_addr.split(".")[0:2])
-        # If destination host is under this leaf switch, then packet doesn't go to
-        # spine leaf layer at all.
-        if dst_h_under_ip_subnet != leaf_switch_ip_subnet:
-            # Update the next spine switch in the path. Note that the spine leaf switch is
-            # selected based on the destination host's IP subnet. The same logic is used
-            # in `get_output_port_for_leaf_switches_towards_spine` function in `helpers` module.
-            next_spine_switch_subnet = dst_h_under_ip_subnet.split(".")[0]
-            next_spine_switch = gbl.SPINE_LAYER_IP_SUBNET_x_SWITCH[next_spine_switch_subnet]
-            gbl.PATH_BETWEEN_HOSTS[(src_h, dst_h)].append(
-                (current_leaf_switch, next_spine_switch))
-
-    # Starting the downwards journey. Need to find the next spine-leaf switch path if
-    # and only if spine path was added in previous block of code.
-    for (src_h, dst_h), path in gbl.PATH_BETWEEN_HOSTS.items():
-        current_switch = path[-1][1]
-        if current_switch not in gbl.SPINE_SWITCHES:
-            continue
-        dst_h_under_ip_subnet = ".".join(dst_h.ip_addr.split(".")[0:2])
-        next_leaf_switch = gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH[dst_h_under_ip_subnet]
-        gbl.PATH_BETWEEN_HOSTS[(src_h, dst_h)].append(
-            (current_switch, next_leaf_switch))
-
-    # Now every host pair has the latest leaf layer switch updated, and we continue
-    # the downward journey, to get the next host switch in the path.
-    for (src_h, dst_h), path in gbl.PATH_BETWEEN_HOSTS.items():
-        current_leaf_switch = path[-1][1]
-        next_host_switch_subnet = ".".join(dst_h.ip_addr.split(".")[0:3])
-        next_host_switch = gbl.HOST_LAYER_IP_SUBNET_x_SWITCH[next_host_switch_subnet]
-        gbl.PATH_BETWEEN_HOSTS[(src_h, dst_h)].append(
-            (current_leaf_switch, next_host_switch))
-
-    # Finally the last link between host layer switch and destination host is added.
-    for (src_h, dst_h), path in gbl.PATH_BETWEEN_HOSTS.items():
-        current_host_switch = path[-1][1]
-        gbl.PATH_BETWEEN_HOSTS[(src_h, dst_h)].append(
-            (current_host_switch, dst_h))
+
+    def __init__(self):
+        super().__init__()
+        self.host_x_index = {host: i for (i, host) in enumerate(gbl.HOSTS)}
+
+    def __missing__(self, host_pair):
+        if self.host_x_index[host_pair[0]] >= self.host_x_index[host_pair[1]]:
+            raise KeyError(host_pair)
+        self[host_pair] = gbl.TOPOLOGY.get_path_between_hosts(
+            host_pair[0], host_pair[1])
+        return self[host_pair]
+
+
+def populate_path_between_hosts(print_paths=False):
+    """ Populates the exact path between every pair of hosts in the network, as given by the
+    path oracle of the topology (gbl.TOPOLOGY). This function basically populates the gbl.PATH_BETWEEN_HOSTS 
+    global variable, which is then used in the vnr mapping algorithms. The paths are got lazily,
+    i.e. when first looked up (see `PathsBetweenHosts`).
+    print_paths: Whether to print all the paths (computing all of them); not advisable for large
+        substrates.
+    """
+    gbl.PATH_BETWEEN_HOSTS = PathsBetweenHosts()
 
     print("\nPopulated the path between all host pairs...")
-    for (src_h, dst_h), path in gbl.PATH_BETWEEN_HOSTS.items():
-        print("({}, {}): {}".format(src_h.name, dst_h.name,
-                                    [(x.name, y.name) for (x, y) in path]))
+    if print_paths:
+        print_path_between_hosts()
+
+
+def print_path_between_hosts():
+    """ Prints the path between every pair of hosts, as in gbl.PATH_BETWEEN_HOSTS. """
+    for i in range(len(gbl.HOSTS)):
+        for j in range(i + 1, len(gbl.HOSTS)):
+            (src_h, dst_h) = (gbl.HOSTS[i], gbl.HOSTS[j])
+            print("({}, {}): {}".format(src_h.name, dst_h.name,
+                                        [(x.name, y.name) for (x, y) in gbl.PATH_BETWEEN_HOSTS[(src_h, dst_h)]]))
@@ -0,0 +1,162 @@
+import gbl
+import substrate
+import output as op
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import copy
+
+# Version of the snapshot format; part of the cache key, so that snapshots written in an older
+# format are never loaded.
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class LazyPathsBetweenHosts(dict):
+    """
+    gbl.PATH_BETWEEN_HOSTS as loaded from a substrate snapshot. The paths of all the host pairs are
+    kept in flat arrays (the node indices of all the paths, one after the other, and the offset of
+    every path), and the path of a host pair is only decoded into List[Tuple(node, node)] the first
+    time it is looked up. So loading the snapshot does not depend on the number of host pairs.
+    """
+
+    def __init__(self, nodes, path_nodes, path_offsets):
+        super().__init__()
+        self.nodes = nodes
+        self.path_nodes = path_nodes
+        self.path_offsets = path_offsets
+        self.host_x_index = {host: i for (i, host) in enumerate(gbl.HOSTS)}
+
+    def __missing__(self, host_pair):
+        (i, j) = (self.host_x_index[host_pair[0]],
+                  self.host_x_index[host_pair[1]])
+        if i >= j:
+            raise KeyError(host_pair)
+        pair_index = _get_host_pair_index(i, j, len(gbl.HOSTS))
+        path = [self.nodes[k] for k in self.path_nodes[
+            self.path_offsets[pair_index]:self.path_offsets[pair_index + 1]].tolist()]
+        self[host_pair] = list(zip(path, path[1:]))
+        return self[host_pair]
+
+
+def _get_host_pair_index(i, j, num_hosts):
+    """ Returns the index of the host pair (i, j), where i < j, when all the host pairs are listed
+    in the order of gbl.PATH_BETWEEN_HOSTS, i.e. (0, 1), (0, 2), ..., (1, 2), ... """
+    return i*num_hosts - i*(i + 1)//2 + (j - i - 1)
+
+
+def get_substrate_cache_path(sl_factor, ll_factor, hl_factor):
+    """ Returns the file path of the snapshot of the substrate network, or None if the substrate
+    snapshots are not enabled (the 'substrate_cache_dir' value in the configurations file). The file
+    name has a hash of everything the generated substrate network depends on, i.e. the 'substrate'
+    configurations, the seed, and the host switch and addressing configurations. """
+    cache_dir = gbl.CFG.get("substrate_cache_dir")
+    if not cache_dir:
+        return None
+    key = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "substrate": gbl.CFG["substrate"],
+        "factors": [sl_factor, ll_factor, hl_factor],
+        "seed_for_substrate_network": gbl.CFG["seed_for_substrate_network"],
+        "host_switches": gbl.CFG.get("host_switches", True),
+        "addressing": gbl.CFG.get("addressing", "octet"),
+    }
+    digest = hashlib.sha1(json.dumps(
+        key, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, "substrate_{}.npz".format(digest))
+
+
+def _get_nodes():
+    """ Returns List of all the nodes (switches and substrate hosts) in the topology, which the
+    snapshot refers to by their index. """
+    return gbl.TOPOLOGY.get_switches() + gbl.HOSTS
+
+
+def save_substrate_snapshot(file_path):
+    """ Saves the generated substrate network (the cpu limits and IP addresses of the hosts, the
+    link bandwidths, and the paths between all host pairs) to the .npz file. The file is written
+    under a temporary name and then renamed, so that parallel runs never read a partial file. """
+    nodes = _get_nodes()
+    node_x_index = {node.name: i for (i, node) in enumerate(nodes)}
+
+    links = [(node1.name, node2.name) for (node1, node2, bw_config_key) in gbl.TOPOLOGY.get_links()
+             if bw_config_key is not None]
+    link_nodes = np.array([(node_x_index[node1], node_x_index[node2]) for (node1, node2) in links],
+                          dtype=np.int32).reshape(-1, 2)
+    link_bws = np.array([gbl.ORIGINAL_SWITCH_PAIR_x_BW[link]
+                        for link in links], dtype=np.int64)
+
+    path_nodes = []
+    path_offsets = [0]
+    for i in range(len(gbl.HOSTS)):
+        for j in range(i + 1, len(gbl.HOSTS)):
+            path = gbl.PATH_BETWEEN_HOSTS[(gbl.HOSTS[i], gbl.HOSTS[j])]
+            path_nodes.extend(node_x_index[x.name] for (x, _) in path)
+            path_nodes.append(node_x_index[path[-1][1].name])
+            path_offsets.append(len(path_nodes))
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path) or ".", suffix=".npz", delete=False) as f:
+        np.savez(f,
+                 node_names=np.array([node.name for node in nodes]),
+                 host_cpu_limits=np.array(
+                     [host.cpu_limit for host in gbl.HOSTS], dtype=np.int64),
+                 host_ip_addrs=np.array(
+                     [host.ip_addr for host in gbl.HOSTS]),
+                 link_nodes=link_nodes,
+                 link_bws=link_bws,
+                 path_nodes=np.array(path_nodes, dtype=np.int32),
+                 path_offsets=np.array(path_offsets, dtype=np.int64))
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, file_path)
+    print("\nSaved the substrate network snapshot to {}".format(file_path))
+
+
+def load_substrate_snapshot(file_path):
+    """ Loads the link bandwidths (gbl.SWITCH_PAIR_x_BW) and the paths between all host pairs
+    (gbl.PATH_BETWEEN_HOSTS) from the .npz file, in place of `substrate.generate_link_bandwidths`
+    and `substrate.populate_path_between_hosts`. The switches and hosts must have been generated
+    already by the topology (which is cheap); they are checked against the snapshot.
+    Returns False (and nothing is loaded) if there is no such snapshot, or it does not match. """
+    if not os.path.exists(file_path):
+        return False
+    nodes = _get_nodes()
+    with np.load(file_path) as snapshot:
+        if snapshot["node_names"].tolist() != [node.name for node in nodes] or \
+                snapshot["host_cpu_limits"].tolist() != [host.cpu_limit for host in gbl.HOSTS] or \
+                snapshot["host_ip_addrs"].tolist() != [host.ip_addr for host in gbl.HOSTS]:
+            print("\nIgnoring the substrate network snapshot {}, as it does not match the topology.".format(
+                file_path))
+            return False
+        link_nodes = snapshot["link_nodes"].tolist()
+        link_bws = snapshot["link_bws"].tolist()
+        path_nodes = snapshot["path_nodes"]
+        path_offsets = snapshot["path_offsets"]
+
+    for ((i, j), bw) in zip(link_nodes, link_bws):
+        gbl.SWITCH_PAIR_x_BW[(nodes[i].name, nodes[j].name)] = bw
+        gbl.SWITCH_PAIR_x_BW[(nodes[j].name, nodes[i].name)] = bw
+        op.output_dict["pre_resource"] += bw
+        op.output_dict["total_links"] += 1
+    gbl.ORIGINAL_SWITCH_PAIR_x_BW = copy.deepcopy(gbl.SWITCH_PAIR_x_BW)
+
+    gbl.PATH_BETWEEN_HOSTS = LazyPathsBetweenHosts(
+        nodes, path_nodes, path_offsets)
+    print("\nLoaded the substrate network snapshot from {}".format(file_path))
+    return True
+
+
+def generate_or_load_substrate_network(sl_factor, ll_factor, hl_factor, print_paths=False):
+    """ Generates the link bandwidths and the paths between all host pairs of the substrate network
+    (whose switches and hosts are already generated by gbl.TOPOLOGY); or loads them from the
+    snapshot of the same substrate network, if enabled and saved by an earlier run. """
+    file_path = get_substrate_cache_path(sl_factor, ll_factor, hl_factor)
+    if file_path is not None and load_substrate_snapshot(file_path):
+        if print_paths:
+            substrate.print_path_between_hosts()
+        return
+    substrate.generate_link_bandwidths()
+    substrate.populate_path_between_hosts(print_paths=print_paths)
+    if file_path is not None:
+        save_substrate_snapshot(file_path)
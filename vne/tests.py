@@ -1,6 +1,28 @@
 import gbl
+import helpers as hp
 from substrate import SubstrateHost
+import topologies
+import substrate_cache
+import admission
+import vne_algorithms
+import vnr_mapping
+import output as op
+from concurrent.futures import ThreadPoolExecutor
+from mininet.util import numCores
+import networkx as nx
 import numpy as np
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 
 
 #########################################################################################
@@ -25,6 +47,102 @@ def test_ping_within_vnr_vhosts(net):
                   "Ping test PASSED for VNR {}!".format(vnr.vnr_number) + gbl.bcolors.ENDC)
 
 
+def _summarize_reachability_diff(pairs, vhost_name_x_vnr_number):
+    """ Summarizes a list of (src virtual host name, dst virtual host name) pairs compactly, by
+    grouping them on the (src VNR, dst VNR) pair, and showing a few example pairs for each. """
+    vnr_pair_x_pairs = {}
+    for (src, dst) in pairs:
+        vnr_pair_x_pairs.setdefault(
+            (vhost_name_x_vnr_number[src], vhost_name_x_vnr_number[dst]), []).append((src, dst))
+    lines = []
+    for (src_vnr, dst_vnr), vnr_pairs in sorted(vnr_pair_x_pairs.items()):
+        lines.append("vnr{} -> vnr{}: {} pairs, e.g. {}".format(src_vnr, dst_vnr, len(vnr_pairs), ", ".join(
+            "{}->{}".format(src, dst) for (src, dst) in vnr_pairs[:3])))
+    return lines
+
+
+def test_reachability_matrix_of_vnr_vhosts(net, timeout=1, parallel_probes=16, max_parallel_probes=None, all_pairs=False):
+    """ Test reachability between the virtual hosts across all the VNRs; virtual hosts in the same
+    VNR shall be reachable to each other, while virtual hosts of different VNRs shall not
+    (isolation). Every virtual host probes all the other virtual hosts of its VNR, and the first
+    virtual host of every VNR (its 'representative') probes the representatives of all the other
+    VNRs; or every virtual host probes every other one with all_pairs. Each pair is probed with a
+    single ping, and the probes are run in parallel (both across and within the hosts' namespaces),
+    in waves of virtual hosts so that at most max_parallel_probes probes run at once. Reports the
+    'leaks' (pairs reachable across VNRs) and 'gaps' (pairs not reachable within a VNR) compactly.
+    timeout: Time in seconds to wait for the reply of each probe.
+    parallel_probes: Number of probes run in parallel from each virtual host.
+    max_parallel_probes: Number of probes run in parallel in total; 64 per cpu by default.
+    all_pairs: Whether to probe every pair of virtual hosts across the VNRs, instead of only the
+        representatives of the VNRs; the number of probes then grows with the square of the
+        number of virtual hosts, most of them waiting for the timeout.
+    """
+    print("\n\n================= Running reachability matrix test =================")
+    start = time.time()
+    if max_parallel_probes is None:
+        max_parallel_probes = (os.cpu_count() or 1) * 64
+    vhosts = [vh for vnr in gbl.MAPPED_VNRS for vh in vnr.virtual_hosts]
+    vhost_name_x_vnr_number = {vh.name: vnr.vnr_number
+                               for vnr in gbl.MAPPED_VNRS for vh in vnr.virtual_hosts}
+    ip_addr_x_vhost_name = {vh.ip_addr: vh.name for vh in vhosts}
+    representatives = [vnr.virtual_hosts[0]
+                       for vnr in gbl.MAPPED_VNRS if vnr.virtual_hosts]
+
+    # The virtual hosts probed by every virtual host.
+    vhost_name_x_dst_vhosts = {}
+    for vnr in gbl.MAPPED_VNRS:
+        for vh in vnr.virtual_hosts:
+            dst_vhosts = vhosts if all_pairs else vnr.virtual_hosts
+            if not all_pairs and vh is vnr.virtual_hosts[0]:
+                dst_vhosts = dst_vhosts + [rep for rep in representatives
+                                           if vhost_name_x_vnr_number[rep.name] != vnr.vnr_number]
+            vhost_name_x_dst_vhosts[vh.name] = [
+                other_vh for other_vh in dst_vhosts if other_vh is not vh]
+
+    # Writing the list of the destination IPs of every virtual host to a file (the hosts share the
+    # filesystem); the virtual host reads it and prints the IPs which replied.
+    ip_list_dir = tempfile.mkdtemp(suffix=".ips")
+    for vh in vhosts:
+        with open(os.path.join(ip_list_dir, vh.name), "w") as f:
+            f.write("".join(other_vh.ip_addr + "\n"
+                    for other_vh in vhost_name_x_dst_vhosts[vh.name]))
+    leaks = []
+    gaps = []
+    wave_size = max(1, max_parallel_probes // parallel_probes)
+    for i in range(0, len(vhosts), wave_size):
+        wave = vhosts[i:i + wave_size]
+        for vh in wave:
+            net[vh.name].sendCmd("xargs -P {} -I{{}} sh -c 'ping -c1 -W{} {{}} >/dev/null 2>&1 && echo REACHABLE {{}}' < {}".format(
+                parallel_probes, timeout, os.path.join(ip_list_dir, vh.name)))
+        for vh in wave:
+            output = net[vh.name].waitOutput()
+            reachable_vhost_names = set(ip_addr_x_vhost_name[ip] for ip in re.findall(
+                r"REACHABLE (\S+)", output) if ip in ip_addr_x_vhost_name)
+            for other_vh in vhost_name_x_dst_vhosts[vh.name]:
+                expected = vhost_name_x_vnr_number[vh.name] == vhost_name_x_vnr_number[other_vh.name]
+                obtained = other_vh.name in reachable_vhost_names
+                if obtained and not expected:
+                    leaks.append((vh.name, other_vh.name))
+                elif expected and not obtained:
+                    gaps.append((vh.name, other_vh.name))
+    shutil.rmtree(ip_list_dir)
+
+    num_pairs = sum(len(dst_vhosts) for dst_vhosts in vhost_name_x_dst_vhosts.values())
+    if not leaks and not gaps:
+        print(gbl.bcolors.OKGREEN + "Reachability matrix test PASSED for all {} pairs of virtual hosts!".format(
+            num_pairs) + gbl.bcolors.ENDC)
+    else:
+        print(gbl.bcolors.FAIL + "Reachability matrix test FAILED: {} leaks and {} gaps, out of {} pairs of virtual hosts.".format(
+            len(leaks), len(gaps), num_pairs) + gbl.bcolors.ENDC)
+        for line in _summarize_reachability_diff(leaks, vhost_name_x_vnr_number):
+            print("  leak  " + line)
+        for line in _summarize_reachability_diff(gaps, vhost_name_x_vnr_number):
+            print("  gap   " + line)
+    print("Probed {} pairs of virtual hosts in {:.2f} seconds.".format(
+        num_pairs, time.time() - start))
+    return leaks, gaps
+
+
 def test_iperf_bandwidth_within_vnr_vhosts(net):
     """ Test iperf to check link bandwidth for all the virtual links as provided in each VNR."""
     for vnr in gbl.MAPPED_VNRS:
@@ -55,6 +173,355 @@ def test_iperf_bandwidth_within_vnr_vhosts(net):
             print(gbl.bcolors.OKGREEN +
                   "Iperf test PASSED for VNR {}!".format(vnr.vnr_number) + gbl.bcolors.ENDC)
 
+
+def _get_substrate_links_of_virtual_link(vnr, vh1, vh2):
+    """ Returns the set of substrate links (each a frozenset of the two node names) in the path
+    (or paths) along which the virtual link between the two virtual hosts of the VNR is mapped. """
+    paths = vnr.get_paths_of_link(
+        vh1.substrate_host.name, vh2.substrate_host.name)
+    return set(frozenset((node1.name, node2.name)) for (path, _) in paths for (node1, node2) in path)
+
+
+def _schedule_virtual_links_in_rounds(virtual_links):
+    """ Groups the virtual links into rounds, such that no two virtual links in the same round
+    share a substrate link, or a virtual host (endpoint); so that the virtual links in a round
+    can be tested concurrently without affecting each other's bandwidth. This is a greedy
+    coloring of the 'conflict graph' of the virtual links, so the number of rounds is close to
+    its chromatic number instead of being the number of virtual links.
+    virtual_links: List of Tuple(vnr, virtual host 1, virtual host 2, expected bandwidth).
+    Returns a list of rounds, each being a list of indices into virtual_links.
+    """
+    conflict_graph = nx.Graph()
+    conflict_graph.add_nodes_from(range(len(virtual_links)))
+    # Every shared resource (substrate link or virtual host) is a clique in the conflict graph.
+    resource_x_virtual_links = {}
+    for i, (vnr, vh1, vh2, _) in enumerate(virtual_links):
+        resources = _get_substrate_links_of_virtual_link(vnr, vh1, vh2)
+        resources.update([vh1.name, vh2.name])
+        for resource in resources:
+            resource_x_virtual_links.setdefault(resource, []).append(i)
+    for sharing_virtual_links in resource_x_virtual_links.values():
+        for j, vl1 in enumerate(sharing_virtual_links):
+            for vl2 in sharing_virtual_links[j + 1:]:
+                conflict_graph.add_edge(vl1, vl2)
+
+    virtual_link_x_round = nx.greedy_color(
+        conflict_graph, strategy="largest_first")
+    rounds = [[] for _ in range(max(virtual_link_x_round.values(), default=-1) + 1)]
+    for i, round_number in sorted(virtual_link_x_round.items()):
+        rounds[round_number].append(i)
+    return rounds
+
+
+def test_concurrent_iperf_bandwidth_within_vnr_vhosts(net, duration=None):
+    """ Test iperf to check link bandwidth for all the virtual links as provided in each VNR, same as
+    `test_iperf_bandwidth_within_vnr_vhosts`, but running iperf concurrently for all the virtual links
+    which don't share any substrate link (or virtual host) with each other. The total time taken is
+    hence (number of rounds * duration) instead of (number of virtual links * duration).
+    duration: Time in seconds for which each iperf is run. If None, it is taken from the
+        'iperf_duration' value in the configurations file.
+    """
+    if duration is None:
+        duration = gbl.CFG.get("iperf_duration", 5)
+    virtual_links = []
+    for vnr in gbl.MAPPED_VNRS:
+        for link in vnr.vnr_links_with_bw:
+            virtual_links.append((vnr, vnr.hostname_x_vh[link[0]],
+                                  vnr.hostname_x_vh[link[1]], link[2]))
+    rounds = _schedule_virtual_links_in_rounds(virtual_links)
+    print("\nChecking iperf bandwidths for {} virtual links in {} rounds of {} seconds each...".format(
+        len(virtual_links), len(rounds), duration))
+
+    vnr_number_x_failed = {vnr.vnr_number: False for vnr in gbl.MAPPED_VNRS}
+    for round_number, round_virtual_links in enumerate(rounds):
+        # Every virtual link in the round gets its own iperf server port on its receiving host.
+        servers = []
+        for port, i in enumerate(round_virtual_links, start=5001):
+            (_, _, vh2, _) = virtual_links[i]
+            servers.append(net[vh2.name].popen(
+                "iperf -s -p {}".format(port)))
+        time.sleep(0.5)
+        clients = []
+        for port, i in enumerate(round_virtual_links, start=5001):
+            (_, vh1, vh2, _) = virtual_links[i]
+            clients.append(net[vh1.name].popen("iperf -c {} -p {} -t {} -y C".format(
+                vh2.ip_addr, port, duration)))
+        for i, client in zip(round_virtual_links, clients):
+            (vnr, vh1, vh2, bw_expected) = virtual_links[i]
+            iperf_output = client.communicate()[0]
+            if isinstance(iperf_output, bytes):
+                iperf_output = iperf_output.decode()
+            # The CSV output (-y C) has the bandwidth in bits/sec as its last field, and needs
+            # no conversion to the 'mbit' (10^6 bits) unit used by traffic control commands.
+            try:
+                bw_obtained = int(iperf_output.strip().splitlines()
+                                  [-1].split(",")[-1]) / 1e6
+            except (IndexError, ValueError):
+                bw_obtained = 0
+            # Computing MAPE (mean absolute percentage error).
+            mean_absolute_percentage_error = np.mean(
+                np.abs((bw_expected - bw_obtained)/bw_expected))*100
+            print("Round {}: {} -> {}, bw_expected = {}, bw_obtained = {:.3f}, MAPE = {:.2f}".format(
+                round_number, vh1.name, vh2.name, bw_expected, bw_obtained, mean_absolute_percentage_error))
+            # Imposing threshold condition for how much MAPE to allow. Can be changed.
+            if mean_absolute_percentage_error > 5.0:
+                print(gbl.bcolors.FAIL + "Iperf test FAILED for VNR {}, MAPE = {}, bw_expected = {}, bw_obtained = {}.".format(
+                    vnr.vnr_number, mean_absolute_percentage_error, bw_expected, bw_obtained) + gbl.bcolors.ENDC)
+                vnr_number_x_failed[vnr.vnr_number] = True
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    for vnr_number, failed in vnr_number_x_failed.items():
+        if not failed:
+            print(gbl.bcolors.OKGREEN +
+                  "Iperf test PASSED for VNR {}!".format(vnr_number) + gbl.bcolors.ENDC)
+    return vnr_number_x_failed
+
+#########################################################################################
+
+# DATA PLANE VERIFICATION FROM THE FLOW TABLES: ofproto/trace and tc/meter rate checks.
+
+
+def _run_commands_concurrently(commands):
+    """ Runs every command (a list of arguments) concurrently and returns their outputs, in
+    the same order as the given commands. """
+    def _run(command):
+        return subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              universal_newlines=True).stdout
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as executor:
+        return list(executor.map(_run, commands))
+
+
+def _run_ofproto_traces(traces):
+    """ Traces a packet through the flow table of a switch using `ovs-appctl ofproto/trace`, for
+    every (switch name, flow) in `traces`, all of them concurrently. Returns a list (in the same
+    order as `traces`) of (output ports, actions) where 'output ports' are the OpenFlow ports the
+    packet is output on, and 'actions' is the text of all the actions applied on the packet. """
+    outputs = _run_commands_concurrently(
+        [["ovs-appctl", "ofproto/trace", switch_name, flow] for (switch_name, flow) in traces])
+    results = []
+    for output in outputs:
+        # Only the OpenFlow part of the trace is looked at; i.e. the part before the final
+        # (datapath) flow, which uses datapath port numbers instead of OpenFlow port numbers.
+        openflow_part = output.split("Final flow:")[0]
+        output_ports = [int(port) for port in re.findall(
+            r"\boutput:(\d+)", openflow_part)]
+        results.append((output_ports, openflow_part))
+    return results
+
+
+def _get_action_tokens(actions):
+    """ Returns the set of the single actions (e.g. 'mod_vlan_vid:3', 'output:1') in the text of the
+    actions of a trace; so that an action is compared exactly, and not as a substring of another one
+    (such as 'mod_vlan_vid:3' of 'mod_vlan_vid:30'). """
+    return set(re.split(r"[\s,=()]+", actions))
+
+
+def _get_ip_flows_of_switches(switch_names):
+    """ Dumps the flow table of every switch (`ovs-ofctl dump-flows`), all of them concurrently.
+    Returns the mapping of switch name to the list of its flows which can match IP packets, each
+    being (match, output ports, floods) where 'match' is the set of the single fields of the match
+    (e.g. 'dl_vlan=3', 'nw_dst=10.0.1.2'), 'output ports' are the OpenFlow ports of its output
+    actions, and 'floods' is whether it outputs on all the ports (FLOOD, ALL or NORMAL). """
+    switch_names = list(switch_names)
+    # The flows with meters (or select groups) can only be dumped with OpenFlow 1.3.
+    protocol_options = []
+    if hp.get_bw_enforcement_mode() == "meter" or hp.get_routing_mode() == "multipath":
+        protocol_options = ["-O", "OpenFlow13"]
+    outputs = _run_commands_concurrently(
+        [["ovs-ofctl"] + protocol_options + ["dump-flows", switch_name] for switch_name in switch_names])
+    switch_name_x_flows = {}
+    for (switch_name, output) in zip(switch_names, outputs):
+        flows = []
+        for line in output.splitlines():
+            if " actions=" not in line:
+                continue
+            (match, actions) = line.split(" actions=", 1)
+            match = set(re.split(r"[\s,]+", match.strip()))
+            if match & {"arp", "ipv6", "dl_type=0x0806", "eth_type=0x0806"}:
+                continue
+            output_ports = [int(port)
+                            for port in re.findall(r"\boutput:(\d+)", actions)]
+            floods = re.search(r"\b(FLOOD|ALL|NORMAL)\b", actions) is not None
+            flows.append((match, output_ports, floods))
+        switch_name_x_flows[switch_name] = flows
+    return switch_name_x_flows
+
+
+def _get_switch_port_x_neighbor(net):
+    """ Returns the mapping of (switch name, port number) to (neighbor node name, port number of
+    neighbor) for all the links of the switches in the network. """
+    switch_port_x_neighbor = {}
+    for switch in net.switches:
+        for intf in switch.intfList():
+            if not intf.link:
+                continue
+            other_intf = intf.link.intf2 if intf.link.intf1 is intf else intf.link.intf1
+            switch_port_x_neighbor[(switch.name, switch.ports[intf])] = (
+                other_intf.node.name, other_intf.node.ports[other_intf])
+    return switch_port_x_neighbor
+
+
+def _parse_tc_rate_in_mbit(rate):
+    """ Converts a rate as shown by tc (e.g. '4Mbit', '500Kbit', '1Gbit', '800bit') to mbit. """
+    value, unit = re.match(r"([\d.]+)([KMG]?)bit", rate).groups()
+    return float(value) * {"": 1e-6, "K": 1e-3, "M": 1, "G": 1e3}[unit]
+
+
+def _get_expected_bandwidths_of_vhosts():
+    """ Returns the mapping of virtual host name to the (sorted) list of bandwidths of all its
+    virtual links, as requested in the mapped VNRs. """
+    vhost_name_x_bws = {}
+    for vnr in gbl.MAPPED_VNRS:
+        for vh in vnr.virtual_hosts:
+            vhost_name_x_bws[vh.name] = []
+        for link in vnr.vnr_links_with_bw:
+            vh1 = vnr.hostname_x_vh[link[0]]
+            vh2 = vnr.hostname_x_vh[link[1]]
+            vhost_name_x_bws[vh1.name].append(link[2])
+            vhost_name_x_bws[vh2.name].append(link[2])
+    for bws in vhost_name_x_bws.values():
+        bws.sort()
+    return vhost_name_x_bws
+
+
+def _verify_bandwidth_enforcement_rates(net):
+    """ Verifies that the configured rates of the bandwidth enforcement (tc HTB classes, or
+    OpenFlow meters) of every virtual host are as requested in the VNRs. Returns the mapping of
+    virtual host name to a failure description, for the virtual hosts that failed. """
+    failures = {}
+    vhost_name_x_bws = _get_expected_bandwidths_of_vhosts()
+    vhosts = [vh for vnr in gbl.MAPPED_VNRS for vh in vnr.virtual_hosts]
+
+    if hp.get_bw_enforcement_mode() == "meter":
+        # One 'dump-meters' per host switch, and the rates (kbps) are looked up by meter id.
+        switch_names = sorted(set(vh.host_switch_attached.name for vh in vhosts))
+        outputs = _run_commands_concurrently(
+            [["ovs-ofctl", "-O", "OpenFlow13", "dump-meters", switch_name] for switch_name in switch_names])
+        switch_name_x_meter_rates = {}
+        for switch_name, output in zip(switch_names, outputs):
+            switch_name_x_meter_rates[switch_name] = {int(meter_id): int(rate) for (meter_id, rate) in re.findall(
+                r"meter=(\d+).*?rate=(\d+)", output, re.DOTALL)}
+        for vh in vhosts:
+            meter_rates = switch_name_x_meter_rates[vh.host_switch_attached.name]
+            rates = sorted(meter_rates.get(meter_id, 0) /
+                           1000 for meter_id in vh.meter_ids)
+            if rates != vhost_name_x_bws[vh.name]:
+                failures[vh.name] = "meter rates {} != expected {}".format(
+                    rates, vhost_name_x_bws[vh.name])
+        return failures
+
+    # Running `tc -s class show` in all the virtual hosts in parallel; sendCmd doesn't wait for
+    # the command to finish, and waitOutput then collects the output of each virtual host.
+    for vh in vhosts:
+        net[vh.name].sendCmd("tc -s class show dev {}-eth0".format(vh.name))
+    for vh in vhosts:
+        output = net[vh.name].waitOutput()
+        # The leaf classes (parent 1:1) are the ones per virtual link; along with their counters.
+        rates = sorted(_parse_tc_rate_in_mbit(rate) for rate in re.findall(
+            r"class htb 1:\d+ parent 1:1 .*?rate (\S+)", output))
+        if rates != vhost_name_x_bws[vh.name]:
+            failures[vh.name] = "tc class rates {} != expected {}".format(
+                rates, vhost_name_x_bws[vh.name])
+        sent_bytes = sum(int(b) for b in re.findall(r"Sent (\d+) bytes", output))
+        dropped = sum(int(d) for d in re.findall(r"dropped (\d+)", output))
+        print("tc counters for {}: sent {} bytes, dropped {} packets.".format(
+            vh.name, sent_bytes, dropped))
+    return failures
+
+
+def test_data_plane_with_ofproto_trace(net, max_hops=8):
+    """ Verifies reachability between every pair of virtual hosts within each VNR, and isolation
+    between VNRs, using the flow tables of the switches (`ovs-appctl ofproto/trace`) instead of
+    sending any traffic; and verifies the configured rates of the bandwidth enforcement of every
+    virtual host. All traces of a step are run concurrently, hence this is much faster than the
+    ping and iperf tests.
+    - Reachability: a packet from a virtual host towards another virtual host of the same VNR is
+      traced hop by hop from the source host switch, and must be tagged with the VNR's isolation
+      id and finally be output on the port of the destination virtual host.
+    - Isolation: every flow of the host switch of a virtual host which outputs IP packets on the
+      port of that virtual host must match the isolation id of its VNR; so that a packet tagged
+      with the isolation id of any other VNR is never delivered to it. The flow tables are dumped
+      once per host switch, instead of tracing a packet per virtual host and isolation id.
+    max_hops: Maximum number of switches to trace through for a single packet.
+    """
+    print("\n\n================= Running data plane (ofproto/trace) test =================")
+    start = time.time()
+    switch_port_x_neighbor = _get_switch_port_x_neighbor(net)
+    switch_names = set(switch.name for switch in net.switches)
+
+    # Traces that are still in flight, hop by hop. Each being:
+    # (vnr, src virtual host, dst virtual host, switch name, flow at that switch, hops done).
+    in_flight = []
+    vnr_number_x_failures = {vnr.vnr_number: [] for vnr in gbl.MAPPED_VNRS}
+    for vnr in gbl.MAPPED_VNRS:
+        for vh1 in vnr.virtual_hosts:
+            for vh2 in vnr.virtual_hosts:
+                if vh1 is vh2:
+                    continue
+                flow = "in_port={},ip,nw_src={},nw_dst={}".format(
+                    vh1.host_switch_port, vh1.ip_addr, vh2.ip_addr)
+                in_flight.append(
+                    (vnr, vh1, vh2, vh1.host_switch_attached.name, flow, 0))
+
+    while in_flight:
+        results = _run_ofproto_traces(
+            [(switch_name, flow) for (_, _, _, switch_name, flow, _) in in_flight])
+        next_in_flight = []
+        for (vnr, vh1, vh2, switch_name, flow, hops), (output_ports, actions) in zip(in_flight, results):
+            # The first hop must tag the packet with the isolation id of the VNR.
+            if hops == 0 and hp.get_isolation_tag_actions(vnr.isolation_id) not in _get_action_tokens(actions):
+                vnr_number_x_failures[vnr.vnr_number].append(
+                    "{} -> {}: not tagged at {}".format(vh1.name, vh2.name, switch_name))
+                continue
+            if switch_name == vh2.host_switch_attached.name and vh2.host_switch_port in output_ports:
+                continue
+            next_hops = [switch_port_x_neighbor.get((switch_name, port))
+                         for port in output_ports]
+            next_hops = [n for n in next_hops if n and n[0] in switch_names]
+            if not next_hops or hops + 1 >= max_hops:
+                vnr_number_x_failures[vnr.vnr_number].append(
+                    "{} -> {}: not delivered, dropped at {}".format(vh1.name, vh2.name, switch_name))
+                continue
+            (next_switch_name, in_port) = next_hops[0]
+            next_flow = "in_port={},ip,{},nw_src={},nw_dst={}".format(
+                in_port, hp.get_isolation_tag_match(vnr.isolation_id), vh1.ip_addr, vh2.ip_addr)
+            next_in_flight.append(
+                (vnr, vh1, vh2, next_switch_name, next_flow, hops + 1))
+        in_flight = next_in_flight
+
+    # Isolation; from the flow tables of the host switches of the virtual hosts.
+    switch_name_x_flows = _get_ip_flows_of_switches(set(
+        vh.host_switch_attached.name for vnr in gbl.MAPPED_VNRS for vh in vnr.virtual_hosts))
+    for vnr in gbl.MAPPED_VNRS:
+        tag_match = hp.get_isolation_tag_match(vnr.isolation_id)
+        for vh in vnr.virtual_hosts:
+            for (match, output_ports, floods) in switch_name_x_flows[vh.host_switch_attached.name]:
+                if (floods or vh.host_switch_port in output_ports) and tag_match not in match:
+                    vnr_number_x_failures[vnr.vnr_number].append("{}: reachable by the flow '{}' of {}, without the isolation id {} of its VNR".format(
+                        vh.name, ",".join(sorted(match)), vh.host_switch_attached.name, vnr.isolation_id))
+
+    # Rates of the bandwidth enforcement.
+    rate_failures = _verify_bandwidth_enforcement_rates(net)
+    for vnr in gbl.MAPPED_VNRS:
+        for vh in vnr.virtual_hosts:
+            if vh.name in rate_failures:
+                vnr_number_x_failures[vnr.vnr_number].append(
+                    "{}: {}".format(vh.name, rate_failures[vh.name]))
+
+    for vnr_number, failures in vnr_number_x_failures.items():
+        if failures:
+            print(gbl.bcolors.FAIL + "Data plane test FAILED for VNR {}: {}".format(
+                vnr_number, "; ".join(failures)) + gbl.bcolors.ENDC)
+        else:
+            print(gbl.bcolors.OKGREEN +
+                  "Data plane test PASSED for VNR {}!".format(vnr_number) + gbl.bcolors.ENDC)
+    print("Verified {} VNRs in {:.2f} seconds.".format(
+        len(gbl.MAPPED_VNRS), time.time() - start))
+    print("=======================================================================")
+    return vnr_number_x_failures
+
 #########################################################################################
 
 # CPU LIMIT RELATED FUNCTIONS
@@ -84,4 +551,490 @@ def test_cpu_limits_for_all_hosts(net, duration=5):
                 h, f'{mean_absolute_percentage_error:.4f}', f'{cpu_expected:.4f}', f'{cpu_observed:.4f}') + gbl.bcolors.ENDC)
     print("=======================================================================")
 
+
+def test_cpu_limits_from_cgroups(net, sample_size=0, duration=2):
+    """ Test cpu limit for all hosts in the network, by reading the CFS quota and period configured
+    for each host directly from the cgroup filesystem, instead of running CPU intensive processes
+    in every host as in `test_cpu_limits_for_all_hosts`. This takes milliseconds per host.
+    sample_size: If non-zero, a load test is also run on a random sample of these many hosts,
+        measuring the CPU time actually consumed by a busy process in each, for `duration` seconds.
+    duration: Duration in seconds of the (optional) sampled load test.
+    """
+    print("\n\n================= Running CPU limit test (cgroups) ===================")
+    start = time.time()
+    num_cores = numCores()
+    hosts_tested = []
+    for h in net.hosts:
+        cpu_expected = gbl.HOSTNAME_x_HOST[str(h)].cpu_limit
+        host_kind = "substrate" if isinstance(
+            gbl.HOSTNAME_x_HOST[str(h)], SubstrateHost) else "virtual"
+        if not hp.is_cpu_limit_enforced(host_kind):
+            print("CPU limit of host {} is only modeled (not enforced), skipping.".format(h))
+            continue
+        quota_and_period = hp.read_cgroup_cpu_quota_and_period(str(h))
+        if quota_and_period is None:
+            print(gbl.bcolors.FAIL + "CPU limit test FAILED for host {}, no cpu cgroup found.".format(
+                h) + gbl.bcolors.ENDC)
+            continue
+        (quota, period) = quota_and_period
+        # Mininet configures quota = period * f * numCores, where f is the fraction of the cpu
+        # of all hosts (may also increase the period, to keep the quota above its minimum).
+        cpu_configured = 0 if quota < 0 else quota / \
+            (period * num_cores) * SubstrateHost.cpu_all_hosts
+        # Allowing for the rounding of the quota to an integer number of microseconds.
+        tolerance = SubstrateHost.cpu_all_hosts / (period * num_cores) + 1e-6
+        if quota < 0 or abs(cpu_configured - cpu_expected) > tolerance:
+            print(gbl.bcolors.FAIL + "CPU limit test FAILED for host {}, quota = {}, period = {}, cpu_expected = {}, cpu_configured = {}.".format(
+                h, quota, period, f'{cpu_expected:.4f}', f'{cpu_configured:.4f}') + gbl.bcolors.ENDC)
+        else:
+            print(gbl.bcolors.OKGREEN + "CPU limit test PASSED for host {}, quota = {}, period = {}, cpu_expected = {}, cpu_configured = {}.".format(
+                h, quota, period, f'{cpu_expected:.4f}', f'{cpu_configured:.4f}') + gbl.bcolors.ENDC)
+            hosts_tested.append(h)
+    print("Verified the cgroups of {} hosts in {:.3f} seconds.".format(
+        len(net.hosts), time.time() - start))
+
+    if sample_size:
+        # Sampled load test: a busy process in each sampled host, and the CPU time consumed by the
+        # host's cgroup during `duration` seconds gives the fraction of cpu actually obtained.
+        sampled_hosts = random.Random(gbl.SEED).sample(
+            hosts_tested, min(sample_size, len(hosts_tested)))
+        print("\nRunning load test on {} sampled hosts for {} seconds...".format(
+            len(sampled_hosts), duration))
+        pids = [h.cmd("while true; do a=1; done > /dev/null 2>&1 & echo $!").strip()
+                for h in sampled_hosts]
+        usages_before = [hp.read_cgroup_cpu_usage_us(str(h)) for h in sampled_hosts]
+        time.sleep(duration)
+        usages_after = [hp.read_cgroup_cpu_usage_us(str(h)) for h in sampled_hosts]
+        for h, pid in zip(sampled_hosts, pids):
+            h.cmd("kill -9 {}".format(pid))
+        for h, usage_before, usage_after in zip(sampled_hosts, usages_before, usages_after):
+            cpu_expected = gbl.HOSTNAME_x_HOST[str(h)].cpu_limit
+            cpu_observed = (usage_after - usage_before) / \
+                (duration * 1e6 * num_cores) * SubstrateHost.cpu_all_hosts
+            # Computing MAPE (mean absolute percentage error).
+            mean_absolute_percentage_error = np.mean(
+                np.abs((cpu_expected - cpu_observed)/cpu_expected))*100
+            # Imposing threshold condition for how much MAPE to allow. Can be changed.
+            if mean_absolute_percentage_error > 10.0:
+                print(gbl.bcolors.FAIL + "CPU load test FAILED for host {}, MAPE = {}, cpu_expected = {}, cpu_observed = {}.".format(
+                    h, f'{mean_absolute_percentage_error:.4f}', f'{cpu_expected:.4f}', f'{cpu_observed:.4f}') + gbl.bcolors.ENDC)
+            else:
+                print(gbl.bcolors.OKGREEN + "CPU load test PASSED for host {}, MAPE = {}, cpu_expected = {}, cpu_observed = {}.".format(
+                    h, f'{mean_absolute_percentage_error:.4f}', f'{cpu_expected:.4f}', f'{cpu_observed:.4f}') + gbl.bcolors.ENDC)
+    print("=======================================================================")
+
 #########################################################################################
+
+# SIMULATION TESTS: run on the model of the substrate network only, as in a model-only run;
+# without a mininet network (and root privileges). Command to run them:   python3 tests.py
+# Every test creates the model of the substrate network anew (see
+# `_create_model_of_substrate_network`), so these are not to be run from `main.runVNE`.
+
+
+def _reset_model_of_substrate_network():
+    """ Resets all the global state of the model of the substrate network (and the VNRs mapped on
+    it), so that a new one can be created in the same process. """
+    gbl.HOSTNAME_x_HOST = {}
+    gbl.SPINE_SWITCHES = []
+    gbl.LEAF_SWITCHES = []
+    gbl.HOST_SWITCHES = []
+    gbl.HOSTS = []
+    gbl.NUM_HOSTS_PER_LEAF_SWITCH = 1
+    gbl.NUM_LEAF_SWITCHES_PER_SPINE_SWITCH = 1
+    gbl.TOPOLOGY = None
+    gbl.ADDRESSING = None
+    gbl.SPINE_LAYER_IP_SUBNET_x_SWITCH = {}
+    gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH = {}
+    gbl.HOST_LAYER_IP_SUBNET_x_SWITCH = {}
+    gbl.PATH_BETWEEN_HOSTS = {}
+    gbl.SWITCH_PAIR_x_BW = {}
+    gbl.ORIGINAL_SWITCH_PAIR_x_BW = {}
+    gbl.MAPPED_VNRS = []
+    gbl.NUM_VNRS_MAPPED_SO_FAR = 0
+    gbl.ISOLATION_ID_POOL = None
+    gbl.RESIDUAL_CPU_INDEX = None
+    gbl.PATH_LINK_INDEX = None
+    gbl.CAPACITY_TREE = None
+    gbl.ADMISSION_FILTER = None
+    gbl.FAILURE_CACHE = None
+    gbl.CPU_LIMIT_CHANGED_HOST_NAMES = set()
+    SubstrateHost.cpu_all_hosts = 1000
+    op.SUBSTRATE_HOSTS_USED.clear()
+    op.SUBSTRATE_LINKS_USED.clear()
+
+
+def _create_model_of_substrate_network(base_cfg, cfg_overrides=None, substrate_overrides=None, seed=1):
+    """ Creates the model of the substrate network (without mininet), as `main.runVNE` does in a
+    model-only run, after resetting the one created before (if any).
+    base_cfg: The configurations (as in the configurations file) to run with; it is not changed.
+    cfg_overrides: Dict of the configurations to override. Example: {"routing": "multipath"}
+    substrate_overrides: Dict of the 'substrate' configurations to override.
+        Example: {"topology": "clos"}
+    seed: Seed value for generating the VNRs.
+    """
+    _reset_model_of_substrate_network()
+    gbl.CFG = copy.deepcopy(base_cfg)
+    gbl.CFG.update(cfg_overrides or {})
+    gbl.CFG["substrate"].update(substrate_overrides or {})
+    gbl.CFG["model_only"] = True
+    gbl.CFG.setdefault("seed_for_substrate_network", 1)
+    gbl.SEED = seed
+    cfg_s = gbl.CFG["substrate"]
+    gbl.TOPOLOGY = topologies.get_topology_provider(
+        cfg_s["sl_factor"], cfg_s["ll_factor"], cfg_s["hl_factor"])
+    gbl.TOPOLOGY.generate()
+    substrate_cache.generate_or_load_substrate_network(
+        cfg_s["sl_factor"], cfg_s["ll_factor"], cfg_s["hl_factor"], print_paths=False)
+    admission.create_admission_filter()
+    admission.create_failure_cache()
+
+
+def _create_vnrs_for_simulation(num_vnrs):
+    """ Returns the list of num_vnrs VNRs, as per the 'vnrs' configurations (and gbl.SEED). """
+    return list(hp.create_vnr_stream(dict(gbl.CFG["vnrs"], num_vnrs=num_vnrs), gbl.SEED))
+
+
+def _map_vnrs_on_model(vnrs):
+    """ Runs the VNE algorithm for every VNR, and maps the VNR on the model of the substrate network
+    if a mapping is found. Returns the list of the mapped VNRs (MappedVNR), or None for the VNRs
+    that could not be mapped, in the order of the VNRs. """
+    mapped_vnrs = []
+    for (num_hosts, cpu_reqs, link_reqs) in vnrs:
+        cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping = vne_algorithms.vne_algorithm(
+            num_hosts, cpu_reqs, link_reqs)
+        if not cpu_reqs_for_vnr_mapping:
+            mapped_vnrs.append(None)
+            continue
+        vnr_mapping.map_vnr_on_substrate_network(
+            None, cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping)
+        mapped_vnrs.append(gbl.MAPPED_VNRS[-1])
+    return mapped_vnrs
+
+
+def _get_model_inconsistencies():
+    """ Returns the list of the inconsistencies between the model of the substrate network and the
+    VNRs mapped on it; i.e. residual bandwidths or cpu limits which are negative, or which differ from
+    the original ones less what is used by the mapped VNRs. """
+    inconsistencies = []
+    used_bws = {link: 0 for link in gbl.SWITCH_PAIR_x_BW}
+    for vnr in gbl.MAPPED_VNRS:
+        for paths in vnr.link_paths.values():
+            for (path, bw) in paths:
+                for (node1, node2) in path:
+                    if (node1.name, node2.name) in used_bws:
+                        used_bws[(node1.name, node2.name)] += bw
+                        used_bws[(node2.name, node1.name)] += bw
+    for (link, bw) in gbl.SWITCH_PAIR_x_BW.items():
+        if bw < 0:
+            inconsistencies.append(
+                "negative residual bandwidth {} of link {}".format(bw, link))
+        if bw != gbl.ORIGINAL_SWITCH_PAIR_x_BW[link] - used_bws[link]:
+            inconsistencies.append("residual bandwidth {} of link {}, but {} of {} is used".format(
+                bw, link, used_bws[link], gbl.ORIGINAL_SWITCH_PAIR_x_BW[link]))
+    for host in gbl.HOSTS:
+        used_cpu = sum(vh.cpu_limit for vh in host.virtual_hosts_mapped)
+        if host.cpu_limit < 0 or host.cpu_limit != host.original_cpu_limit - used_cpu:
+            inconsistencies.append("cpu limit {} of host {}, but {} of {} is used".format(
+                host.cpu_limit, host.name, used_cpu, host.original_cpu_limit))
+    return inconsistencies
+
+
+def _print_simulation_test_result(test_name, failures):
+    """ Prints whether the simulation test passed, or its failures. """
+    if failures:
+        print(gbl.bcolors.FAIL + "{} FAILED: {}".format(test_name,
+              "; ".join(failures)) + gbl.bcolors.ENDC)
+    else:
+        print(gbl.bcolors.OKGREEN + "{} PASSED!".format(test_name) + gbl.bcolors.ENDC)
+
+
+def _get_allocations_of_vnrs(mapped_vnrs):
+    """ Returns what the mapped VNRs were given, to compare two mappings of the same VNRs: the
+    substrate hosts of every VNR (in order), the isolation ids, and the IP addresses and host switch
+    ports of the virtual hosts (by substrate host and host switch respectively). The ids, addresses
+    and ports may be handed out to the VNRs in another order when they are reused. """
+    substrate_host_names = [None if vnr is None else [host.name for host in vnr.substrate_hosts]
+                            for vnr in mapped_vnrs]
+    isolation_ids = sorted(vnr.isolation_id for vnr in mapped_vnrs if vnr is not None)
+    host_x_ip_addrs = {}
+    switch_x_ports = {}
+    for vnr in mapped_vnrs:
+        for vh in ([] if vnr is None else vnr.virtual_hosts):
+            host_x_ip_addrs.setdefault(vh.substrate_host.name, set()).add(vh.ip_addr)
+            switch_x_ports.setdefault(vh.host_switch_attached.name, set()).add(vh.host_switch_port)
+    return (substrate_host_names, isolation_ids, host_x_ip_addrs, switch_x_ports)
+
+
+def test_remove_and_remap_vnrs_on_model(num_vnrs=40, seed=1):
+    """ Maps VNRs on the model of the substrate network, removes all of them (in random order) with
+    `vnr_mapping.remove_vnr_from_substrate_network`, and maps them again; with every routing mode.
+    Removing the VNRs must give back everything they were given; the cpu limits, the bandwidths, the
+    IP addresses of the virtual hosts, their ports on the host switches, and the isolation ids. So
+    mapping the same VNRs again must give the same mapping, with the same addresses, ports and ids.
+    Returns the list of failures.
+    """
+    print("\n\n================= Running remove and remap test (model) =================")
+    base_cfg = gbl.CFG
+    failures = []
+    for routing in ["static", "load-aware", "multipath"]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _create_model_of_substrate_network(
+                base_cfg, {"routing": routing}, seed=seed)
+            switches = gbl.TOPOLOGY.get_switches()
+            start_port_numbers = {switch.name: switch.next_port_number for switch in switches}
+            vnrs = _create_vnrs_for_simulation(num_vnrs)
+            mapped_vnrs = _map_vnrs_on_model(vnrs)
+            allocations = _get_allocations_of_vnrs(mapped_vnrs)
+            port_numbers = {switch.name: switch.next_port_number for switch in switches}
+
+            removed_vnrs = list(gbl.MAPPED_VNRS)
+            random.Random(seed).shuffle(removed_vnrs)
+            for vnr in removed_vnrs:
+                vnr_mapping.remove_vnr_from_substrate_network(None, vnr)
+
+        problems = []
+        if gbl.SWITCH_PAIR_x_BW != gbl.ORIGINAL_SWITCH_PAIR_x_BW:
+            problems.append("bandwidths not given back")
+        if any(host.cpu_limit != host.original_cpu_limit for host in gbl.HOSTS):
+            problems.append("cpu limits not given back")
+        if any(len(host.ip_allocator) for host in gbl.HOSTS):
+            problems.append("IP addresses not given back")
+        if len(vnr_mapping._get_isolation_id_pool()):
+            problems.append("isolation ids not given back")
+        if any(sorted(switch.free_port_numbers) != list(range(start_port_numbers[switch.name], switch.next_port_number))
+               for switch in switches):
+            problems.append("host switch ports not given back")
+        if set(gbl.HOSTNAME_x_HOST) != set(host.name for host in gbl.HOSTS):
+            problems.append("virtual hosts left in gbl.HOSTNAME_x_HOST")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            remapped_vnrs = _map_vnrs_on_model(vnrs)
+        if _get_allocations_of_vnrs(remapped_vnrs) != allocations:
+            problems.append("not mapped the same way again")
+        if {switch.name: switch.next_port_number for switch in switches} != port_numbers:
+            problems.append("new host switch ports used, instead of the freed ones")
+        problems += _get_model_inconsistencies()
+        print("Routing {}: mapped {} / {} VNRs, removed and mapped them again.".format(
+            routing, sum(1 for vnr in mapped_vnrs if vnr is not None), num_vnrs))
+        failures += ["{} routing: {}".format(routing, problem) for problem in problems]
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("Remove and remap test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def test_vnr_links_mapped_on_checked_paths_on_model(num_vnrs=300, seed=1):
+    """ Maps VNRs on the model of the substrate network with the routing modes where the path of a
+    virtual link depends on the residual bandwidths ('load-aware' and 'multipath'), on a substrate
+    whose spine links run out before the links to the hosts. Every virtual link must be mapped
+    on the paths the VNE algorithm checked it on (and not on paths selected again, against other
+    residual bandwidths), and no residual bandwidth may go negative. Returns the list of failures.
+    """
+    print("\n\n============ Running mapped on checked paths test (model) =============")
+    base_cfg = gbl.CFG
+    failures = []
+    for routing in ["load-aware", "multipath"]:
+        for algorithm in ["first-fit-algorithm", "worst-fit-algorithm"]:
+            num_mapped = 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                _create_model_of_substrate_network(
+                    base_cfg, {"routing": routing, "vne_algorithm": algorithm}, {"ll_factor": 4, "hl_factor": 2, "leaf_to_host_links": {"bw_limit_min": 40, "bw_limit_max": 60}},
+                    seed=seed)
+                for (num_hosts, cpu_reqs, link_reqs) in _create_vnrs_for_simulation(num_vnrs):
+                    cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping = vne_algorithms.vne_algorithm(
+                        num_hosts, cpu_reqs, link_reqs)
+                    if not cpu_reqs_for_vnr_mapping:
+                        continue
+                    vnr_mapping.map_vnr_on_substrate_network(
+                        None, cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping)
+                    num_mapped += 1
+                    for (h1_name, h2_name, _, paths) in bw_reqs_for_vnr_mapping:
+                        if gbl.MAPPED_VNRS[-1].link_paths[(h1_name, h2_name)] is not paths:
+                            failures.append("{} routing, {}: link ({}, {}) of VNR {} not mapped on the checked paths".format(
+                                routing, algorithm, h1_name, h2_name, gbl.MAPPED_VNRS[-1].vnr_number))
+            failures += ["{} routing, {}: {}".format(routing, algorithm, inconsistency)
+                         for inconsistency in _get_model_inconsistencies()]
+            print("Routing {}, {}: mapped {} / {} VNRs.".format(
+                routing, algorithm, num_mapped, num_vnrs))
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("Mapped on checked paths test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def test_vne_algorithms_on_all_topologies_on_model(num_vnrs=150, seed=1):
+    """ Runs every VNE algorithm on every topology (as configured in the 'substrate' configurations),
+    with enough VNRs to use up the substrate network; on the model of the substrate network. Every
+    run must go through (e.g. no division by 0 in an algorithm once the links of all the substrate
+    hosts are used up), and leave the model consistent with the VNRs mapped. Returns the list of
+    failures.
+    """
+    print("\n\n============ Running VNE algorithms on topologies test (model) ===========")
+    base_cfg = gbl.CFG
+    failures = []
+    # Every topology as configured, and with a single host per leaf (or access) switch; where the
+    # links of a substrate host and all of its siblings are used up at once.
+    clos_cfg = dict(base_cfg["substrate"]["clos"], num_hosts_per_access_switch=1)
+    topologies_to_run = [("spine-leaf", {"topology": "spine-leaf"}),
+                         ("spine-leaf (hl_factor 1)", {"topology": "spine-leaf", "hl_factor": 1}),
+                         ("fat-tree", {"topology": "fat-tree"}),
+                         ("clos", {"topology": "clos"}),
+                         ("clos (1 host per access switch)", {"topology": "clos", "clos": clos_cfg})]
+    for (topology, substrate_overrides) in topologies_to_run:
+        for algorithm in ["first-fit-algorithm", "worst-fit-algorithm", "best-fit-algorithm",
+                          "nord-algorithm", "nrm-algorithm", "ahp-algorithm"]:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _create_model_of_substrate_network(
+                        base_cfg, {"routing": "static", "vne_algorithm": algorithm}, substrate_overrides, seed=seed)
+                    mapped_vnrs = _map_vnrs_on_model(_create_vnrs_for_simulation(num_vnrs))
+            except Exception as e:
+                failures.append("{}, {}: {}: {}".format(
+                    topology, algorithm, type(e).__name__, e))
+                continue
+            failures += ["{}, {}: {}".format(topology, algorithm, inconsistency)
+                         for inconsistency in _get_model_inconsistencies()]
+            print("Topology {}, {}: mapped {} / {} VNRs.".format(topology, algorithm,
+                  sum(1 for vnr in mapped_vnrs if vnr is not None), num_vnrs))
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("VNE algorithms on topologies test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def test_routing_modes_of_topologies():
+    """ Checks that the routing modes which select among the paths through the spine switches
+    ('load-aware' and 'multipath') are rejected with the topologies other than spine-leaf, as soon as
+    the topology provider is created from the configurations. Returns the list of failures. """
+    print("\n\n================= Running routing modes of topologies test =================")
+    base_cfg = gbl.CFG
+    failures = []
+    for topology in ["fat-tree", "clos"]:
+        for routing in ["load-aware", "multipath"]:
+            gbl.CFG = copy.deepcopy(base_cfg)
+            gbl.CFG["routing"] = routing
+            gbl.CFG["substrate"]["topology"] = topology
+            try:
+                topologies.get_topology_provider(1, 1, 1)
+                failures.append("{} routing accepted with the {} topology".format(routing, topology))
+            except Exception as e:
+                print("{} routing with the {} topology: {}".format(routing, topology, e))
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("Routing modes of topologies test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def test_failure_cache_on_model(num_vnrs=40, seed=1):
+    """ Checks the failure cache (`admission.FailureCache`) on the model of the substrate network:
+    - A VNR is rejected if it dominates a failed VNR, even with its virtual hosts numbered
+      otherwise; and not if it demands less than the failed VNR for a single virtual host or link.
+    - The cache is cleared whenever resources are released; when a VNR is removed, when the cpu
+      limit of a substrate host is increased, and when the bandwidth of a virtual link is given back
+      (but not when resources are used).
+    Returns the list of failures.
+    """
+    print("\n\n==================== Running failure cache test (model) ====================")
+    base_cfg = gbl.CFG
+    failures = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        _create_model_of_substrate_network(base_cfg, {"failure_cache": True}, seed=seed)
+    cache = gbl.FAILURE_CACHE
+
+    # A star with the center 2, and the same star with the center 1 (and the leaves swapped).
+    cache.add(3, [10, 20, 30], [(1, 2, 5), (2, 3, 6)])
+    if not cache.is_dominated(3, [20, 30, 10], [(1, 3, 5), (1, 2, 7)]):
+        failures.append("a VNR isomorphic to a failed VNR, demanding more, not rejected")
+    if cache.is_dominated(3, [20, 30, 10], [(1, 3, 4), (1, 2, 7)]):
+        failures.append("a VNR isomorphic to a failed VNR, demanding less bandwidth, rejected")
+    if cache.is_dominated(3, [10, 20, 30], [(1, 2, 5), (1, 3, 6)]):
+        failures.append("a VNR of another topology (center 1 with less cpu) rejected")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mapped_vnrs = [vnr for vnr in _map_vnrs_on_model(_create_vnrs_for_simulation(num_vnrs))
+                       if vnr is not None]
+    failed_vnr = (3, [10, 20, 30], [(1, 2, 5), (2, 3, 6)])
+    host = gbl.HOSTS[0]
+    checks = [("a VNR is removed", lambda: vnr_mapping.remove_vnr_from_substrate_network(None, mapped_vnrs[0]), True),
+              ("cpu is used", lambda: hp.change_cpu_limit_of_substrate_host(host, -1), False),
+              ("cpu is released", lambda: hp.change_cpu_limit_of_substrate_host(host, 1), True)]
+    if len(mapped_vnrs) > 1:
+        (h1_name, h2_name, bw) = mapped_vnrs[1].vnr_links_with_bw[0]
+        host_pair = (gbl.HOSTNAME_x_HOST[h1_name], gbl.HOSTNAME_x_HOST[h2_name])
+        checks += [("bandwidth is used", lambda: vnr_mapping.add_link_mapping_between_hosts(
+                       host_pair, bw, gbl.SWITCH_PAIR_x_BW), False),
+                   ("bandwidth is released", lambda: vnr_mapping.remove_link_mapping_between_hosts(
+                       host_pair, bw, gbl.SWITCH_PAIR_x_BW), True)]
+    for (event, do, is_cleared) in checks:
+        cache.add(*failed_vnr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            do()
+        if cache.is_dominated(*failed_vnr) == is_cleared:
+            failures.append("failure cache {} when {}".format(
+                "not cleared" if is_cleared else "cleared", event))
+    failures += _get_model_inconsistencies()
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("Failure cache test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def test_failed_host_mapping_leaves_no_bandwidth_used_on_model():
+    """ Checks that trying a virtual host on a substrate host which turns out not to have the
+    bandwidth for all of its virtual links (with 'load-aware' routing, where the bandwidths are
+    reduced while the virtual links are checked) leaves none of the bandwidth reduced for the next
+    substrate hosts tried. A VNR of 3 virtual hosts, with the virtual links (1, 3) and (2, 3) of 5
+    each, is mapped by first-fit on h1 and h2 for the virtual hosts 1 and 2; the virtual host 3 fits
+    the virtual link (1, 3) on h3, but not (2, 3) any more (h3 has 7 to its leaf switch), and has
+    to go to h4. If the 5 of the virtual link (1, 3) were left used on the link of h1 (which has 9),
+    the virtual host 3 could not be mapped anywhere else, and the VNR would be rejected.
+    Returns the list of failures.
+    """
+    print("\n\n========= Running failed host mapping leaves no bandwidth used test (model) =========")
+    base_cfg = gbl.CFG
+    failures = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        _create_model_of_substrate_network(
+            base_cfg, {"routing": "load-aware", "vne_algorithm": "first-fit-algorithm",
+                       "admission_control": False}, {"topology": "spine-leaf"})
+        host_x_access_link = admission.AdmissionFilter().host_x_access_link
+        host_x_access_bw = {"h1": 9, "h2": 10, "h3": 7, "h4": 20}
+        for link in gbl.SWITCH_PAIR_x_BW:
+            gbl.SWITCH_PAIR_x_BW[link] = 1000
+        for (host_name, (node1, node2)) in host_x_access_link.items():
+            bw = host_x_access_bw.get(host_name, 0)
+            gbl.SWITCH_PAIR_x_BW[(node1, node2)] = bw
+            gbl.SWITCH_PAIR_x_BW[(node2, node1)] = bw
+        gbl.ORIGINAL_SWITCH_PAIR_x_BW = dict(gbl.SWITCH_PAIR_x_BW)
+        # The capacity tree is created anew from the bandwidths set above.
+        gbl.CAPACITY_TREE = None
+        mapped_vnrs = _map_vnrs_on_model([(3, [1, 1, 1], [(1, 3, 5), (2, 3, 5)])])
+    if mapped_vnrs[0] is None:
+        failures.append("VNR rejected")
+    elif [host.name for host in mapped_vnrs[0].substrate_hosts] != ["h1", "h2", "h4"]:
+        failures.append("VNR mapped on {} instead of h1, h2 and h4".format(
+            [host.name for host in mapped_vnrs[0].substrate_hosts]))
+    failures += _get_model_inconsistencies()
+    gbl.CFG = base_cfg
+    _print_simulation_test_result("Failed host mapping leaves no bandwidth used test", failures)
+    print("=======================================================================")
+    return failures
+
+
+def run_simulation_tests():
+    """ Runs all the simulation tests, with the configurations in gbl.CFG. Returns whether all of
+    them passed. """
+    failures = []
+    failures += test_remove_and_remap_vnrs_on_model()
+    failures += test_vnr_links_mapped_on_checked_paths_on_model()
+    failures += test_vne_algorithms_on_all_topologies_on_model()
+    failures += test_routing_modes_of_topologies()
+    failures += test_failure_cache_on_model()
+    failures += test_failed_host_mapping_leaves_no_bandwidth_used_on_model()
+    return not failures
+
+
+if __name__ == '__main__':
+    with open('configurations.json') as f:
+        gbl.CFG = json.load(f)
+    sys.exit(0 if run_simulation_tests() else 1)
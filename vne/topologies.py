@@ -0,0 +1,375 @@
+import abc
+import random
+import gbl
+import helpers as hp
+import substrate
+from main_classes import Switch
+from addressing import get_addressing_scheme
+
+
+class TopologyProvider(abc.ABC):
+    """
+    Interface of the topology of the substrate network. A topology provider generates the switches
+    and the substrate hosts, and yields the links (with the bandwidths to be generated for them),
+    the forwarding rules of the switches, and the path between any two substrate hosts (path oracle).
+    The rest of the code (mininet topology, flow table entries, the paths used by the VNE algorithms,
+    and the model-only simulation) only goes through this interface.
+
+    The switches which the substrate hosts are attached to are in gbl.LEAF_SWITCHES (with the hosts
+    in their `hosts_under_this_switch`), and every host has its `host_switch_attached`, whatever the
+    topology is.
+
+    Attributes
+    ----------
+    name : str
+        Name of the topology, as in the configurations file. E.g. 'spine-leaf'.
+    supports_host_switches : bool
+        Whether the topology can have a host switch in front of every substrate host.
+    supported_routing_modes : Tuple[str]
+        The routing modes (the 'routing' value in the configurations file) which the topology can
+        be used with.
+    """
+    name = None
+    supports_host_switches = False
+    supported_routing_modes = ("static",)
+
+    @abc.abstractmethod
+    def generate(self):
+        """ Generates the switches and the substrate hosts (with their cpu limits), and does the IP
+        addressing of all of them. """
+
+    @abc.abstractmethod
+    def get_switches(self):
+        """ Returns List[Switch] of all the switches in the topology. """
+
+    @abc.abstractmethod
+    def get_links(self):
+        """ Returns List[Tuple(node, node, bw_config_key)] of all the links in the topology, in the
+        order in which the ports of the switches are numbered. bw_config_key is the key of the
+        bandwidth range of the link in the 'substrate' configurations, e.g. 'leaf_to_host_links';
+        or None for a link without a bandwidth (such as between host switch and host). """
+
+    @abc.abstractmethod
+    def get_forwarding_rules(self):
+        """ Returns List[Tuple(switch, priority, nw_dst, output_port, host)] of the (IPv4) forwarding
+        rules of all the switches. nw_dst is None for a rule matching all packets; host is the
+        substrate host when the rule delivers the packet to it (so that the destination mac address
+        is also rewritten to that of the host), else None. """
+
+    @abc.abstractmethod
+    def get_path_between_hosts(self, src_h, dst_h):
+        """ Returns the path (List[Tuple(node, node)], the links hop by hop) which the forwarding
+        rules take from the substrate host src_h to the substrate host dst_h. """
+
+
+class SpineLeafTopology(TopologyProvider):
+    """ The (modified) spine-leaf topology; see `substrate.generate_topology`.
+    Example of topology where (sl=3, ll=2, hl=2) can be found here: https://tinyurl.com/mr3c5ap3 """
+    name = "spine-leaf"
+    supports_host_switches = True
+    supported_routing_modes = ("static", "load-aware", "multipath")
+
+    def __init__(self, sl_factor, ll_factor, hl_factor):
+        self.sl_factor = sl_factor
+        self.ll_factor = ll_factor
+        self.hl_factor = hl_factor
+
+    def generate(self):
+        substrate.generate_topology(
+            self.sl_factor, self.ll_factor, self.hl_factor)
+
+    def get_switches(self):
+        return gbl.SPINE_SWITCHES + gbl.LEAF_SWITCHES + gbl.HOST_SWITCHES
+
+    def _get_node_attached_to_leaf_switch(self, host):
+        """ Returns the node (host switch, or the host itself if there are no host switches) of the
+        substrate host which is linked to its leaf switch. """
+        if hp.uses_host_switches():
+            return host.host_switch_attached
+        return host
+
+    def get_links(self):
+        links = []
+        # Links between every spine layer and leaf layer switches.
+        for spine_switch in gbl.SPINE_SWITCHES:
+            for leaf_switch in gbl.LEAF_SWITCHES:
+                links.append(
+                    (spine_switch, leaf_switch, "spine_to_leaf_links"))
+        # Links between leaf layer switches and host switches (or directly the hosts, if there
+        # are no host switches).
+        for leaf_switch in gbl.LEAF_SWITCHES:
+            for host in leaf_switch.hosts_under_this_switch:
+                links.append((self._get_node_attached_to_leaf_switch(host),
+                              leaf_switch, "leaf_to_host_links"))
+        # Links between the host switches and the hosts.
+        for (host_switch, host) in zip(gbl.HOST_SWITCHES, gbl.HOSTS):
+            links.append((host_switch, host, None))
+        return links
+
+    def get_forwarding_rules(self):
+        rules = []
+        for ll_switch in gbl.LEAF_SWITCHES:
+            # For every leaf layer switch, add flow table entries for the upward flow,
+            # i.e. packets flowing towards the spine switches.
+            for ss in gbl.SPINE_SWITCHES:
+                port = hp.get_output_port_for_leaf_switches_towards_spine(
+                    ll_switch, ss.index)
+                rules.append((ll_switch, 3000, ss.ip_subnet, port, None))
+            # For every leaf layer switch, add flow table entries for the downward flow,
+            # i.e. packets flowing towards the hosts.
+            for host in ll_switch.hosts_under_this_switch:
+                port = hp.get_output_port_for_leaf_switches_towards_hosts(
+                    host.index_in_leaf, len(gbl.SPINE_SWITCHES))
+                if not hp.uses_host_switches():
+                    # Without host switches, the leaf switch delivers the packet to the host
+                    # itself (as the host switch does).
+                    rules.append((ll_switch, 3001, host.ip_addr, port, host))
+                    continue
+                # Hosts within that subnet shall be given higher priority in the
+                # flow table. For example in the topology (sl=3, ll=2, h=2), if
+                # h5 wants to communicate with h6. They both lie under switch s2_3,
+                # and when s2_3 gets the packet destined for h6, it shall send it
+                # to h6 directly instead of forwarding to s1_2 (which is what the
+                # above sl rule says). Hence if host is reachable from that switch,
+                # give it higher prioirty (here 3001) in the flow table.
+                rules.append((ll_switch, 3001, host.ip_addr, port, None))
+
+        # For every spine layer switch, add flow table entries for the downward
+        # flow towards the leaf switches.
+        for sl_switch in gbl.SPINE_SWITCHES:
+            for ll in gbl.LEAF_SWITCHES:
+                port = hp.get_output_port_for_spine_switches(ll.index)
+                rules.append((sl_switch, 3000, ll.ip_subnet, port, None))
+
+        # The host switch delivers the packets for its host (port 2), and sends all the others
+        # up to the leaf switch (port 1).
+        for (hl_switch, host) in zip(gbl.HOST_SWITCHES, gbl.HOSTS):
+            rules.append((hl_switch, 3001, host.ip_addr.split('/')[0], 2, host))
+            rules.append((hl_switch, 3000, None, 1, None))
+        return rules
+
+    def get_path_between_hosts(self, src_h, dst_h):
+        return substrate.get_path_between_hosts(src_h, dst_h)
+
+
+class _ThreeTierTopology(TopologyProvider):
+    """
+    Base of the 3-tier topologies: core switches (named s1_XYZ) on top, and pods of aggregation
+    switches (s2_XYZ) and edge switches (s3_XYZ, also called access or top-of-rack switches) below,
+    with every edge switch linked to all the aggregation switches of its pod. The substrate hosts are
+    attached directly to the edge switches (there are no host switches). The subclasses give how
+    the core switches are linked to the aggregation switches, and the path between edge switches.
+
+    The IP subnets are those of the spine-leaf topology with the pods in place of the spine switches,
+    i.e. pod p has '(10+p).0.0.0/8', its edge switch e has '(10+p).e.0.0/16', and host k under it
+    has '(10+p).e.k.0/24' (with the default 'octet' addressing). Every switch has a forwarding rule
+    per edge switch subnet, which follows the path between edge switches; so the paths are the
+    same in both directions, as the bandwidths of the links are shared by both directions.
+    """
+    supports_host_switches = False
+
+    def __init__(self, num_core_switches, num_pods, num_aggregation_switches_per_pod,
+                 num_edge_switches_per_pod, num_hosts_per_edge_switch):
+        self.num_core_switches = num_core_switches
+        self.num_pods = num_pods
+        self.num_aggregation_switches_per_pod = num_aggregation_switches_per_pod
+        self.num_edge_switches_per_pod = num_edge_switches_per_pod
+        self.num_hosts_per_edge_switch = num_hosts_per_edge_switch
+        self.core_switches = []
+        # Aggregation switches and edge switches of every pod.
+        self.aggregation_switches = []
+        self.edge_switches = []
+        self._port_x_neighbor = {}
+
+    def generate(self):
+        random.seed(gbl.CFG["seed_for_substrate_network"])
+
+        gbl.NUM_HOSTS_PER_LEAF_SWITCH = self.num_hosts_per_edge_switch
+        gbl.NUM_LEAF_SWITCHES_PER_SPINE_SWITCH = self.num_edge_switches_per_pod
+        gbl.ADDRESSING = get_addressing_scheme(
+            self.num_pods, self.num_edge_switches_per_pod, self.num_hosts_per_edge_switch)
+
+        for c in range(self.num_core_switches):
+            self.core_switches.append(Switch("s1_{}".format(c + 1), None, c))
+        for p in range(self.num_pods):
+            pod_subnet = gbl.ADDRESSING.get_spine_subnet(p)
+            self.aggregation_switches.append([])
+            for a in range(self.num_aggregation_switches_per_pod):
+                index = self.num_aggregation_switches_per_pod*p + a
+                self.aggregation_switches[p].append(
+                    Switch("s2_{}".format(index + 1), pod_subnet, index))
+            self.edge_switches.append([])
+            for e in range(self.num_edge_switches_per_pod):
+                edge_subnet = gbl.ADDRESSING.get_leaf_subnet(p, e)
+                index = self.num_edge_switches_per_pod*p + e
+                edge_switch = Switch("s3_{}".format(index + 1), edge_subnet, index)
+                self.edge_switches[p].append(edge_switch)
+                gbl.LEAF_SWITCHES.append(edge_switch)
+                gbl.LEAF_LAYER_IP_SUBNET_x_SWITCH[edge_subnet] = edge_switch
+
+                for k in range(self.num_hosts_per_edge_switch):
+                    host_index = self.num_hosts_per_edge_switch*index + k
+                    host = substrate.create_substrate_host(
+                        "h{}".format(host_index + 1), gbl.ADDRESSING.get_host_subnet(p, e, k))
+                    host.spine_index = p
+                    host.leaf_index = index
+                    host.index_in_leaf = k
+                    host.host_switch_attached = edge_switch
+                    edge_switch.hosts_under_this_switch.append(host)
+
+    def get_switches(self):
+        return self.core_switches + \
+            [agg for pod in self.aggregation_switches for agg in pod] + \
+            [edge for pod in self.edge_switches for edge in pod]
+
+    @abc.abstractmethod
+    def _get_core_links(self):
+        """ Returns List[Tuple(core switch, aggregation switch)] of the links between the core and
+        aggregation layers. """
+
+    @abc.abstractmethod
+    def _get_switch_path(self, src_edge_switch, dst_edge_switch):
+        """ Returns List[Switch] of the switches on the path from src_edge_switch to dst_edge_switch
+        (both included). Must only depend on the switch and the destination edge switch at every
+        hop (as the forwarding rules do), and be the same path in both directions. """
+
+    def _get_pod_and_index(self, edge_switch):
+        return divmod(edge_switch.index, self.num_edge_switches_per_pod)
+
+    def get_links(self):
+        links = [(core, agg, "spine_to_leaf_links")
+                 for (core, agg) in self._get_core_links()]
+        for p in range(self.num_pods):
+            for agg in self.aggregation_switches[p]:
+                for edge in self.edge_switches[p]:
+                    links.append((agg, edge, "spine_to_leaf_links"))
+        for edge in gbl.LEAF_SWITCHES:
+            for host in edge.hosts_under_this_switch:
+                links.append((edge, host, "leaf_to_host_links"))
+        return links
+
+    def _get_output_port(self, switch, neighbor):
+        """ Returns the port number of the switch towards its neighbor (switch or host); the ports
+        of every switch are numbered from 1 in the order of its links. """
+        if not self._port_x_neighbor:
+            next_port = {}
+            for (node1, node2, _) in self.get_links():
+                for (node, other) in ((node1, node2), (node2, node1)):
+                    if isinstance(node, Switch):
+                        next_port[node] = next_port.get(node, 0) + 1
+                        self._port_x_neighbor[(node, other)] = next_port[node]
+        return self._port_x_neighbor[(switch, neighbor)]
+
+    def get_forwarding_rules(self):
+        rules = []
+        # Rules per edge switch subnet, at every switch on the paths towards that edge switch.
+        next_hop_x_switch_and_dst = {}
+        for src_edge in gbl.LEAF_SWITCHES:
+            for dst_edge in gbl.LEAF_SWITCHES:
+                if src_edge is dst_edge:
+                    continue
+                switch_path = self._get_switch_path(src_edge, dst_edge)
+                for (switch, next_hop) in zip(switch_path, switch_path[1:]):
+                    key = (switch, dst_edge)
+                    if next_hop_x_switch_and_dst.setdefault(key, next_hop) is not next_hop:
+                        raise Exception("Inconsistent paths towards {} at {} in the '{}' topology.".format(
+                            dst_edge.name, switch.name, self.name))
+        for ((switch, dst_edge), next_hop) in next_hop_x_switch_and_dst.items():
+            rules.append((switch, 3000, dst_edge.ip_subnet,
+                         self._get_output_port(switch, next_hop), None))
+        # The edge switch delivers the packets to the hosts attached to it.
+        for edge in gbl.LEAF_SWITCHES:
+            for host in edge.hosts_under_this_switch:
+                rules.append((edge, 3001, host.ip_addr,
+                             self._get_output_port(edge, host), host))
+        return rules
+
+    def get_path_between_hosts(self, src_h, dst_h):
+        switch_path = self._get_switch_path(
+            src_h.host_switch_attached, dst_h.host_switch_attached)
+        return [(src_h, switch_path[0])] + list(zip(switch_path, switch_path[1:])) + \
+            [(switch_path[-1], dst_h)]
+
+
+class FatTreeTopology(_ThreeTierTopology):
+    """ The k-ary fat-tree topology: k pods of k/2 aggregation and k/2 edge switches each, with k/2
+    hosts under every edge switch, and (k/2)^2 core switches. Core switch j of group a (i.e. core
+    switch a*(k/2) + j) is linked to the aggregation switch a of every pod.
+    Traffic between edge switches e and e' (indices within their pods p and p') goes through the
+    aggregation switch (e + e') mod k/2, and between pods through the core switch (p + p') mod k/2 of
+    its group. """
+    name = "fat-tree"
+
+    def __init__(self, k):
+        if k < 2 or k % 2:
+            raise Exception(
+                "The fat-tree topology needs an even k (k={}).".format(k))
+        self.half_k = k // 2
+        super().__init__(self.half_k ** 2, k, self.half_k, self.half_k, self.half_k)
+
+    def _get_core_links(self):
+        return [(core, self.aggregation_switches[p][core.index // self.half_k])
+                for core in self.core_switches for p in range(self.num_pods)]
+
+    def _get_switch_path(self, src_edge_switch, dst_edge_switch):
+        if src_edge_switch is dst_edge_switch:
+            return [src_edge_switch]
+        (p, e) = self._get_pod_and_index(src_edge_switch)
+        (q, f) = self._get_pod_and_index(dst_edge_switch)
+        a = (e + f) % self.half_k
+        if p == q:
+            return [src_edge_switch, self.aggregation_switches[p][a], dst_edge_switch]
+        core = self.core_switches[a*self.half_k + (p + q) % self.half_k]
+        return [src_edge_switch, self.aggregation_switches[p][a], core,
+                self.aggregation_switches[q][a], dst_edge_switch]
+
+
+class ClosTopology(_ThreeTierTopology):
+    """ The 3-tier Clos (core, aggregation, access) topology, with every core switch linked to all
+    the aggregation switches. Traffic between access switches e and e' within a pod goes through the
+    aggregation switch (e + e') mod A (A aggregation switches per pod). Traffic between pods leaves
+    (and enters) a pod through the aggregation switch e mod A of the access switch, and goes through
+    the core switch (p*A + e mod A + p'*A + e' mod A) mod C (C core switches) between them. """
+    name = "clos"
+
+    def _get_core_links(self):
+        return [(core, agg) for core in self.core_switches
+                for pod in self.aggregation_switches for agg in pod]
+
+    def _get_switch_path(self, src_edge_switch, dst_edge_switch):
+        if src_edge_switch is dst_edge_switch:
+            return [src_edge_switch]
+        A = self.num_aggregation_switches_per_pod
+        (p, e) = self._get_pod_and_index(src_edge_switch)
+        (q, f) = self._get_pod_and_index(dst_edge_switch)
+        if p == q:
+            return [src_edge_switch, self.aggregation_switches[p][(e + f) % A], dst_edge_switch]
+        core = self.core_switches[(p*A + e % A + q*A + f % A) % self.num_core_switches]
+        return [src_edge_switch, self.aggregation_switches[p][e % A], core,
+                self.aggregation_switches[q][f % A], dst_edge_switch]
+
+
+def get_topology_provider(sl_factor, ll_factor, hl_factor):
+    """ Returns the topology provider as specified by the 'topology' value in the 'substrate'
+    configurations; 'spine-leaf' (the default, with the given sl, ll and hl factors), 'fat-tree'
+    (with the 'fat_tree' configurations), or 'clos' (with the 'clos' configurations). """
+    cfg_substrate = gbl.CFG["substrate"]
+    topology = cfg_substrate.get("topology", "spine-leaf")
+    if topology == "spine-leaf":
+        topology_provider = SpineLeafTopology(sl_factor, ll_factor, hl_factor)
+    elif topology == "fat-tree":
+        topology_provider = FatTreeTopology(cfg_substrate["fat_tree"]["k"])
+    elif topology == "clos":
+        cfg_clos = cfg_substrate["clos"]
+        topology_provider = ClosTopology(cfg_clos["num_core_switches"], cfg_clos["num_pods"],
+                                         cfg_clos["num_aggregation_switches_per_pod"],
+                                         cfg_clos["num_access_switches_per_pod"],
+                                         cfg_clos["num_hosts_per_access_switch"])
+    else:
+        raise Exception("Invalid topology '{}' in the configurations.".format(topology))
+    # The other routing modes select among the paths through the spine switches, which only the
+    # spine-leaf topology has; so such combinations are rejected before anything is generated.
+    if hp.get_routing_mode() not in topology_provider.supported_routing_modes:
+        raise Exception("Routing '{}' is not supported with the '{}' topology; set 'routing' to one of {} in the configurations.".format(
+            hp.get_routing_mode(), topology, list(topology_provider.supported_routing_modes)))
+    return topology_provider
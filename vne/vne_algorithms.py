@@ -3,6 +3,11 @@ import helpers as hp
 import copy
 import output as op
 import vnr_mapping
+import substrate
+import admission
+import path_index
+import capacity_tree
+import numpy as np
 from nord import nord_support
 from nrm import nrm_support
 from ahp import ahp_support
@@ -31,10 +36,21 @@ def _worst_fit_algorithm(num_hosts, cpu_reqs, link_bw_reqs):
     """ Worst fit algorithm which ranks virtual hosts in the order they are given. And for
     substrate hosts, it ranks them in the decreasing order of their remaining CPU limit/capacity, 
     i.e. substrate hosts with highe remaining cpu/crb limits will be tried first for the mapping 
-    of vnr hosts. """
+    of vnr hosts. The substrate hosts are taken from the residual cpu index, instead of sorting
+    all of them for every VNR. """
     ranked_virtual_hosts = [i for i in range(1, num_hosts + 1)]
-    ranked_substrate_hosts = sorted(
-        gbl.HOSTS, key=lambda x: x.cpu_limit, reverse=True)
+    ranked_substrate_hosts = hp.get_residual_cpu_index().get_hosts_in_descending_order
+    return _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_hosts, ranked_substrate_hosts)
+
+
+def _best_fit_algorithm(num_hosts, cpu_reqs, link_bw_reqs):
+    """ Best fit algorithm which ranks virtual hosts in the order they are given. And for every
+    virtual host, it ranks the substrate hosts in the increasing order of their remaining CPU
+    limit/capacity, i.e. the substrate host with the least remaining cpu/crb limit which can still
+    satisfy the virtual host's cpu requirement is tried first; leaving the larger substrate hosts
+    for the larger virtual hosts. """
+    ranked_virtual_hosts = [i for i in range(1, num_hosts + 1)]
+    ranked_substrate_hosts = hp.get_residual_cpu_index().get_hosts_in_ascending_order
     return _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_hosts, ranked_substrate_hosts)
 
 
@@ -60,6 +76,44 @@ def _ahp_algorithm(num_hosts, cpu_reqs, link_bw_reqs):
     return _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_hosts, ranked_substrate_hosts)
 
 
+def _get_host_indices(substrate_hosts, path_link_index):
+    """ Returns the indices (in gbl.HOSTS) of the substrate hosts, as a NumPy array. """
+    return np.fromiter((path_link_index.host_x_index[host] for host in substrate_hosts), dtype=np.int64)
+
+
+def _get_first_feasible_substrate_host(cpu_req, candidate_indices, cpu_limits, is_mapped, neighbor_links, residual_bws, path_link_index):
+    """ Returns the index (in gbl.HOSTS) of the first of the candidate substrate hosts onto which a
+    virtual host can be mapped, or None if there is none. It must not be used in the mapping yet,
+    have more remaining cpu than the virtual host's requirement, and have enough residual bandwidth
+    for all the links of the virtual host (with the substrate hosts of its mapped neighbors). The
+    links used by the paths of several of these virtual links must have enough bandwidth for all of
+    them together; so the load of every link is summed over the paths of all the virtual links.
+
+    cpu_req: The cpu requirement of the virtual host.
+    candidate_indices: The indices of the candidate substrate hosts, in the order of their rank.
+    cpu_limits: The remaining cpu limits of all the substrate hosts, as a NumPy array.
+    is_mapped: Whether every substrate host is used in the mapping so far, as a NumPy array.
+    neighbor_links: List[Tuple(SubstrateHost, int)] of the substrate hosts of the mapped neighbors
+        of the virtual host, and the bandwidth requirements of the virtual links with them.
+    residual_bws: The residual bandwidths of all the links (by id in path_link_index).
+    """
+    is_feasible = (cpu_limits[candidate_indices] > cpu_req) & ~is_mapped[candidate_indices]
+    if neighbor_links and is_feasible.any():
+        # The ids of the links on the paths of every candidate (satisfying the cpu requirement) to
+        # all the neighbors; (candidates, links).
+        link_ids = np.concatenate([path_link_index.get_path_link_ids(substrate_host)[
+            candidate_indices[is_feasible]] for (substrate_host, _) in neighbor_links], axis=1)
+        bw_reqs = np.concatenate([np.full(path_link_index.get_path_link_ids(substrate_host).shape[1], bw_req)
+                                  for (substrate_host, bw_req) in neighbor_links])
+        # The total load on every link (of every candidate), i.e. the sum of the bandwidths of all
+        # the paths through it.
+        loads = ((link_ids[:, :, None] == link_ids[:, None, :]) * bw_reqs).sum(axis=2)
+        is_feasible[is_feasible] = (loads <= residual_bws[link_ids]).all(axis=1)
+    if not is_feasible.any():
+        return None
+    return int(candidate_indices[np.argmax(is_feasible)])
+
+
 def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_hosts, ranked_substrate_hosts):
     """ Tries to performs greedy VNE embedding given the list of ranked virtual hosts and ranked substrate
     hosts. Note that this is still in the `vne_algorithms` module, and this function shall only return
@@ -80,9 +134,29 @@ def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_host
     ranked_substrate_hosts: List of ranked substrate hosts, i.e. in the order in which substrate hosts shall
         be tried for mapping of virtual hosts. Its a (ordered) list of SubstrateHost objects.
         Example: [SubstrateHost('h2'), SubstrateHost('h3'), SubstrateHost('h1')]
+        Or a function which returns (for the cpu requirement of a virtual host) the ranked substrate
+        hosts with more remaining cpu than it, so that the others are not even looked at.
+        Example: `gbl.RESIDUAL_CPU_INDEX.get_hosts_in_descending_order`
+    Returns (cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping) as taken by
+    `vnr_mapping.map_vnr_on_substrate_network`; every virtual link along with the paths (and the
+    split of its bandwidth over them) it was checked on, so that it is mapped on the same ones.
+    Or (None, None) if no mapping was found.
     """
 
-    COPY_SWITCH_PAIR_x_BW = copy.deepcopy(gbl.SWITCH_PAIR_x_BW)
+    # With 'static' routing, the paths between hosts are fixed; so the cpu and bandwidth checks for a
+    # virtual host are done for all the candidate substrate hosts at once, with NumPy (see
+    # `_get_first_feasible_substrate_host`), on the residual bandwidths of the links by id.
+    path_link_index = None
+    if hp.get_routing_mode() == "static":
+        path_link_index = path_index.get_path_link_index()
+        residual_bws = path_link_index.get_residual_bws(gbl.SWITCH_PAIR_x_BW)
+        cpu_limits = np.array([host.cpu_limit for host in gbl.HOSTS])
+        is_mapped = np.zeros(len(gbl.HOSTS), dtype=bool)
+        if not callable(ranked_substrate_hosts):
+            ranked_substrate_host_indices = _get_host_indices(
+                ranked_substrate_hosts, path_link_index)
+    else:
+        COPY_SWITCH_PAIR_x_BW = copy.deepcopy(gbl.SWITCH_PAIR_x_BW)
 
     # For every host, obtaining what all links it needs to have with other hosts, and their bws.
     hostpair_x_bw = {}
@@ -91,24 +165,79 @@ def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_host
             hostpair_x_bw[(h1, h2)] = bw
             hostpair_x_bw[(h2, h1)] = bw
 
+    # The residual capacities per leaf switch, to rule out all the substrate hosts under a leaf
+    # switch at once (see `capacity_tree.LeafCapacityTree.get_feasible_leaves`).
+    leaf_capacity_tree = capacity_tree.get_capacity_tree()
+
     # Maintain mapped hosts, and onto which substrate hosts they were mapped.
     mapped_host_x_substrate_host = {}
+    # The substrate hosts used in the mapping so far (the values of mapped_host_x_substrate_host).
+    mapped_substrate_hosts = set()
+    # The paths selected for the virtual links between the mapped hosts (with 'load-aware' and
+    # 'multipath' routing); List of (path, bandwidth) as per `substrate.split_bw_between_hosts`.
+    hostpair_x_paths = {}
 
     # Going over every virtual host to try a mapping (in order of 'ranked' virtual hosts).
     for h in ranked_virtual_hosts:
         host_mapped_successfully = False
+        candidate_substrate_hosts = ranked_substrate_hosts
+        if callable(ranked_substrate_hosts):
+            candidate_substrate_hosts = ranked_substrate_hosts(cpu_reqs[h - 1])
+
+        # The substrate hosts of the mapped virtual hosts which this host has links with, and the
+        # bandwidth requirements of the links.
+        neighbor_links = [(mapped_host_x_substrate_host[other_h], hostpair_x_bw[(h, other_h)])
+                          for other_h in mapped_host_x_substrate_host if hostpair_x_bw.get((h, other_h))]
+        is_leaf_feasible = leaf_capacity_tree.get_feasible_leaves(
+            cpu_reqs[h - 1], neighbor_links)
+        if not is_leaf_feasible.any():
+            print("\nNo leaf switch has the capacity for the cpu and bandwidth requirements of host {}".format(h))
+            return None, None
+
+        if path_link_index is not None:
+            if callable(ranked_substrate_hosts):
+                candidate_indices = _get_host_indices(
+                    candidate_substrate_hosts, path_link_index)
+            else:
+                candidate_indices = ranked_substrate_host_indices
+            # Leaving out the substrate hosts under the leaf switches ruled out.
+            candidate_indices = candidate_indices[is_leaf_feasible[
+                leaf_capacity_tree.host_leaf_indices[candidate_indices]]]
+            i = _get_first_feasible_substrate_host(
+                cpu_reqs[h - 1], candidate_indices, cpu_limits, is_mapped, neighbor_links, residual_bws, path_link_index)
+            if i is None:
+                print("\nNo substrate host can satisfy the cpu and bandwidth requirements of host {}".format(h))
+                return None, None
+            substrate_host = gbl.HOSTS[i]
+            # Reducing the residual bandwidths along the paths of the links of this host.
+            for (other_substrate_host, bw_req) in neighbor_links:
+                residual_bws[path_link_index.get_path_link_ids(
+                    other_substrate_host)[i]] -= bw_req
+            mapped_host_x_substrate_host[h] = substrate_host
+            mapped_substrate_hosts.add(substrate_host)
+            is_mapped[i] = True
+            print("\nHost {} mapped on substrate host {}!".format(
+                h, substrate_host.name))
+            continue
+
         # Trying the mapping onto substrate hosts in the order of 'ranked' substrate hosts.
-        for substrate_host in ranked_substrate_hosts:
-            if substrate_host in mapped_host_x_substrate_host.values():
+        for substrate_host in candidate_substrate_hosts:
+            if substrate_host in mapped_substrate_hosts:
                 # It means that this substrate host is already being used in another host's mapping,
                 # so we cannot use it here for this host.
                 continue
+            if not is_leaf_feasible[leaf_capacity_tree.host_leaf_indices[leaf_capacity_tree.host_x_index[substrate_host]]]:
+                # None of the substrate hosts under its leaf switch can satisfy the requirements.
+                continue
             # Check if that substrate host can satisfy the cpu requirement of this host.
             if cpu_reqs[h - 1] < substrate_host.cpu_limit:
                 # Can try mapping this host.
                 print("\nTrying to map host {} on substrate host {},  cpu_reqs[h]: {}, substrate_host.cpu_limit: {}".format(
                     h, substrate_host.name, cpu_reqs[h - 1], substrate_host.cpu_limit))
-                local_COPY_SWITCH_PAIR_x_BW = COPY_SWITCH_PAIR_x_BW
+                # The bandwidths are reduced on a copy, so that nothing is left reduced if the
+                # mapping of this host on this substrate host turns out not to be possible.
+                local_COPY_SWITCH_PAIR_x_BW = dict(COPY_SWITCH_PAIR_x_BW)
+                local_hostpair_x_paths = {}
                 mapped_host_x_substrate_host[h] = substrate_host
                 host_mapped_successfully = True
                 # Then check for all the link's bandwidth requirements between this
@@ -122,14 +251,20 @@ def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_host
                     # bw values.
                     if hostpair_x_bw.get((h, other_h)):
                         bw_req = hostpair_x_bw[(h, other_h)]
+                        bw_limit = hp.get_bandwidth_limit_between_host_pair(
+                            (H1, H2), local_COPY_SWITCH_PAIR_x_BW)
                         print("Checking bandwidth requirments between {} and {}... bw_req = {}, actual bw limit b/w hosts: {}".format(
-                            H1.name, H2.name, bw_req, hp.get_bandwidth_limit_between_host_pair((H1, H2), local_COPY_SWITCH_PAIR_x_BW)))
+                            H1.name, H2.name, bw_req, bw_limit))
                         # If bandwidth req is less than the limit between hosts, only then the
                         # mapping of this host is possible, else just remove this host mapping,
                         # and try another.
-                        if bw_req <= hp.get_bandwidth_limit_between_host_pair((H1, H2), local_COPY_SWITCH_PAIR_x_BW):
-                            local_COPY_SWITCH_PAIR_x_BW, _ = vnr_mapping.add_link_mapping_between_hosts(
+                        if bw_req <= bw_limit:
+                            paths = substrate.split_bw_between_hosts(
                                 (H1, H2), bw_req, local_COPY_SWITCH_PAIR_x_BW)
+                            local_COPY_SWITCH_PAIR_x_BW, _ = vnr_mapping.add_link_mapping_between_hosts(
+                                (H1, H2), bw_req, local_COPY_SWITCH_PAIR_x_BW, paths=paths)
+                            local_hostpair_x_paths[(h, other_h)] = paths
+                            local_hostpair_x_paths[(other_h, h)] = paths
                         else:
                             host_mapped_successfully = False
                             break
@@ -145,6 +280,8 @@ def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_host
                     # Only once the mapping of this virtual host is confirmed on this substrate host,
                     # only then you update the COPY_SWITCH_PAIR_x_BW variable.
                     COPY_SWITCH_PAIR_x_BW = local_COPY_SWITCH_PAIR_x_BW
+                    hostpair_x_paths.update(local_hostpair_x_paths)
+                    mapped_substrate_hosts.add(substrate_host)
             # If the substrate host for mapping this host has been found, then break out
             # of inner for loop, and continue to finding the mapping for next host.
             if host_mapped_successfully:
@@ -163,12 +300,16 @@ def _greedy_vne_embedding(num_hosts, cpu_reqs, link_bw_reqs, ranked_virtual_host
     for (h1, h2, bw) in link_bw_reqs:
         H1 = mapped_host_x_substrate_host[h1]
         H2 = mapped_host_x_substrate_host[h2]
-        bw_reqs_for_vnr_mapping.append((H1.name, H2.name, bw))
+        # With 'static' routing, the path is the fixed one between the hosts.
+        paths = hostpair_x_paths.get((h1, h2)) or substrate.split_bw_between_hosts(
+            (H1, H2), bw, gbl.SWITCH_PAIR_x_BW)
+        bw_reqs_for_vnr_mapping.append((H1.name, H2.name, bw, paths))
 
     print("\nSubstrate hosts selected by the {}:".format(
         gbl.CFG["vne_algorithm"]))
     print("cpu_reqs_for_vnr_mapping: ", cpu_reqs_for_vnr_mapping)
-    print("bw_reqs_for_vnr_mapping: ", bw_reqs_for_vnr_mapping)
+    print("bw_reqs_for_vnr_mapping: ", [link[:3]
+          for link in bw_reqs_for_vnr_mapping])
 
     return (cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping)
 
@@ -185,10 +326,36 @@ def vne_algorithm(num_hosts, cpu_reqs, link_bw_reqs):
         between the hosts. List of Tuple(vhost, vhost, bandwidth requirement)
         Example: [(1, 2, 5), (2, 3, 3), (2, 4, 6), (3, 4, 8)]
     """
+    # VNRs which obviously cannot be mapped are rejected right away, without running the algorithm.
+    if gbl.ADMISSION_FILTER is not None:
+        rejection_reason = gbl.ADMISSION_FILTER.get_rejection_reason(
+            num_hosts, cpu_reqs, link_bw_reqs)
+        if rejection_reason is not None:
+            print("\nVNR rejected by the admission control, as {}.".format(
+                rejection_reason))
+            op.output_dict["fast_rejected"] += 1
+            return None, None
+    # And so are the VNRs which dominate a VNR that has failed already (see `admission.FailureCache`).
+    if gbl.FAILURE_CACHE is not None and gbl.FAILURE_CACHE.is_dominated(num_hosts, cpu_reqs, link_bw_reqs):
+        print("\nVNR rejected by the failure cache, as it demands at least as much as a VNR (of the same topology) which failed already.")
+        op.output_dict["failure_cache_rejected"] += 1
+        return None, None
+
+    cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping = _run_vne_algorithm(
+        num_hosts, cpu_reqs, link_bw_reqs)
+    if not cpu_reqs_for_vnr_mapping and gbl.FAILURE_CACHE is not None:
+        gbl.FAILURE_CACHE.add(num_hosts, cpu_reqs, link_bw_reqs)
+    return cpu_reqs_for_vnr_mapping, bw_reqs_for_vnr_mapping
+
+
+def _run_vne_algorithm(num_hosts, cpu_reqs, link_bw_reqs):
+    """ Runs the VNE algorithm specified in the configurations file for the VNR. """
     if gbl.CFG["vne_algorithm"] == "worst-fit-algorithm":
         return _worst_fit_algorithm(num_hosts, cpu_reqs, link_bw_reqs)
     if gbl.CFG["vne_algorithm"] == "first-fit-algorithm":
         return _first_fit_algorithm(num_hosts, cpu_reqs, link_bw_reqs)
+    if gbl.CFG["vne_algorithm"] == "best-fit-algorithm":
+        return _best_fit_algorithm(num_hosts, cpu_reqs, link_bw_reqs)
     if gbl.CFG["vne_algorithm"] == "nord-algorithm":
         return _nord_algorithm(num_hosts, cpu_reqs, link_bw_reqs)
     if gbl.CFG["vne_algorithm"] == "nrm-algorithm":
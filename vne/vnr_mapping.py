@@ -1,10 +1,20 @@
 import gbl
 from main_classes import Host
 from substrate import SubstrateHost
+import substrate
+from allocators import IdPool
 from typing import List
 import helpers as hp
+import admission
+import capacity_tree
 from mininet.cli import CLI
+from mininet.node import CPULimitedHost, Host as MininetHost
+from mininet.util import custom
 import output as op
+import time
+import heapq
+import os
+import tempfile
 
 
 class VNRVirtualHost(Host):
@@ -19,16 +29,24 @@ class VNRVirtualHost(Host):
     host_switch_attached : Switch
         The host switch to which this virtual host is being attached to. It will be the same
         host switch that the substrate host is attached to as well.
-    vlan_id: int
-        The VLAN identifier, to uniquely identify and differentiate each VNR from another,
-        and to ensure isolation between VNRs.
+    isolation_id: int
+        The isolation identifier (VLAN ID, or the id carried in the destination MAC address) of
+        the VNR of this virtual host, to uniquely identify and differentiate each VNR from
+        another, and to ensure isolation between VNRs.
+    host_switch_port : int
+        The port number on the attached host switch that this virtual host is linked to.
+    meter_ids : List[int]
+        Identifiers of the OpenFlow meters added on the attached host switch for the virtual
+        links of this virtual host (only when bandwidth is enforced using meters).
     """
 
     def __init__(self, vnr_host_name, substrate_host, ip_addr, host_switch, cpu_limit):
         super().__init__(vnr_host_name, ip_addr, cpu_limit)
         self.substrate_host = substrate_host
         self.host_switch_attached = host_switch
-        self.vlan_id = 0
+        self.isolation_id = 0
+        self.host_switch_port = None
+        self.meter_ids = []
 
 
 class MappedVNR:
@@ -43,31 +61,60 @@ class MappedVNR:
         List of VNRVirtualHost objects that have been created as virtual hosts to serve this VNR.
     vnr_number: int
         Virtual Network Request number.
-    vlan_id: int
-        The VLAN identifier, to uniquely identify and differentiate each VNR from another,
-        and to ensure isolation between VNRs. Same as the vnr_number.
+    isolation_id: int
+        The isolation identifier (VLAN ID, or the id carried in the destination MAC address), to
+        uniquely identify and differentiate each VNR from another, and to ensure isolation between
+        VNRs. Taken from gbl.ISOLATION_ID_POOL, and given back when the VNR is removed.
     vnr_host_names: List[str]
         List of the VNR substrate host names.
     vnr_links_with_bw: List[Tuple(str, str, int)]
         List of the links along with bandwidth. Each link is represented as a tuple of 
         host name, other host name, and the bandwidth of the link between them.
+    link_paths: Dict[Tuple(str, str), List[Tuple(List[Tuple(Node, Node)], int)]]
+        The paths (in the substrate network) along which each link is mapped, along with the
+        bandwidth mapped on each path (a single path, unless with 'multipath' routing); keyed by
+        the two host names as in `vnr_links_with_bw`.
+    path_flow_entries: List[Tuple(str, str)]
+        The flow entries (switch name, and match) added on leaf switches for the links whose paths
+        go through other spine switches than the substrate flow entries do.
+    path_group_entries: List[Tuple(str, int)]
+        The OpenFlow select groups (switch name, and group id) added on leaf switches for the links
+        split over multiple paths.
     """
 
-    def __init__(self, substrate_hosts: List[SubstrateHost], virtual_hosts: List[VNRVirtualHost], vnr_number: int):
+    def __init__(self, substrate_hosts: List[SubstrateHost], virtual_hosts: List[VNRVirtualHost], vnr_number: int, isolation_id: int):
         self.substrate_hosts = substrate_hosts
         self.virtual_hosts = virtual_hosts
         self.vnr_number = vnr_number
-        self.vlan_id = vnr_number
+        self.isolation_id = isolation_id
         self.vnr_host_names = None
         self.vnr_links_with_bw = None
+        self.link_paths = {}
+        self.path_flow_entries = []
+        self.path_group_entries = []
 
         # Virtual host mapped on substrate hostname.
         self.hostname_x_vh = {}
         for (vh, host) in zip(virtual_hosts, substrate_hosts):
             self.hostname_x_vh[host.name] = vh
 
+    def get_paths_of_link(self, host_name1, host_name2):
+        """ Returns the list of (path, bandwidth) along which the link between the virtual hosts
+        mapped on the two substrate hosts is mapped. """
+        if (host_name1, host_name2) in self.link_paths:
+            return self.link_paths[(host_name1, host_name2)]
+        return self.link_paths[(host_name2, host_name1)]
 
-def _add_vnr_host_on_substrate_host(net, vnr_host_name: str, substrate_host_name: str, cpu_requirement: int, vlan_id: int):
+
+def _get_isolation_id_pool():
+    """ Returns the pool of isolation ids given to VNRs, creating it on first use with as many
+    ids as the configured VNR isolation scheme can carry. """
+    if gbl.ISOLATION_ID_POOL is None:
+        gbl.ISOLATION_ID_POOL = IdPool(1, hp.get_max_isolation_id())
+    return gbl.ISOLATION_ID_POOL
+
+
+def _add_vnr_host_on_substrate_host(net, vnr_host_name: str, substrate_host_name: str, cpu_requirement: int, isolation_id: int):
     """ Add/map a vnr virtual host onto an existing substrate host in the network.
     vnr_host_name: str
         Virtual host name. E.g. 'vnr1_vh2'.
@@ -76,24 +123,25 @@ def _add_vnr_host_on_substrate_host(net, vnr_host_name: str, substrate_host_name
     cpu_requirement: int
         CPU requirement/limit of this virtual host. Must be less than the remaining cpu limit of the 
         underlying substrate host.
-    vlan_id: int
-        VLAN identifier. Same as the VNR number.
+    isolation_id: int
+        Isolation identifier (e.g. VLAN ID) of the VNR.
     """
     # Dealing with our code's classes and objects first (i.e. Host, Switch, SubstrateHost, VNRVirtualHost),
     # not that of mininet's objects yet.
     substrate_host = gbl.HOSTNAME_x_HOST[substrate_host_name]
     host_switch = substrate_host.host_switch_attached
     # Assigning IP address for the vnr virtual host. The scheme we are following here for the IP addressing
-    # of vnr virtual hosts is to maintain the same /24 subnet as that of the substrate host that they are
-    # being mapped onto, and depending on how many virtual hosts have already been mapped, the info of which
-    # we get from `next_port_number`, the IP addressing is done. For example, for the substrate host having
-    # IP address '10.1.0.0/24', the first virtual host mapped onto it will be given IP address '10.1.0.1',
-    # and next '10.1.0.2', and so on.
-    x = substrate_host.ip_addr.split(".")
-    x[-1] = str(host_switch.next_port_number - 2)
-    ip_addr_vnrhost = ".".join(x)
+    # of vnr virtual hosts is to maintain the same subnet as that of the substrate host that they are
+    # being mapped onto, and the next free address of that subnet is given by the substrate host's
+    # `ip_allocator`. For example, for the substrate host having IP address '10.1.0.0/24', the first virtual
+    # host mapped onto it will be given IP address '10.1.0.1', and next '10.1.0.2', and so on. Addresses of
+    # virtual hosts that are removed from the network are reused. Note that the port number of the virtual
+    # host on the host switch is allocated separately, by `_allocate_port_number`.
+    ip_addr_vnrhost = substrate_host.ip_allocator.allocate()
     vnr_host = VNRVirtualHost(
         vnr_host_name, substrate_host, ip_addr_vnrhost, host_switch, cpu_requirement)
+    vnr_host.host_switch_port = _allocate_port_number(host_switch)
+    vnr_host.isolation_id = isolation_id
     # Updating the virtual hosts mapped for this substrate host.
     substrate_host.virtual_hosts_mapped.append(vnr_host)
     # Adding the vnr virtual host to maintained dict HOSTNAME_x_HOST.
@@ -101,44 +149,68 @@ def _add_vnr_host_on_substrate_host(net, vnr_host_name: str, substrate_host_name
 
     # Reducing that much cpu bandwidth from the substrate host, since we just mapped
     # a virtual node on it, and gave it that cpu limit.
-    substrate_host.cpu_limit = substrate_host.cpu_limit - cpu_requirement
+    hp.change_cpu_limit_of_substrate_host(substrate_host, -cpu_requirement)
     if substrate_host.cpu_limit < 0:
         raise Exception(
             "You cannot allocate more cpu limit for the virtual hosts than the cpu limit of this substrate host!")
 
+    # In a model-only run (no mininet network), only the model of the substrate network is updated.
+    if net is None:
+        return substrate_host, vnr_host
+
     cpu_percentage = cpu_requirement / SubstrateHost.cpu_all_hosts
 
     # Dealing with mininet structures now. Note that here 'vnr_host' is an object of our created class,
     # but 'virtual_host' is in the terms of what mininet will actually understand.
-    virtual_host = net.addHost(vnr_host.name, cpu=cpu_percentage, ip=vnr_host.ip_addr + '/24', defaultRoute='via {}'.format(
-        hp.get_default_router_for_host(vnr_host)))
+    # Virtual hosts are plain hosts (without cgroups) if their cpu limits are only to be modeled.
+    host_params = {"cls": MininetHost}
+    if hp.is_cpu_limit_enforced("virtual"):
+        host_params = {"cls": custom(
+            CPULimitedHost, sched='cfs'), "cpu": cpu_percentage}
+    virtual_host = net.addHost(vnr_host.name, **host_params, ip='{}/{}'.format(vnr_host.ip_addr, substrate_host.ip_allocator.prefixlen),
+                               defaultRoute='via {}'.format(hp.get_default_router_for_host(vnr_host)))
     sh_switch = net[host_switch.name]
-    link = net.addLink(sh_switch, virtual_host)
+    link = net.addLink(sh_switch, virtual_host,
+                       port1=vnr_host.host_switch_port)
     sh_switch.attach(link.intf1)
     net.configHosts()
 
     # Adding ARP entries
     hp.add_arp_entry_for_host(vnr_host, net)
 
-    # Adding flow table entries for the virtual host along with VLAN logic for isolation of each VNRs from the other.
+    # Adding flow table entries for the virtual host along with VLAN (or MAC) tagging logic for isolation of each
+    # VNRs from the other.
     # Obtaining the mac address of the virtual host.
     vh_mac = str.rstrip(virtual_host.cmd(
         "ip -a link | grep ether | awk '{print $2}'"))
-    # Depending on which in_port the packet comes from, it is assigned a different vlan_id,
+    # Depending on which in_port the packet comes from, it is tagged with a different isolation_id,
     # and this helps in isolation of the VNR's traffic.
-    CLI.do_sh(net, 'ovs-ofctl add-flow {} priority=3005,ip,in_port={},dl_vlan=0xffff,actions=mod_vlan_vid:{},output:1'.format(
-        host_switch.name, str(host_switch.next_port_number), str(vlan_id)))
-    CLI.do_sh(net, 'ovs-ofctl add-flow {} priority=3005,ip,nw_dst={},dl_vlan={},actions=strip_vlan,mod_dl_dst:{},output:{}'.format(
-        host_switch.name, vnr_host.ip_addr, str(vlan_id), vh_mac, str(host_switch.next_port_number)))
-
-    # Increment because one more link was added to this host switch, since virtual host was added.
-    host_switch.next_port_number += 1
+    CLI.do_sh(net, 'ovs-ofctl add-flow {} priority=3005,ip,in_port={},{},actions={},{}'.format(
+        host_switch.name, str(vnr_host.host_switch_port), hp.get_isolation_ingress_match(), hp.get_isolation_tag_actions(isolation_id),
+        hp.get_isolation_ingress_forward_action()))
+    CLI.do_sh(net, 'ovs-ofctl add-flow {} priority=3005,ip,nw_dst={},{},actions={}mod_dl_dst:{},output:{}'.format(
+        host_switch.name, vnr_host.ip_addr, hp.get_isolation_tag_match(isolation_id), hp.get_isolation_untag_actions(), vh_mac, str(vnr_host.host_switch_port)))
 
     return substrate_host, vnr_host
 
 
+def _allocate_port_number(switch):
+    """ Returns the port number on the switch for a new link (of a virtual host); the smallest port
+    number freed by a removed link if any, else the next one. """
+    if switch.free_port_numbers:
+        return heapq.heappop(switch.free_port_numbers)
+    # Increment because one more link is added to this switch.
+    switch.next_port_number += 1
+    return switch.next_port_number - 1
+
+
 def _add_tc_htb(net, vhost_name: str, bandwidth_list: List[int], dst_ip_list: List[str]):
     """ Add traffic control, with HTB (Hierarchical Token Bucket) filtering qdisc.
+    All the tc qdisc, class and filter rules of the virtual host are written to a batch file
+    and created with a single `tc -batch` call. When the virtual host has more virtual links
+    than the 'tc_hash_threshold' configuration, the filters are placed in a u32 hash table
+    keyed on the last octet of the destination IP address, so that classifying a packet does
+    not need a linear scan over one filter per virtual link.
     vhost_name: str
         Virtual host name. E.g. 'vnr1_vh2'.
     bandwidth_list: List[int]
@@ -159,20 +231,46 @@ def _add_tc_htb(net, vhost_name: str, bandwidth_list: List[int], dst_ip_list: Li
 
     classid_numbers = list(range(10, 10 + len(bandwidth_list)))
     total_bandwidth = sum(bandwidth_list)
+    # The tc commands (without the leading 'tc') to be run as one batch.
+    tc_batch = []
     # Adding tc qdisc and tc class rules for the interface of this virtual host.
     # Setting the bandwidth limits for each classids.
-    vhost.cmd("tc qdisc add dev {} root handle 1: htb default 10".format(interface))
-    vhost.cmd(
-        "tc class add dev {} parent 1: classid 1:1 htb rate {}mbit ceil {}mbit".format(interface, str(total_bandwidth), str(total_bandwidth)))
+    tc_batch.append(
+        "qdisc add dev {} root handle 1: htb default 10".format(interface))
+    tc_batch.append(
+        "class add dev {} parent 1: classid 1:1 htb rate {}mbit ceil {}mbit".format(interface, str(total_bandwidth), str(total_bandwidth)))
     for (classid_number, bandwidth) in zip(classid_numbers, bandwidth_list):
-        vhost.cmd(
-            "tc class add dev {} parent 1:1 classid 1:{} htb rate {}mbit ceil {}mbit".format(interface, str(classid_number), str(bandwidth), str(bandwidth)))
+        tc_batch.append(
+            "class add dev {} parent 1:1 classid 1:{} htb rate {}mbit ceil {}mbit".format(interface, str(classid_number), str(bandwidth), str(bandwidth)))
 
     # Attaching tc filtering rules based on the destination IP address of the packets,
     # to decide which class of the qdisc that traffic belongs to.
-    for(dst_ip, classid_number) in zip(dst_ip_list, classid_numbers):
-        vhost.cmd("tc filter add dev {} protocol ip parent 1:0 prio 1 u32 match ip dst {} flowid 1:{}".format(
-            interface, dst_ip, str(classid_number)))
+    if len(dst_ip_list) > gbl.CFG.get("tc_hash_threshold", 8):
+        # Hash table 2: with 256 buckets, linked from the root u32 table (800:) such that the
+        # bucket is selected by the last octet of the destination IP address (the destination
+        # address lies at offset 16 of the IP header). Every bucket then only holds the filters
+        # of the destination IPs ending with that octet.
+        tc_batch.append(
+            "filter add dev {} parent 1:0 prio 1 handle 2: protocol ip u32 divisor 256".format(interface))
+        tc_batch.append(
+            "filter add dev {} protocol ip parent 1:0 prio 1 u32 ht 800:: match ip dst 0.0.0.0/0 hashkey mask 0x000000ff at 16 link 2:".format(interface))
+        for (dst_ip, classid_number) in zip(dst_ip_list, classid_numbers):
+            bucket = int(dst_ip.split("/")[0].split(".")[-1])
+            tc_batch.append("filter add dev {} protocol ip parent 1:0 prio 1 u32 ht 2:{:x}: match ip dst {} flowid 1:{}".format(
+                interface, bucket, dst_ip, str(classid_number)))
+    else:
+        for (dst_ip, classid_number) in zip(dst_ip_list, classid_numbers):
+            tc_batch.append("filter add dev {} protocol ip parent 1:0 prio 1 u32 match ip dst {} flowid 1:{}".format(
+                interface, dst_ip, str(classid_number)))
+
+    # Mininet hosts share the filesystem with the root namespace, so the batch file written
+    # here can directly be read by `tc` running inside the virtual host.
+    batch_file_path = os.path.join(
+        tempfile.gettempdir(), "{}.tc".format(vhost_name))
+    with open(batch_file_path, "w") as batch_file:
+        batch_file.write("\n".join(tc_batch) + "\n")
+    print(vhost.cmd("tc -batch {}".format(batch_file_path)))
+    os.remove(batch_file_path)
 
     print("------------------------------------------\n tc qdisc show for {}: ".format(vhost_name))
     print(vhost.cmd("tc qdisc show dev {}".format(interface)))
@@ -181,6 +279,41 @@ def _add_tc_htb(net, vhost_name: str, bandwidth_list: List[int], dst_ip_list: Li
     print("------------------------------------------\n")
 
 
+def _add_of_meters(net, vnr_host: VNRVirtualHost, bandwidth_list: List[int], dst_ip_list: List[str]):
+    """ Alternative to `_add_tc_htb`; restricts the bandwidth of the virtual links using OpenFlow
+    meters on the host switch that the virtual host is attached to, instead of traffic control
+    rules inside the virtual host. One meter is added for every virtual link of this virtual host,
+    and a flow entry (keyed by the in_port of the virtual host, i.e. its VNR, and the destination
+    IP address) sends the traffic of that link through its meter before tagging it with the
+    isolation id of the VNR and forwarding it to the leaf switch.
+    vnr_host: VNRVirtualHost
+        The virtual host whose outgoing traffic is to be metered.
+    bandwidth_list: List[int]
+        List of bandwidths (in mbit) to assign between this virtual host and all the other virtual
+        hosts to which it has a link in the VNR.
+    dst_ip_list: List[str]
+        List of destination IP addresses of all the other virtual hosts to which this virtual host
+        has a direct link in the VNR.
+    """
+    print("Adding OpenFlow meters for {}; bandwidths: {}, dst_ip_list: {}.".format(
+        vnr_host.name, bandwidth_list, dst_ip_list))
+    if len(bandwidth_list) != len(dst_ip_list):
+        raise Exception(
+            "The bandwidth list and dst_ip_list must have same length.")
+
+    host_switch = vnr_host.host_switch_attached
+    for (dst_ip, bandwidth) in zip(dst_ip_list, bandwidth_list):
+        meter_id = host_switch.next_meter_id
+        host_switch.next_meter_id += 1
+        hp.add_meter(net, host_switch.name, meter_id, bandwidth * 1000)
+        vnr_host.meter_ids.append(meter_id)
+        # Higher priority (3006) than the generic VLAN tagging flow entry (3005) of this virtual
+        # host, so that traffic towards a linked virtual host goes through its meter.
+        CLI.do_sh(net, 'ovs-ofctl -O OpenFlow13 add-flow {} priority=3006,ip,in_port={},{},nw_dst={},actions=meter:{},{},{}'.format(
+            host_switch.name, str(vnr_host.host_switch_port), hp.get_isolation_ingress_match(), dst_ip, str(meter_id),
+            hp.get_isolation_tag_actions(vnr_host.isolation_id), hp.get_isolation_ingress_forward_action()))
+
+
 #######################################################################################
 
 def map_vnr_on_substrate_network(net, host_requirements, links_with_bw):
@@ -195,30 +328,37 @@ def map_vnr_on_substrate_network(net, host_requirements, links_with_bw):
                 ('h2', 'h3', 90),
                 ('h1', 'h3', 20),
                 ('h2', 'h4', 60)]
+        A link may also have a 4th element; the list of (path, bandwidth) to map it on, as
+        selected by the VNE algorithm (see `vne_algorithms._greedy_vne_embedding`). Otherwise the
+        paths are selected as per the routing mode, when the link is mapped.
     """
     # Tracking 'cost' and 'revenue' with respect to bandwidth for output results.
     total_bw_cost_spent_on_substrate = 0
     total_bw_requested = 0
     total_cpu_reqs = 0
 
-    vnr_number = len(gbl.MAPPED_VNRS) + 1
+    gbl.NUM_VNRS_MAPPED_SO_FAR += 1
+    vnr_number = gbl.NUM_VNRS_MAPPED_SO_FAR
+    # Isolation ids are recycled (from VNRs which have been removed), so the number of VNRs in the
+    # network at a time is only limited by the isolation scheme, not by the VNRs served so far.
+    isolation_id = _get_isolation_id_pool().allocate()
     substrate_hosts = []
     virtual_hosts = []
     for i, (host_name, cpu_req) in enumerate(host_requirements):
         virtual_host_name = 'vnr{}_vh{}'.format(vnr_number, i + 1)
         substrate_host, virtual_host = _add_vnr_host_on_substrate_host(
-            net, virtual_host_name, host_name, cpu_req, vnr_number)
+            net, virtual_host_name, host_name, cpu_req, isolation_id)
         substrate_hosts.append(substrate_host)
         virtual_hosts.append(virtual_host)
         op.SUBSTRATE_HOSTS_USED.add(host_name)
         total_cpu_reqs += cpu_req
 
     host_names = [h[0] for h in host_requirements]
-    vnr = MappedVNR(substrate_hosts, virtual_hosts, vnr_number)
+    vnr = MappedVNR(substrate_hosts, virtual_hosts, vnr_number, isolation_id)
 
     # Storing the original VNR request data as well so that it can be tested later in iperf, ping, etc.
     vnr.vnr_host_names = host_names
-    vnr.vnr_links_with_bw = links_with_bw
+    vnr.vnr_links_with_bw = [link[:3] for link in links_with_bw]
 
     gbl.MAPPED_VNRS.append(vnr)
 
@@ -239,23 +379,43 @@ def map_vnr_on_substrate_network(net, host_requirements, links_with_bw):
             if vhost.name is vh2_on_link.name:
                 vhost_x_links[vhost].append((bw_of_link, vh1_on_link))
 
-    # Adding traffic control rules for each virtual host.
-    for vhost in virtual_hosts:
-        bws = []
-        dst_ips = []
-        links_for_this_vhost = vhost_x_links[vhost]
-        for link in links_for_this_vhost:
-            bws.append(link[0])
-            dst_ips.append(link[1].ip_addr)
-        _add_tc_htb(net, vhost.name, bws, dst_ips)
-
-    # Reducing the bandwidth values in gbl.SWITCH_PAIR_x_BW
-    for (h1_name, h2_name, bw) in links_with_bw:
+    # Adding traffic control rules (or OpenFlow meters) for each virtual host. The time spent
+    # doing so is tracked to compare the setup cost of the bandwidth enforcement modes. There is
+    # nothing to enforce in a model-only run (no mininet network).
+    if net is not None:
+        bw_enforcement_start = time.time()
+        for vhost in virtual_hosts:
+            bws = []
+            dst_ips = []
+            links_for_this_vhost = vhost_x_links[vhost]
+            for link in links_for_this_vhost:
+                bws.append(link[0])
+                dst_ips.append(link[1].ip_addr)
+            if hp.get_bw_enforcement_mode() == "meter":
+                _add_of_meters(net, vhost, bws, dst_ips)
+            else:
+                _add_tc_htb(net, vhost.name, bws, dst_ips)
+        op.output_dict["bw_enforcement_setup_time"] += time.time() - \
+            bw_enforcement_start
+
+    # Reducing the bandwidth values in gbl.SWITCH_PAIR_x_BW, along the paths selected for every
+    # link; the ones the VNE algorithm checked the link on, so that the bandwidths reduced are the
+    # ones it found to be enough. Else, as per the routing mode.
+    for link in links_with_bw:
+        (h1_name, h2_name, bw) = link[:3]
         h1 = gbl.HOSTNAME_x_HOST[h1_name]
         h2 = gbl.HOSTNAME_x_HOST[h2_name]
 
+        if len(link) > 3:
+            paths = link[3]
+        else:
+            paths = substrate.split_bw_between_hosts(
+                (h1, h2), bw, gbl.SWITCH_PAIR_x_BW)
+        vnr.link_paths[(h1_name, h2_name)] = paths
         gbl.SWITCH_PAIR_x_BW, bw_cost_spent_on_substrate = add_link_mapping_between_hosts(
-            (h1, h2), bw, gbl.SWITCH_PAIR_x_BW, "final-vnr-mapping")
+            (h1, h2), bw, gbl.SWITCH_PAIR_x_BW, "final-vnr-mapping", paths)
+        if net is not None:
+            _add_flow_entries_for_link_paths(net, vnr, paths)
         total_bw_cost_spent_on_substrate += bw_cost_spent_on_substrate
         total_bw_requested += bw
 
@@ -270,8 +430,134 @@ def map_vnr_on_substrate_network(net, host_requirements, links_with_bw):
     op.output_dict["total_cost"] += total_cpu_reqs
     op.output_dict["revenue"] += total_cpu_reqs
 
+    admission.update_admission_filter(substrate_hosts)
+    capacity_tree.update_capacity_tree(substrate_hosts)
+
+    # In online mode, the cpu limits of (only) the substrate hosts used by this VNR are updated
+    # right away, instead of updating all the changed substrate hosts after all VNRs are mapped.
+    if gbl.CFG.get("update_cpu_limits_per_vnr", False):
+        hp.update_cpu_limits_of_substrate_hosts_after_vnr_mapping(
+            net, substrate_hosts)
+
+
+def _add_flow_entries_for_link_paths(net, vnr: MappedVNR, paths):
+    """ Adds flow entries for the VNR's traffic between the two (virtual hosts mapped on the) end
+    hosts of the paths, on the leaf switches of both the ends; so that it goes up to the spine
+    switch of the path (selected with 'load-aware' routing) instead of the one that the substrate
+    flow entries route through. The spine switches then route it downwards as usual. These have
+    a higher priority (3002) than the substrate flow entries, and only match the VNR's tagged
+    traffic between the two virtual hosts. If the link is split over multiple paths ('multipath'
+    routing), the traffic is sent to an OpenFlow select group instead, having one bucket (towards
+    the spine switch) per path, weighted by the bandwidth mapped on that path. Note that a select
+    group hashes every flow (connection) onto one of its buckets, so the split holds for the
+    aggregate of the flows of the link.
+    paths: List of (path, bandwidth), as returned by `substrate.split_bw_between_hosts`.
+    """
+    h1 = paths[0][0][0][0]
+    h2 = paths[0][0][-1][1]
+    spine_switches = [substrate.get_spine_switch_on_path(path) for (path, _) in paths]
+    if len(paths) == 1 and spine_switches[0] is substrate.get_spine_switch_on_path(gbl.PATH_BETWEEN_HOSTS[(h1, h2)]):
+        # Both the hosts are under the same leaf switch, or the path goes through the spine
+        # switch that the substrate flow entries route through anyway.
+        return
+    vh1 = vnr.hostname_x_vh[h1.name]
+    vh2 = vnr.hostname_x_vh[h2.name]
+    for (src_h, src_vh, dst_vh) in [(h1, vh1, vh2), (h2, vh2, vh1)]:
+        leaf_switch = gbl.LEAF_SWITCHES[src_h.leaf_index]
+        match = "priority=3002,ip,{},nw_src={},nw_dst={}".format(
+            hp.get_isolation_tag_match(vnr.isolation_id), src_vh.ip_addr, dst_vh.ip_addr)
+        # Every leaf switch is connected to the spine switches in order, from port 1 onwards.
+        if len(paths) == 1:
+            CLI.do_sh(net, 'ovs-ofctl add-flow {} {},actions=output:{}'.format(
+                leaf_switch.name, match, spine_switches[0].index + 1))
+        else:
+            group_id = leaf_switch.next_group_id
+            leaf_switch.next_group_id += 1
+            buckets = ",".join("bucket=weight:{},output:{}".format(bw, spine_switch.index + 1)
+                               for (spine_switch, (_, bw)) in zip(spine_switches, paths))
+            CLI.do_sh(net, 'ovs-ofctl -O OpenFlow13 add-group {} group_id={},type=select,{}'.format(
+                leaf_switch.name, group_id, buckets))
+            vnr.path_group_entries.append((leaf_switch.name, group_id))
+            CLI.do_sh(net, 'ovs-ofctl -O OpenFlow13 add-flow {} {},actions=group:{}'.format(
+                leaf_switch.name, match, group_id))
+        vnr.path_flow_entries.append((leaf_switch.name, match))
+
+
+def _remove_vnr_host_from_substrate_host(net, vnr_host: VNRVirtualHost):
+    """ Remove a vnr virtual host from the substrate host it is mapped onto; reverting everything
+    done in `_add_vnr_host_on_substrate_host` (and the bandwidth enforcement of its links).
+    vnr_host: VNRVirtualHost
+        The virtual host to be removed. E.g. VNRVirtualHost('vnr1_vh2').
+    """
+    substrate_host = vnr_host.substrate_host
+    host_switch = vnr_host.host_switch_attached
+
+    # Nothing to remove from mininet in a model-only run (no mininet network).
+    if net is not None:
+        # Removing the flow table entries (and meters) added for this virtual host from the host switch.
+        CLI.do_sh(net, 'ovs-ofctl del-flows {} in_port={}'.format(
+            host_switch.name, str(vnr_host.host_switch_port)))
+        CLI.do_sh(net, 'ovs-ofctl del-flows {} ip,nw_dst={}'.format(
+            host_switch.name, vnr_host.ip_addr))
+        for meter_id in vnr_host.meter_ids:
+            CLI.do_sh(net, 'ovs-ofctl -O OpenFlow13 del-meter {} meter={}'.format(
+                host_switch.name, str(meter_id)))
+
+        # Removing the virtual host (and its link with the host switch) from mininet.
+        sh_switch = net[host_switch.name]
+        virtual_host = net[vnr_host.name]
+        for link in net.linksBetween(sh_switch, virtual_host):
+            sh_switch.detach(link.intf1)
+            net.delLink(link)
+        net.delHost(virtual_host)
+
+    # Giving back the cpu limit and the IP address of the virtual host to the substrate host, and
+    # its port number to the host switch.
+    heapq.heappush(host_switch.free_port_numbers, vnr_host.host_switch_port)
+    hp.change_cpu_limit_of_substrate_host(substrate_host, vnr_host.cpu_limit)
+    substrate_host.ip_allocator.free(vnr_host.ip_addr)
+    substrate_host.virtual_hosts_mapped.remove(vnr_host)
+    del gbl.HOSTNAME_x_HOST[vnr_host.name]
+
+
+def remove_vnr_from_substrate_network(net, vnr: MappedVNR):
+    """ Remove (tear down) a mapped virtual network request from the substrate network, releasing
+    all the substrate resources (cpu limits, link bandwidths, IP addresses) that it was using, so
+    that they can be used by the VNRs served after this.
+    vnr: MappedVNR
+        The mapped VNR to be removed. Must be one of gbl.MAPPED_VNRS.
+    """
+    print("\nRemoving vnr{} from the substrate network...".format(vnr.vnr_number))
+    for vhost in vnr.virtual_hosts:
+        _remove_vnr_host_from_substrate_host(net, vhost)
+
+    # Removing the flow entries (and select groups) added for the paths of the links of this VNR.
+    if net is not None:
+        for (switch_name, match) in vnr.path_flow_entries:
+            CLI.do_sh(net, 'ovs-ofctl --strict del-flows {} {}'.format(
+                switch_name, match))
+        for (switch_name, group_id) in vnr.path_group_entries:
+            CLI.do_sh(net, 'ovs-ofctl -O OpenFlow13 del-groups {} group_id={}'.format(
+                switch_name, group_id))
+
+    # Giving back the bandwidth values in gbl.SWITCH_PAIR_x_BW, along the paths of every link.
+    for (h1_name, h2_name, bw) in vnr.vnr_links_with_bw:
+        h1 = gbl.HOSTNAME_x_HOST[h1_name]
+        h2 = gbl.HOSTNAME_x_HOST[h2_name]
+        gbl.SWITCH_PAIR_x_BW = remove_link_mapping_between_hosts(
+            (h1, h2), bw, gbl.SWITCH_PAIR_x_BW, vnr.get_paths_of_link(h1_name, h2_name))
+
+    gbl.MAPPED_VNRS.remove(vnr)
+    _get_isolation_id_pool().free(vnr.isolation_id)
+    admission.update_admission_filter(vnr.substrate_hosts)
+    capacity_tree.update_capacity_tree(vnr.substrate_hosts)
+
+    if gbl.CFG.get("update_cpu_limits_per_vnr", False):
+        hp.update_cpu_limits_of_substrate_hosts_after_vnr_mapping(
+            net, vnr.substrate_hosts)
 
-def add_link_mapping_between_hosts(host_pair, bw_req, SWITCH_PAIR_x_BW, purpose="check"):
+
+def add_link_mapping_between_hosts(host_pair, bw_req, SWITCH_PAIR_x_BW, purpose="check", paths=None):
     """ Once a host pair has been selected for doing mapping of some virtual link on it,
     the bandwidth of all the links in the path b/w the hosts shall be reduced by how
     much ever that virtual link has consumed on all the links in the path between hosts.
@@ -286,31 +572,57 @@ def add_link_mapping_between_hosts(host_pair, bw_req, SWITCH_PAIR_x_BW, purpose=
         'purpose' variable helps here. If purpose == 'final-vnr-mapping', only then we update 
         the op.SUBSTRATE_LINKS_USED. Otherwise its just a 'check' as part of trying a vne algorithm, 
         and we shall not update the op.SUBSTRATE_LINKS_USED yet.
+    paths: List of (path, bandwidth); the paths between the hosts along which the virtual link
+        is mapped, and the part of its bandwidth mapped on each. If None, they are selected as per
+        the routing mode (`substrate.split_bw_between_hosts`), based on SWITCH_PAIR_x_BW.
     """
     # When adding a link mapping between substrate hosts, the bw provided to the
     # link between these hosts must be subtracted from all the links in the path
     # between these hosts.
     bw_cost_spent_on_substrate = 0
-    (h1, h2) = host_pair
-    if int(h1.name[1:]) > int(h2.name[1:]):
-        host_pair = (h2, h1)
-
-    path = gbl.PATH_BETWEEN_HOSTS[host_pair]
-    for each_link in path:
-        (node1, node2) = each_link
-
-        for ((p1, p2), _) in SWITCH_PAIR_x_BW.items():
-            if (p1 == node1.name and p2 == node2.name):
-                SWITCH_PAIR_x_BW[(p1, p2)] -= bw_req
-                SWITCH_PAIR_x_BW[(p2, p1)] -= bw_req
-                bw_cost_spent_on_substrate += bw_req
-                # Note: Remember that the spine leaf achitecture we have in our project is
-                # implemented as a 'modified spine leaf' architecture, and so there is an
-                # additional layer of links in the last layer. And when we compute the 'cost'
-                # for bandwidth spent, we DON'T count that last 'modified' layer's links
-                # since this is just an implementation optimization.
+    if paths is None:
+        paths = substrate.split_bw_between_hosts(
+            host_pair, bw_req, SWITCH_PAIR_x_BW)
+    for (path, bw) in paths:
+        for each_link in path:
+            (node1, node2) = each_link
+
+            # Note: Remember that the spine leaf achitecture we have in our project is
+            # implemented as a 'modified spine leaf' architecture, and so there is an
+            # additional layer of links in the last layer. And when we compute the 'cost'
+            # for bandwidth spent, we DON'T count that last 'modified' layer's links
+            # since this is just an implementation optimization. These links have no
+            # bandwidth in SWITCH_PAIR_x_BW.
+            if (node1.name, node2.name) in SWITCH_PAIR_x_BW:
+                SWITCH_PAIR_x_BW[(node1.name, node2.name)] -= bw
+                SWITCH_PAIR_x_BW[(node2.name, node1.name)] -= bw
+                bw_cost_spent_on_substrate += bw
                 if purpose == "final-vnr-mapping":
                     op.SUBSTRATE_LINKS_USED.add((node1.name, node2.name))
                     op.SUBSTRATE_LINKS_USED.add((node2.name, node1.name))
 
     return SWITCH_PAIR_x_BW, bw_cost_spent_on_substrate
+
+
+def remove_link_mapping_between_hosts(host_pair, bw_req, SWITCH_PAIR_x_BW, paths=None):
+    """ Reverse of `add_link_mapping_between_hosts`; once a virtual link mapped between the
+    host pair is removed, its bandwidth is given back to all the links in the path b/w the hosts.
+
+    host_pair: Pair of substrate hosts.
+    bw_req: The bandwidth requirement of the virtual link being removed.
+    SWITCH_PAIR_x_BW: The variable storing the bw of switch pairs values, which shall be
+        updated and returned to the caller.
+    paths: List of (path, bandwidth) along which the virtual link was mapped. If None, the whole
+        bandwidth is assumed to be on the fixed path between the hosts (gbl.PATH_BETWEEN_HOSTS).
+    """
+    if paths is None:
+        (h1, h2) = host_pair
+        if int(h1.name[1:]) > int(h2.name[1:]):
+            host_pair = (h2, h1)
+        paths = [(gbl.PATH_BETWEEN_HOSTS[host_pair], bw_req)]
+    SWITCH_PAIR_x_BW, _ = add_link_mapping_between_hosts(
+        host_pair, -bw_req, SWITCH_PAIR_x_BW, "release", [(path, -bw) for (path, bw) in paths])
+    # The bandwidth released may be enough for the VNRs which have failed so far.
+    if SWITCH_PAIR_x_BW is gbl.SWITCH_PAIR_x_BW:
+        admission.clear_failure_cache()
+    return SWITCH_PAIR_x_BW
@@ -0,0 +1,121 @@
+import gbl
+import itertools
+import numpy as np
+
+# The VNR ranking strategies decide which VNR is served before others. Every strategy computes a key
+# for all the VNRs at once, from the attributes of the VNRs (NumPy arrays with one value per VNR,
+# see `get_vnr_attributes`); the VNRs are then served in ascending order of the key (ties in the
+# order of the workload). The strategies with an '-ascending' or '-descending' suffix are given
+# (by their base name) in RANKING_KEYS, and 'topsis' is a strategy of its own.
+
+
+def get_sums_per_vnr(values, offsets):
+    """ Returns the sum of the values of every VNR (NumPy array), given the flat array of the values
+    of all the VNRs, and the offsets of the values of every VNR in it (one more than the VNRs). """
+    cumsum = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return cumsum[offsets[1:]] - cumsum[offsets[:-1]]
+
+
+def get_vnr_attributes(vnrs):
+    """ Returns the attributes of the VNRs (list of Tuple(num_nodes, cpu_reqs, link_reqs)) as a dict
+    of NumPy arrays, with one value per VNR: 'num_nodes', 'num_links', 'total_cpu' and 'total_bw'.
+    The cpu requirements and the links of all the VNRs are put in flat arrays once (as in a VNR
+    trace, see `vnr_trace.VNRTrace`), and summed per VNR with NumPy. """
+    cpu_reqs = [cpu for (_, cpu, _) in vnrs]
+    link_reqs = [links for (_, _, links) in vnrs]
+    num_links = np.fromiter(map(len, link_reqs), dtype=np.int64, count=len(vnrs))
+    cpu_offsets = np.concatenate(([0], np.cumsum(np.fromiter(
+        map(len, cpu_reqs), dtype=np.int64, count=len(vnrs)))))
+    link_offsets = np.concatenate(([0], np.cumsum(num_links)))
+    # The (node, node, bw) of all the links, one after the other.
+    links = np.fromiter(itertools.chain.from_iterable(itertools.chain.from_iterable(link_reqs)),
+                        dtype=np.int64, count=3*link_offsets[-1])
+    return {
+        "num_nodes": np.fromiter((n for (n, _, _) in vnrs), dtype=np.int64, count=len(vnrs)),
+        "num_links": num_links,
+        "total_cpu": get_sums_per_vnr(np.fromiter(itertools.chain.from_iterable(cpu_reqs),
+                                                  dtype=np.int64, count=cpu_offsets[-1]), cpu_offsets),
+        "total_bw": get_sums_per_vnr(links[2::3], link_offsets),
+    }
+
+
+def _get_revenue(attributes):
+    """ Revenue of the VNRs, i.e. the sum of the cpu requirements of all the virtual hosts and the
+    bandwidth requirements of all the links. """
+    return attributes["total_cpu"] + attributes["total_bw"]
+
+
+def _get_size(attributes):
+    """ Size of the VNRs, i.e. the number of virtual hosts and links. """
+    return attributes["num_nodes"] + attributes["num_links"]
+
+
+def _get_bandwidth_density(attributes):
+    """ Bandwidth density of the VNRs, i.e. the bandwidth requirement per virtual host. """
+    return attributes["total_bw"] / attributes["num_nodes"]
+
+
+def _get_topsis_key(attributes):
+    """ TOPSIS ranking of the VNRs on their total cpu, total bandwidth, number of virtual hosts and
+    number of links, all weighted equally and all taken as costs (the lower, the easier the VNR is
+    to embed). The criteria are normalized by their norms over the workload; the VNRs are served in
+    descending order of their relative closeness to the ideal (least demanding) VNR. """
+    criteria = np.column_stack([attributes["total_cpu"], attributes["total_bw"],
+                                attributes["num_nodes"], attributes["num_links"]]).astype(float)
+    norms = np.linalg.norm(criteria, axis=0)
+    criteria = criteria / np.where(norms == 0, 1, norms)
+    dist_to_best = np.linalg.norm(criteria - criteria.min(axis=0), axis=1)
+    dist_to_worst = np.linalg.norm(criteria - criteria.max(axis=0), axis=1)
+    total_dist = dist_to_best + dist_to_worst
+    closeness = np.divide(dist_to_worst, total_dist, out=np.ones_like(
+        total_dist), where=total_dist > 0)
+    return -closeness
+
+
+RANKING_KEYS = {
+    "revenue": _get_revenue,
+    "size": _get_size,
+    "bandwidth-density": _get_bandwidth_density,
+}
+
+
+def get_vnr_ranking_strategy():
+    """ Returns the VNR ranking strategy, as specified by the 'vnr_ranking' value in the configurations
+    file; 'revenue-ascending' (the default), 'revenue-descending', 'size-ascending', 'size-descending',
+    'bandwidth-density-ascending', 'bandwidth-density-descending' or 'topsis'. """
+    return gbl.CFG.get("vnr_ranking", "revenue-ascending")
+
+
+def _parse_strategy(strategy):
+    """ Returns Tuple(key function, whether descending) of the ranking strategy. """
+    if strategy == "topsis":
+        return (_get_topsis_key, False)
+    (name, _, direction) = strategy.rpartition("-")
+    if name not in RANKING_KEYS or direction not in ("ascending", "descending"):
+        raise Exception("Invalid VNR ranking strategy '{}'.".format(strategy))
+    return (RANKING_KEYS[name], direction == "descending")
+
+
+def get_ranking_keys(attributes, strategy):
+    """ Returns the keys (NumPy array) of the VNRs with the given attributes for the ranking strategy;
+    the VNRs are served in ascending order of the keys. """
+    (get_keys, descending) = _parse_strategy(strategy)
+    keys = get_keys(attributes)
+    return -keys if descending else keys
+
+
+def get_ranking_order(attributes, strategy):
+    """ Returns the indices of the VNRs (with the given attributes) in the order in which they are
+    to be served as per the ranking strategy. """
+    return np.argsort(get_ranking_keys(attributes, strategy), kind="stable")
+
+
+def get_window_ranking_keys(attributes, strategy):
+    """ Returns the keys of the VNRs with the given attributes for the ranking strategy, as
+    `get_ranking_keys` does, for ranking the VNRs within a window as they are streamed; so the keys
+    of any part of the stream are the same as when computed with the rest of it. The 'topsis'
+    strategy normalizes over the whole workload, so it cannot rank a stream. """
+    if strategy == "topsis":
+        raise Exception(
+            "The 'topsis' VNR ranking cannot rank VNRs within a window; use a full ranking instead.")
+    return get_ranking_keys(attributes, strategy)
@@ -0,0 +1,131 @@
+import gbl
+import helpers as hp
+import vnr_ranking
+import numpy as np
+from array import array
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# The (NumPy .npy) files of a trace; all the trace files are in the trace directory.
+TRACE_FILES = ["num_nodes", "cpu_offsets",
+               "cpu_reqs", "link_offsets", "link_reqs"]
+
+
+class VNRTrace:
+    """
+    A workload of VNRs on disk, in a compact columnar format: the VNRs are stored as flat arrays in
+    a directory of .npy files,
+
+        num_nodes     (V,)    number of nodes of every VNR
+        cpu_offsets   (V+1,)  offsets of the cpu requirements of every VNR in cpu_reqs
+        cpu_reqs      (N,)    cpu requirements of the nodes of all the VNRs
+        link_offsets  (V+1,)  offsets of the links of every VNR in link_reqs
+        link_reqs     (L, 3)  (node, node, bw) of the links of all the VNRs
+
+    which are memory-mapped when read, so that the VNRs are only read from disk as they are needed;
+    and the same trace can be read by any number of runs (e.g. of all the VNE algorithms) at once.
+
+    Attributes
+    ----------
+    path : str
+        Path of the trace directory.
+    num_vnrs : int
+        Number of VNRs read from the trace, i.e. its first num_vnrs VNRs.
+    """
+
+    def __init__(self, path, num_vnrs=None):
+        self.path = path
+        for name in TRACE_FILES:
+            setattr(self, name, np.load(os.path.join(
+                path, "{}.npy".format(name)), mmap_mode="r"))
+        self.num_vnrs = len(self.num_nodes)
+        if num_vnrs is not None:
+            if num_vnrs > self.num_vnrs:
+                raise Exception("The VNR trace {} has only {} VNRs ({} needed).".format(
+                    path, self.num_vnrs, num_vnrs))
+            self.num_vnrs = num_vnrs
+
+    def __len__(self):
+        return self.num_vnrs
+
+    def __getitem__(self, i):
+        """ Returns the i-th VNR as Tuple(num_nodes, cpu_reqs, link_reqs), as in `hp.create_vnrs`. """
+        if not 0 <= i < self.num_vnrs:
+            raise IndexError(i)
+        cpu_reqs = self.cpu_reqs[self.cpu_offsets[i]:self.cpu_offsets[i + 1]]
+        link_reqs = self.link_reqs[self.link_offsets[i]:self.link_offsets[i + 1]]
+        return (int(self.num_nodes[i]), cpu_reqs.tolist(), [tuple(link) for link in link_reqs.tolist()])
+
+    def __iter__(self):
+        for i in range(self.num_vnrs):
+            yield self[i]
+
+    def get_attributes(self):
+        """ Returns the attributes of the VNRs, as `vnr_ranking.get_vnr_attributes` does, computed
+        on the columns of the trace with NumPy. """
+        return {
+            "num_nodes": np.asarray(self.num_nodes[:self.num_vnrs], dtype=np.int64),
+            "num_links": np.diff(self.link_offsets[:self.num_vnrs + 1]),
+            "total_cpu": vnr_ranking.get_sums_per_vnr(self.cpu_reqs, self.cpu_offsets[:self.num_vnrs + 1]),
+            "total_bw": vnr_ranking.get_sums_per_vnr(self.link_reqs[:, 2], self.link_offsets[:self.num_vnrs + 1]),
+        }
+
+
+def write_vnr_trace(path, vnrs):
+    """ Writes the VNRs (any iterable of Tuple(num_nodes, cpu_reqs, link_reqs), e.g. the generator
+    `hp.generate_vnrs`) to a trace at path. The VNRs are consumed one at a time, and only kept in
+    compact arrays until written. The trace is written to a temporary directory first and then
+    renamed, so that runs reading the trace at the same time never see a partial trace. """
+    num_nodes = array("i")
+    cpu_reqs = array("i")
+    link_reqs = array("i")
+    cpu_offsets = array("q", [0])
+    link_offsets = array("q", [0])
+    for (n, cpu, links) in vnrs:
+        num_nodes.append(n)
+        cpu_reqs.extend(cpu)
+        for link in links:
+            link_reqs.extend(link)
+        cpu_offsets.append(len(cpu_reqs))
+        link_offsets.append(len(link_reqs) // 3)
+
+    arrays = {
+        "num_nodes": np.frombuffer(num_nodes, dtype=np.int32),
+        "cpu_offsets": np.frombuffer(cpu_offsets, dtype=np.int64),
+        "cpu_reqs": np.frombuffer(cpu_reqs, dtype=np.int32),
+        "link_offsets": np.frombuffer(link_offsets, dtype=np.int64),
+        "link_reqs": np.frombuffer(link_reqs, dtype=np.int32).reshape(-1, 3),
+    }
+    parent_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent_dir)
+    for name in TRACE_FILES:
+        np.save(os.path.join(tmp_dir, "{}.npy".format(name)), arrays[name])
+    os.chmod(tmp_dir, 0o755)
+    try:
+        os.rename(tmp_dir, path)
+    except OSError:
+        # Another run has written the same trace in the meantime.
+        shutil.rmtree(tmp_dir)
+    print("\nWrote {} VNRs to the VNR trace {}".format(len(num_nodes), path))
+
+
+def get_vnr_trace_path(trace_dir, seed, num_vnrs):
+    """ Returns the path of the trace (in trace_dir) of num_vnrs VNRs generated with the seed and the
+    'vnrs' configurations; the name has a hash of the configurations, so that the trace is not
+    reused once they change. """
+    cfg_vnrs = {key: gbl.CFG["vnrs"].get(key) for key in ("min_nodes", "max_nodes", "probability", "min_cpu",
+                                                         "max_cpu", "min_bw", "max_bw", "generator")}
+    digest = hashlib.sha1(json.dumps(
+        cfg_vnrs, sort_keys=True).encode()).hexdigest()[:8]
+    return os.path.join(trace_dir, "vnrs_seed_{}_n_{}_{}".format(seed, num_vnrs, digest))
+
+
+def create_vnr_trace(path, num_vnrs, seed):
+    """ Generates num_vnrs VNRs with the seed and the 'vnrs' configurations (as `main.runVNE` would
+    generate them), and writes them to a trace at path. """
+    cfg_vnrs = dict(gbl.CFG["vnrs"], num_vnrs=num_vnrs)
+    write_vnr_trace(path, hp.create_vnr_stream(cfg_vnrs, seed))